@@ -0,0 +1,433 @@
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from config_hash import hash_config_bytes
+from container_diff import diff_configs
+from container_index import ContainerIndex
+from gtm_loader import parse_gtm_config
+from llm_analysis import analyze_index
+from llm_backend import create_backend
+from mock_llm_server import create_server
+from findings_report import build_report
+from pdf_export import build_report_pdf
+from report_export import EXPORT_FORMATS, render_report
+from portfolio import SHARED_ID_PLATFORMS, build_portfolio, run_query, shared_tracking_ids, tag_type_distribution, ua_usage
+from rules import UA_TAG_TYPES, collect_tracking_ids, combine_analysis, render_findings_markdown, run_rules
+from config_store import MemoryBlobStore, decode_config, store_config
+
+
+def time_call(func, repeat):
+    """Return the best wall-clock time of `repeat` calls to func, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def example_files(directory):
+    """List the example container exports, largest first."""
+    return sorted(glob.glob(os.path.join(directory, '*.json')), key=os.path.getsize, reverse=True)
+
+
+def benchmark_hash(args):
+    """Compare the previous sorted dumps + MD5 hashing (run twice per upload) with a single byte-level hash."""
+    print(f"{'file':<24}{'size KB':>10}{'old ms':>10}{'new ms':>10}{'speed-up':>10}")
+    for path in example_files(args.directory):
+        with open(path, 'rb') as file:
+            data = file.read()
+        # Both paths parse the upload once for the app, so parsing isn't timed
+        config = json.loads(data)
+
+        def old_path():
+            for _ in range(2):
+                hashlib.md5(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+        def new_path():
+            hash_config_bytes(data)
+
+        old_ms = time_call(old_path, args.repeat)
+        new_ms = time_call(new_path, args.repeat)
+        print(f"{os.path.basename(path):<24}{len(data) / 1024:>10.1f}{old_ms:>10.2f}{new_ms:>10.2f}{old_ms / new_ms:>9.1f}x")
+
+
+def benchmark_storage(args):
+    """Compare stored bytes for raw JSON and compressed, deduplicated configs, first save and a one-tag revision."""
+    print(f"{'file':<24}{'raw KB':>10}{'first KB':>10}{'rev KB':>10}{'load ms':>10}")
+    for path in example_files(args.directory):
+        with open(path, 'rb') as file:
+            config = json.load(file)
+        store = MemoryBlobStore()
+
+        def stored_size(config):
+            blobs_before = dict(store.blobs)
+            manifest = store_config(config, store)
+            return len(manifest) + sum(len(blob) for key, blob in store.blobs.items() if key not in blobs_before), manifest
+
+        first_size, manifest = stored_size(config)
+        revision = json.loads(json.dumps(config))
+        tags = revision.get('containerVersion', {}).get('tag', [])
+        if tags:
+            tags[0]['name'] = tags[0].get('name', '') + ' (edited)'
+        revision_size, _ = stored_size(revision)
+        assert decode_config(manifest, store) == config
+
+        load_ms = time_call(lambda: decode_config(manifest, store), args.repeat)
+        raw_size = len(json.dumps(config))
+        print(f"{os.path.basename(path):<24}{raw_size / 1024:>10.1f}{first_size / 1024:>10.1f}{revision_size / 1024:>10.1f}{load_ms:>10.2f}")
+
+
+def benchmark_diff(args):
+    """Time the structural diff of each container against a copy with every tenth tag edited."""
+    print(f"{'file':<24}{'entities':>10}{'diff ms':>10}{'changed':>10}")
+    for path in example_files(args.directory):
+        with open(path, 'rb') as file:
+            config = json.load(file)
+        revision = json.loads(json.dumps(config))
+        container_version = revision.get('containerVersion', {})
+        for tag in container_version.get('tag', [])[::10]:
+            tag['name'] = tag.get('name', '') + ' (edited)'
+        entity_count = sum(len(container_version.get(kind, [])) for kind in ('tag', 'trigger', 'variable'))
+
+        diff_ms = time_call(lambda: diff_configs(config, revision), args.repeat)
+        changed = len(diff_configs(config, revision)['tag']['changed'])
+        print(f"{os.path.basename(path):<24}{entity_count:>10}{diff_ms:>10.2f}{changed:>10}")
+
+
+def measure_memory(func):
+    """Return (result, peak KB, retained KB) for one call, as traced by tracemalloc."""
+    tracemalloc.start()
+    result = func()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak / 1024, retained / 1024
+
+
+def benchmark_memory(args):
+    """Compare json.loads alone with parse_gtm_config, which is json.loads plus a compaction pass (nothing is streamed).
+
+    Reports peak and retained KB and ms for each (the +cmp columns are parse_gtm_config), and the gzipped upload an
+    anonymous session keeps instead of the config.
+    """
+    print(f"{'file':<24}{'size KB':>10}{'loads pk':>10}{'loads KB':>10}{'+cmp pk':>10}{'+cmp KB':>10}{'gzip KB':>10}{'loads ms':>10}{'+cmp ms':>10}")
+    for path in example_files(args.directory):
+        with open(path, 'rb') as file:
+            data = file.read()
+        _, loads_peak, loads_retained = measure_memory(lambda: json.loads(data))
+        _, compacted_peak, compacted_retained = measure_memory(lambda: parse_gtm_config(data))
+        loads_ms = time_call(lambda: json.loads(data), args.repeat)
+        compacted_ms = time_call(lambda: parse_gtm_config(data), args.repeat)
+        session_size = len(gzip.compress(data))
+        print(f"{os.path.basename(path):<24}{len(data) / 1024:>10.1f}{loads_peak:>10.1f}{loads_retained:>10.1f}{compacted_peak:>10.1f}{compacted_retained:>10.1f}{session_size / 1024:>10.1f}{loads_ms:>10.2f}{compacted_ms:>10.2f}")
+
+
+def benchmark_parameters(args):
+    """Compare linear parameter searches over plain dicts with the model's lookup, and time the rule paths that use them."""
+    keys = ('trackingId', 'advertiserId', 'activityTag', 'groupTag', 'html', 'measurementId')
+    print(f"{'file':<24}{'tags':>10}{'linear ms':>10}{'model ms':>10}{'rules ms':>10}")
+    for path in example_files(args.directory):
+        with open(path, 'rb') as file:
+            index = ContainerIndex(parse_gtm_config(file.read()))
+
+        def linear():
+            for tag in index.tags:
+                for key in keys:
+                    next((parameter.get('value') for parameter in tag.get('parameter', []) if parameter.get('key') == key), None)
+
+        def model():
+            for tag in index.tags:
+                for key in keys:
+                    tag.parameter_value(key)
+
+        def rules():
+            run_rules(index)
+            collect_tracking_ids(index)
+
+        linear_ms = time_call(linear, args.repeat)
+        model_ms = time_call(model, args.repeat)
+        rules_ms = time_call(rules, args.repeat)
+        print(f"{os.path.basename(path):<24}{len(index.tags):>10}{linear_ms:>10.3f}{model_ms:>10.3f}{rules_ms:>10.2f}")
+
+
+def long_analysis(index):
+    """A findings report shaped like a full LLM analysis: a tracking ID table, then a section per tag."""
+    lines = ["### Tracking IDs", "", "| Platform | ID | Tags |", "| --- | --- | --- |"]
+    for platform, ids in collect_tracking_ids(index).items():
+        for tracking_id, tag_names in ids.items():
+            lines.append(f"| {platform} | `{tracking_id}` | {len(tag_names)} |")
+    lines.append("")
+    for tag in index.tags:
+        lines.extend([
+            f"**Tag Name: '{tag.name}'**",
+            "",
+            f"- Rename to follow the *[Platform] - [Type] - [Description]* convention, e.g. `{tag.type} - Event - {tag.name}`.",
+            f"- Confirm the {len(tag.get('firingTriggerId', []))} firing trigger(s) match the measurement plan & consent settings.",
+            "- Move the tag into a platform folder so it's easier to find.",
+            "",
+        ])
+    return combine_analysis(render_findings_markdown(run_rules(index)), '\n'.join(lines))
+
+
+def benchmark_pdf(args):
+    """Time PDF export of a long analysis of each container, with its peak memory, page count and size."""
+    print(f"{'file':<24}{'md KB':>10}{'pages':>10}{'pdf KB':>10}{'peak KB':>10}{'build ms':>10}")
+    for path in example_files(args.directory):
+        with open(path, 'rb') as file:
+            index = ContainerIndex(parse_gtm_config(file.read()))
+        analysis = long_analysis(index)
+        report = build_report(index, analysis)
+
+        pdf, peak, _ = measure_memory(lambda: build_report_pdf(report))
+        build_ms = time_call(lambda: build_report_pdf(report), args.repeat)
+        pages = pdf.count(b'/Type /Page\n')
+        print(f"{os.path.basename(path):<24}{len(analysis) / 1024:>10.1f}{pages:>10}{len(pdf) / 1024:>10.1f}{peak:>10.1f}{build_ms:>10.1f}")
+
+
+def benchmark_export(args):
+    """Time building the findings model from a long analysis, then rendering it in each export format."""
+    print(f"{'file':<24}{'model ms':>10}" + ''.join(f"{export_format + ' ms':>10}" for export_format in EXPORT_FORMATS))
+    for path in example_files(args.directory):
+        with open(path, 'rb') as file:
+            index = ContainerIndex(parse_gtm_config(file.read()))
+        analysis = long_analysis(index)
+        report = build_report(index, analysis)
+
+        model_ms = time_call(lambda: build_report(index, analysis), args.repeat)
+        render_ms = [time_call(lambda: render_report(report, export_format), args.repeat) for export_format in EXPORT_FORMATS]
+        print(f"{os.path.basename(path):<24}{model_ms:>10.2f}" + ''.join(f"{ms:>10.2f}" for ms in render_ms))
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+def run_upload(path, backend):
+    """One upload through the app's path: hash, parse and index, rules and LLM analysis, findings report and PDF. Returns seconds per stage."""
+    timings = {}
+    start = time.perf_counter()
+    with open(path, 'rb') as file:
+        data = file.read()
+    index = ContainerIndex(parse_gtm_config(data), hash_config_bytes(data))
+    timings['parse'] = time.perf_counter() - start
+
+    stage_start = time.perf_counter()
+    analysis = combine_analysis(render_findings_markdown(run_rules(index)), analyze_index(index, backend))
+    timings['analysis'] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    build_report_pdf(build_report(index, analysis))
+    timings['export'] = time.perf_counter() - stage_start
+    timings['total'] = time.perf_counter() - start
+    return timings
+
+
+def benchmark_pipeline(args):
+    """Run N concurrent sessions, each uploading every example, through an LLM backend; report latency percentiles, tokens and throughput.
+
+    Without --base-url, an in-process mock_llm_server with --latency is used.
+    """
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = create_server(0, args.latency, args.latency / 2)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    backend = create_backend(base_url=base_url)
+    paths = example_files(args.directory)
+
+    def session(_):
+        return [run_upload(path, backend) for path in paths]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        results = [timings for session_results in executor.map(session, range(args.sessions)) for timings in session_results]
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+
+    usage = backend.snapshot()
+    print(f"{args.sessions} sessions x {len(paths)} uploads against {base_url}")
+    print(f"{'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage in ('parse', 'analysis', 'export', 'total'):
+        values = [timings[stage] * 1000 for timings in results]
+        print(f"{stage:<12}{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}{max(values):>10.1f}")
+    print(f"throughput: {len(results) / elapsed:.2f} uploads/s over {elapsed:.1f}s")
+    print(f"LLM: {usage['requests']} requests, {usage['retries']} retries, {usage['prompt_tokens']} prompt tokens ({usage['prompt_tokens'] / len(results):.0f}/upload), {usage['completion_tokens']} completion tokens")
+
+
+def portfolio_queries_loop(indexes):
+    """The portfolio queries as per-container Python loops over ContainerIndex, for comparison."""
+    ua = {}
+    containers_by_id = {}
+    tag_types = {}
+    for container_id, index in indexes:
+        ua_count = sum(1 for tag in index.tags if tag.get('type') in UA_TAG_TYPES)
+        if ua_count:
+            ua[container_id] = ua_count
+        for platform, ids in collect_tracking_ids(index).items():
+            if platform in ('GA4', 'Floodlight'):
+                for tracking_id in ids:
+                    containers_by_id.setdefault((platform, tracking_id), set()).add(container_id)
+        for tag in index.tags:
+            key = (index.type_name(tag.get('type', '')), container_id)
+            tag_types[key] = tag_types.get(key, 0) + 1
+    return ua, {key: ids for key, ids in containers_by_id.items() if len(ids) > 1}, tag_types
+
+
+def benchmark_portfolio(args):
+    """Build portfolio frames from --copies of every example, then time the cross-container queries against per-container loops."""
+    examples = []
+    for path in example_files(args.directory):
+        with open(path, 'rb') as file:
+            data = file.read()
+        examples.append((os.path.basename(path), hash_config_bytes(data), data))
+    # Each copy gets its own content hash, so every container is built rather than shared
+    containers = [
+        (f"{name}#{copy}", f"{config_hash}:{copy}", lambda data=data: parse_gtm_config(data))
+        for copy in range(args.copies)
+        for name, config_hash, data in examples
+    ]
+
+    start = time.perf_counter()
+    portfolio = build_portfolio(containers)
+    cold_ms = (time.perf_counter() - start) * 1000
+    cached_ms = time_call(lambda: build_portfolio(containers), args.repeat)
+    # One project re-saved with new content: only its frames are rebuilt
+    changed = containers[:-1] + [(containers[-1][0], f"{containers[-1][1]}:changed", containers[-1][2])]
+    start = time.perf_counter()
+    build_portfolio(changed)
+    incremental_ms = (time.perf_counter() - start) * 1000
+
+    def vectorised():
+        return ua_usage(portfolio), shared_tracking_ids(portfolio), tag_type_distribution(portfolio)
+
+    indexes = [(container_id, ContainerIndex(load(), config_hash)) for container_id, config_hash, load in containers]
+    def memoised():
+        return run_query(portfolio, ua_usage), run_query(portfolio, shared_tracking_ids, SHARED_ID_PLATFORMS), run_query(portfolio, tag_type_distribution)
+
+    vectorised_ms = time_call(vectorised, args.repeat)
+    memoised_ms = time_call(memoised, args.repeat)
+    loop_ms = time_call(lambda: portfolio_queries_loop(indexes), args.repeat)
+
+    ua, shared, distribution = vectorised()
+    print(f"{len(containers)} containers, {len(portfolio['tags'])} tags, {len(portfolio['parameters'])} parameters")
+    print(f"build: {cold_ms:.0f} ms cold, {incremental_ms:.0f} ms with one container changed, {cached_ms:.2f} ms cached")
+    print(f"queries: {vectorised_ms:.1f} ms vectorised, {memoised_ms:.3f} ms on reruns, vs {loop_ms:.1f} ms per-container loops")
+    print(f"{len(ua)} containers with UA, {len(shared)} shared GA4/Floodlight IDs, {len(distribution)} tag types")
+
+
+# Entry point -> (budget in ms for importing it, excluding FRAMEWORK_PACKAGES, and packages it must not import).
+# The packages are the slow ones the app only needs once an upload is analysed or exported.
+IMPORT_BUDGETS = {
+    'streamlit_app': (150, ('openai', 'reportlab', 'pandas', 'pyarrow', 'supabase')),
+    'batch_audit': (150, ('openai', 'reportlab', 'pandas', 'pyarrow')),
+    'report_export': (50, ('reportlab', 'pandas', 'pyarrow')),
+    'llm_backend': (100, ('openai',)),
+}
+FRAMEWORK_PACKAGES = ('streamlit',)  # Imported by the app's first line whatever it does, so not budgeted
+IMPORT_RUNS = 5
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_tree(module):
+    """Import a module in a fresh interpreter with -X importtime; return [(module, depth, cumulative us)] in import order, or the error."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode:
+        return None, result.stderr.strip().splitlines()[-1]
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            entries.append((match.group(4), len(match.group(3)) // 2, int(match.group(2))))
+    return entries, None
+
+
+def app_import_cost(entries, module):
+    """Split an import tree into the entry module's cost outside FRAMEWORK_PACKAGES (ms) and the other top-level packages it loaded."""
+    total = next(cumulative for name, depth, cumulative in reversed(entries) if name == module and depth == 0)
+    framework = 0
+    packages = set()
+    ancestors = []
+    # -X importtime lists each module after its own imports, so walk backwards to visit parents first
+    for name, depth, cumulative in reversed(entries):
+        del ancestors[depth:]
+        ancestors.append(name)
+        if any(ancestor.split('.')[0] in FRAMEWORK_PACKAGES for ancestor in ancestors[:-1]):
+            continue
+        if name.split('.')[0] in FRAMEWORK_PACKAGES:
+            framework += cumulative
+        else:
+            packages.add(name.split('.')[0])
+    return (total - framework) / 1000, packages
+
+
+def benchmark_imports(args):
+    """Import each entry point in a fresh interpreter; fail if it exceeds its budget or loads a package it shouldn't."""
+    failures = []
+    print(f"{'module':<16}{'best ms':>10}{'budget ms':>11}  heavy packages loaded")
+    for module, (budget, forbidden) in IMPORT_BUDGETS.items():
+        best = None
+        loaded = set()
+        for _ in range(IMPORT_RUNS):
+            entries, error = import_tree(module)
+            if error:
+                break
+            cost, packages = app_import_cost(entries, module)
+            best = cost if best is None else min(best, cost)
+            loaded |= packages & set(forbidden)
+        if error:
+            # A module that can't be imported (e.g. a missing dependency) can't be shown to be within budget
+            print(f"{module:<16}{'failed':>10}{budget:>11}  ({error})")
+            failures.append(f"{module} could not be imported: {error}")
+            continue
+        print(f"{module:<16}{best:>10.1f}{budget:>11}  {', '.join(sorted(loaded)) or '-'}")
+        if best > budget:
+            failures.append(f"{module} took {best:.1f} ms to import, over its {budget} ms budget")
+        if loaded:
+            failures.append(f"{module} imports {', '.join(sorted(loaded))} at import time")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+
+BENCHMARKS = {
+    'diff': benchmark_diff,
+    'export': benchmark_export,
+    'hash': benchmark_hash,
+    'imports': benchmark_imports,
+    'memory': benchmark_memory,
+    'parameters': benchmark_parameters,
+    'pdf': benchmark_pdf,
+    'pipeline': benchmark_pipeline,
+    'portfolio': benchmark_portfolio,
+    'storage': benchmark_storage,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark hot paths against the example containers.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="Benchmark to run")
+    parser.add_argument("-d", "--directory", default="./json-examples", help="Directory of GTM exports (default: ./json-examples)")
+    parser.add_argument("-r", "--repeat", type=int, default=20, help="Repetitions per measurement; the best time is reported (default: 20)")
+    parser.add_argument("-s", "--sessions", type=int, default=4, help="Concurrent sessions for the pipeline benchmark (default: 4)")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock LLM latency in seconds for the pipeline benchmark, plus up to half as much jitter (default: 0.5)")
+    parser.add_argument("--copies", type=int, default=50, help="Copies of each example in the portfolio benchmark (default: 50)")
+    parser.add_argument("--base-url", help="OpenAI-compatible API for the pipeline benchmark instead of the in-process mock")
+
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args)
@@ -0,0 +1,170 @@
+import json
+import logging
+import time
+
+import streamlit as st
+
+from app_common import JOB_POLL_INTERVAL, handle_error
+from batch_analysis import reusable_sections
+from container_diff import diff_configs, has_changes, render_diff_markdown
+from db import get_supabase_client
+from job_queue import FAILED, analysis_jobs
+from llm_analysis import CHUNKED_ANALYSIS_MIN_TAGS, analyze_index
+from llm_backend import create_backend
+from config_store import SupabaseBlobStore, decode_config
+from projects import get_cached_analysis, get_latest_version
+from rules import LIMITED_FINDINGS_PER_RULE, combine_analysis, render_findings_markdown, run_rules
+from tag_cache import PROMPT_VERSION, SupabaseTagCache
+from tracing import link_trace, span
+
+logger = logging.getLogger(__name__)
+
+# Module-level, so its clients and token counts are shared across reruns and sessions
+llm_backend = create_backend()
+
+def previous_version_sections(index, user_id, client_factory):
+    """Diff against the last saved version of this container, returning the diff and findings reusable for unaffected tags.
+
+    Returns (None, None) without a previous version from the same prompt version. Runs in the
+    analysis job, so it doesn't call Streamlit and queries through the submitting session's client.
+    """
+    previous = get_latest_version(user_id, index.summary()['container_name'], client_factory)
+    if not previous or previous.get('prompt_version') != PROMPT_VERSION:
+        return None, None
+    try:
+        previous_config = decode_config(previous['config'], SupabaseBlobStore(client_factory, user_id))
+    except Exception as e:
+        logger.error(f"Error loading the previous version of {index.summary()['container_name']}: {str(e)}")
+        return None, None
+    diff = diff_configs(previous_config, index.config)
+    return diff, reusable_sections(index, diff, previous['analysis'])
+
+
+def run_analysis(job, index, limited, tag_cache=None, previous_sections=None):
+    """Run the LLM analysis as a background job, publishing streamed text to job.progress.
+
+    Runs outside the script thread, so it must not call Streamlit; errors fail the job.
+    """
+    def on_update(text):
+        job.progress = text
+
+    with span('llm_analysis', limited=limited, tags=len(index.tags)):
+        return analyze_index(index, llm_backend, limited, on_update, tag_cache, previous_sections)
+
+
+def analysis_owner(index, user_id, limited, bypass_cache):
+    """The user whose data an analysis depends on, or None when its result can be shared across users.
+
+    Only full, cached analyses of containers large enough to batch read the user's per-tag cache and saved versions.
+    """
+    if limited or bypass_cache or len(index.tags) < CHUNKED_ANALYSIS_MIN_TAGS:
+        return None
+    return user_id
+
+
+def submit_analysis(memo, user_id, limited, bypass_cache):
+    """Queue the analysis, sharing any in-flight job for the same content, mode and (for per-user analyses) user.
+
+    Joining an active job costs nothing; a new job looks up the per-tag cache and previous
+    version itself, recording the changes since that version on the upload's memo.
+    """
+    index = memo.index
+    owner = analysis_owner(index, user_id, limited, bypass_cache)
+    key = (index.config_hash, 'limited' if limited else 'full', bypass_cache, owner)
+    active_id = analysis_jobs.active(key)
+    if active_id is not None:
+        return active_id
+    if owner is None:
+        return analysis_jobs.submit(key, lambda job: run_analysis(job, index, limited))
+
+    # Resolved here, since the job's thread has no session to find the user's client through
+    client = get_supabase_client()
+
+    def analyse(job):
+        # Per-tag cache: re-uploads only send changed tags back to the LLM
+        tag_cache = SupabaseTagCache(lambda: client, user_id)
+        diff, previous_sections = previous_version_sections(index, user_id, lambda: client)
+        memo.version_diffs[user_id] = diff
+        return run_analysis(job, index, limited, tag_cache, previous_sections)
+
+    return analysis_jobs.submit(key, analyse)
+
+
+def show_version_changes(memo, user_id):
+    """Show the changes since the user's last saved version, once an analysis job has diffed them."""
+    diff = memo.version_diffs.get(user_id)
+    if diff is not None and has_changes(diff):
+        with st.expander("Changes since the last saved version"):
+            st.markdown(render_diff_markdown(diff))
+
+
+def analyze_config(memo, user_id, limited=False):
+    index = memo.index
+    hash_value = index.config_hash
+    cached_analysis = None
+    
+    # Ticking the box drops this session's earlier bypassed results, so it always starts a new analysis
+    bypass_cache = st.checkbox("Bypass cache and re-run analysis", on_change=lambda: st.session_state.pop('bypassed_analyses', None))
+    skip_gpt_analysis = st.checkbox("Skip analysis and output extraction only")
+
+    if user_id != "anonymous":
+        # Misses are memoised too, so reruns while an analysis runs don't query Supabase again
+        if user_id not in memo.cached_analyses:
+            memo.cached_analyses[user_id] = get_cached_analysis(hash_value, user_id)
+        cached_analysis = memo.cached_analyses[user_id]
+        if cached_analysis and not bypass_cache and not skip_gpt_analysis:
+            st.info("ℹ️ This configuration has been analyzed before. Showing cached results.")
+            return cached_analysis['analysis']
+    
+    config_summary = index.summary()
+
+    # Mechanical checks run locally so results are available before the LLM responds
+    with span('rules'):
+        findings_markdown = render_findings_markdown(run_rules(index), LIMITED_FINDINGS_PER_RULE if limited else None)
+
+    if skip_gpt_analysis:
+        st.success("Skipped GPT analysis. Displaying automated checks and JSON summary.")
+        return combine_analysis(findings_markdown, f"```json\n{json.dumps(config_summary, indent=4)}\n```")
+
+    # A finished job's result is handed to the upload's memo, so later reruns don't resubmit it. Results
+    # that bypassed the cache are only kept for this session, so other sessions' bypasses still re-run;
+    # results built from a user's cache and saved versions are only shared with that user's sessions
+    owner = analysis_owner(index, user_id, limited, bypass_cache)
+    job_key = (hash_value, limited, bypass_cache, owner)
+    if bypass_cache:
+        analyses, analysis_key = st.session_state.setdefault('bypassed_analyses', {}), (hash_value, limited)
+    else:
+        analyses, analysis_key = memo.analyses, (limited, owner)
+    if analysis_key in analyses:
+        show_version_changes(memo, user_id)
+        return analyses[analysis_key]
+
+    # Findings show immediately; streamed LLM tokens are appended as they arrive
+    output = st.empty()
+    output.markdown(findings_markdown)
+
+    # Reruns while the job runs find its ID in session state and resume polling it
+    job_ids = st.session_state.setdefault('analysis_job_ids', {})
+    job = analysis_jobs.get(job_ids[job_key]) if job_key in job_ids else None
+    if job is None:
+        job_ids[job_key] = submit_analysis(memo, user_id, limited, bypass_cache)
+        job = analysis_jobs.get(job_ids[job_key])
+
+    with st.spinner("Analyzing GTM configuration..."):
+        while not job.finished:
+            if job.progress:
+                output.markdown(combine_analysis(findings_markdown, job.progress))
+            time.sleep(JOB_POLL_INTERVAL)
+    output.empty()
+    del job_ids[job_key]
+    link_trace(job.trace, job_id=job.id)
+
+    if job.status == FAILED:
+        handle_error(job.error, job.traceback)
+        return combine_analysis(findings_markdown, "An error occurred during analysis. Please try again later.")
+
+    analysis = combine_analysis(findings_markdown, job.result)
+    analyses[analysis_key] = analysis
+    show_version_changes(memo, user_id)
+
+    return analysis
@@ -0,0 +1,29 @@
+import logging
+import traceback
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+BRAD_LINKEDIN_URL = "https://www.linkedin.com/in/brad-farleigh"
+JOB_POLL_INTERVAL = 0.25  # Seconds between checks on a background job
+
+def handle_error(e, stack_trace=None):
+    error_message = f"An error occurred: {str(e)}"
+    stack_trace = stack_trace or traceback.format_exc()
+    
+    st.error(error_message)
+    st.code(stack_trace, language="python")
+    
+    logger.error(f"Error: {error_message}\n{stack_trace}")
+    st.markdown(f"If you're experiencing issues, please reach out to Brad on [LinkedIn]({BRAD_LINKEDIN_URL}) and provide the error details above.")
+
+
+def is_logged_in():
+    """Check if a user is logged in."""
+    return 'user' in st.session_state and 'session' in st.session_state and st.session_state['user'] is not None and st.session_state['session'] is not None
+
+
+def get_user_id():
+    """Get the current logged-in user's ID."""
+    return st.session_state['user'].id if is_logged_in() else None
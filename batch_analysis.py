@@ -0,0 +1,151 @@
+import asyncio
+import logging
+
+from container_diff import affected_tag_ids
+from prompt_compaction import compact_entity, dumps_compact, estimate_tokens
+from prompts import FULL_SYSTEM_PROMPT, create_batch_prompt, sanitize_tag, sanitize_trigger, sanitize_variable
+from rules import collect_tracking_ids, render_tracking_ids_markdown
+from tag_cache import fingerprint_tags, split_tag_sections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_TOKEN_BUDGET = 3000  # Estimated prompt tokens of compacted tag/trigger/variable JSON per batch
+DEFAULT_MAX_CONCURRENCY = 4
+BATCH_FAILURE_NOTE = "**Analysis failed for these tags, please try again later:**"
+
+
+def build_batches(index, token_budget=DEFAULT_BATCH_TOKEN_BUDGET, tags=None):
+    """Split tags (default: all of them) into token-budgeted batches, each carrying the triggers and variables its tags reference.
+
+    Tags keep their container order; a tag larger than the budget gets a batch of its own.
+    """
+    entity_tokens = {}
+
+    def cost(key, entity, sanitize):
+        if key not in entity_tokens:
+            entity_tokens[key] = estimate_tokens(dumps_compact(compact_entity(sanitize(entity))))
+        return entity_tokens[key]
+
+    batches = []
+    current = None
+    for tag in index.tags if tags is None else tags:
+        triggers, variables = index.tag_dependencies(tag)
+        tag_cost = cost(('tag', tag.get('tagId')), tag, lambda entity: sanitize_tag(index, entity))
+
+        if current is not None:
+            added_cost = tag_cost
+            added_cost += sum(cost(('trigger', t.get('triggerId')), t, sanitize_trigger) for t in triggers if t.get('triggerId') not in current['triggers'])
+            added_cost += sum(cost(('variable', v.get('name')), v, sanitize_variable) for v in variables if v.get('name') not in current['variables'])
+            if current['tokens'] + added_cost > token_budget:
+                current = None
+
+        if current is None:
+            current = {'tags': [], 'triggers': {}, 'variables': {}, 'tokens': 0}
+            batches.append(current)
+
+        current['tags'].append(tag)
+        current['tokens'] += tag_cost
+        for trigger in triggers:
+            if trigger.get('triggerId') not in current['triggers']:
+                current['triggers'][trigger.get('triggerId')] = trigger
+                current['tokens'] += cost(('trigger', trigger.get('triggerId')), trigger, sanitize_trigger)
+        for variable in variables:
+            if variable.get('name') not in current['variables']:
+                current['variables'][variable.get('name')] = variable
+                current['tokens'] += cost(('variable', variable.get('name')), variable, sanitize_variable)
+
+    return batches
+
+
+async def analyze_batch(index, batch, backend, semaphore):
+    """Analyse one batch of tags, holding a slot of the concurrency semaphore for the request (and its retries)."""
+    prompt = create_batch_prompt(index, batch['tags'], list(batch['triggers'].values()), list(batch['variables'].values()))
+    async with semaphore:
+        return await backend.complete_async([
+            {"role": "system", "content": FULL_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ])
+
+
+def tag_list(tags):
+    return ', '.join(f"`{tag.get('name', 'Unnamed Tag')}`" for tag in tags)
+
+
+def merge_report(index, results, tag_sections=None):
+    """Merge tag sections behind the container-wide tracking ID summary.
+
+    `tag_sections` maps tag IDs to per-tag findings and is output in container order;
+    `results` holds batch analyses that couldn't be split per tag.
+    """
+    sections = [render_tracking_ids_markdown(collect_tracking_ids(index))]
+    if tag_sections:
+        sections.extend(tag_sections[tag.get('tagId')] for tag in index.tags if tag_sections.get(tag.get('tagId')))
+    sections.extend(result for result in results if result)
+    return '\n\n'.join(section for section in sections if section)
+
+
+async def analyze_batches(index, backend, token_budget=DEFAULT_BATCH_TOKEN_BUDGET, max_concurrency=DEFAULT_MAX_CONCURRENCY, on_update=None, cache=None, previous_sections=None):
+    """Map-reduce analysis: analyse tag batches concurrently, then merge them into one report.
+
+    With a per-tag `cache` (see tag_cache.py), only tags whose fingerprint has no cached
+    findings are sent to the LLM, and new per-tag findings are written back.
+    `previous_sections` maps tag IDs to findings reused as-is, for tags a diff against the
+    previous version shows are unaffected (see container_diff.py).
+    """
+    fingerprints = fingerprint_tags(index) if cache is not None else {}
+    cached = cache.get_many(set(fingerprints.values())) if cache is not None else {}
+    tag_sections = {tag_id: section for tag_id, section in (previous_sections or {}).items() if tag_id in index.tags_by_id}
+    tag_sections.update((tag_id, cached[fingerprint]) for tag_id, fingerprint in fingerprints.items() if fingerprint in cached)
+    pending_tags = [tag for tag in index.tags if tag.get('tagId') not in tag_sections]
+
+    batches = build_batches(index, token_budget, pending_tags)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = [None] * len(batches)
+    logger.info(f"Analysing {len(pending_tags)} of {len(index.tags)} tags in {len(batches)} batches (concurrency {max_concurrency}, {len(tag_sections)} cached)")
+
+    async def run(i, batch):
+        try:
+            analysis = await analyze_batch(index, batch, backend, semaphore)
+            if not analysis.strip():
+                raise ValueError("empty reply")
+            sections = split_tag_sections(analysis, batch['tags'])
+            if sections is None:
+                results[i] = analysis
+            else:
+                tag_sections.update(sections)
+                if cache is not None:
+                    cache.set_many({fingerprints[tag_id]: section for tag_id, section in sections.items()})
+                # Tags the reply left out are neither cached nor reported as clean
+                missing = [tag for tag in batch['tags'] if tag.get('tagId') not in sections]
+                if missing:
+                    logger.warning(f"Batch {i + 1}/{len(batches)} reply covered {len(sections)} of {len(batch['tags'])} tags")
+                    results[i] = f"{BATCH_FAILURE_NOTE} {tag_list(missing)}"
+        except Exception as e:
+            logger.error(f"Error analysing batch {i + 1}/{len(batches)}: {str(e)}")
+            results[i] = f"{BATCH_FAILURE_NOTE} {tag_list(batch['tags'])}"
+        if on_update:
+            on_update(merge_report(index, results, tag_sections))
+
+    await asyncio.gather(*(run(i, batch) for i, batch in enumerate(batches)))
+    return merge_report(index, results, tag_sections)
+
+
+def analyze_chunked(index, backend, token_budget=DEFAULT_BATCH_TOKEN_BUDGET, max_concurrency=DEFAULT_MAX_CONCURRENCY, on_update=None, cache=None, previous_sections=None):
+    """Run the map-reduce analysis from synchronous code, through an LLM backend (see llm_backend.py)."""
+    return asyncio.run(analyze_batches(index, backend, token_budget, max_concurrency, on_update, cache, previous_sections))
+
+
+def reusable_sections(index, diff, previous_analysis):
+    """Per-tag findings from a previous version's analysis, for tags `diff` shows are unaffected.
+
+    The previous analysis must come from the same prompt version; analyses with failed
+    batches are never reused. Only tags with a section of their own are reused: saved
+    analyses leave clean tags out, so they can't be told apart from tags the analysis missed.
+    """
+    if not previous_analysis or BATCH_FAILURE_NOTE in previous_analysis:
+        return {}
+    affected = affected_tag_ids(diff, index)
+    unaffected = [tag for tag in index.tags if tag.get('tagId') not in affected]
+    sections = split_tag_sections(previous_analysis, unaffected) or {}
+    logger.info(f"Reusing previous findings for {len(sections)} of {len(index.tags)} tags")
+    return sections
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from batch_analysis import BATCH_FAILURE_NOTE, DEFAULT_BATCH_TOKEN_BUDGET, DEFAULT_MAX_CONCURRENCY, analyze_batches
+from config_hash import hash_config_bytes
+from container_index import ContainerIndex
+from gtm_loader import parse_gtm_config
+from llm_backend import create_backend
+from findings_report import build_report
+from report_export import EXPORT_FORMATS, export_file_name, render_report
+from rules import combine_analysis, render_findings_markdown, run_rules
+from tag_cache import MemoryTagCache
+from tracing import count, metrics, span, start_trace
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTAINER_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+
+
+class RateLimiter:
+    """Async limiter spacing requests evenly to at most `requests_per_minute`."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class RateLimitedBackend:
+    """Wraps an LLM backend so every async completion waits for the shared rate limiter."""
+
+    def __init__(self, backend, limiter):
+        self._backend = backend
+        self._limiter = limiter
+
+    async def complete_async(self, messages):
+        await self._limiter.wait()
+        return await self._backend.complete_async(messages)
+
+
+def find_inputs(patterns):
+    """Expand directories (their *.json files) and glob patterns into a sorted list of paths."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(glob.glob(os.path.join(pattern, '*.json')))
+        else:
+            paths.update(path for path in glob.glob(pattern) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def output_names(paths, export_formats=()):
+    """Name each input's results after its file, adding a hash of its path when inputs from different directories share a name.
+
+    Raises ValueError if any result or export paths still collide (e.g. an input named x.report.json with
+    a JSON export of x.json), since one input's results would overwrite another's.
+    """
+    basenames = {path: os.path.splitext(os.path.basename(path))[0] for path in paths}
+    by_name = {}
+    for path, name in basenames.items():
+        # Lowercased, as output directories may be on case-insensitive filesystems
+        by_name.setdefault(name.lower(), []).append(path)
+    names = {}
+    for path, name in basenames.items():
+        if len(by_name[name.lower()]) > 1:
+            name = f"{name}-{hashlib.blake2b(os.path.abspath(path).encode(), digest_size=4).hexdigest()}"
+        names[path] = name
+    output_paths = []
+    for name in names.values():
+        json_path, export_paths = result_paths(name, '', export_formats)
+        output_paths.extend([json_path, *export_paths.values()])
+    collisions = len(output_paths) - len({output_path.lower() for output_path in output_paths})
+    if collisions:
+        raise ValueError(f"{collisions} input files would write to the same result files")
+    return names
+
+
+def result_paths(name, output_dir, export_formats):
+    """The result path, <name>.json, and an export path per format, <name>.report.<extension>.
+
+    Exports are named apart from the result, so a JSON export doesn't overwrite it (or the other way round).
+    """
+    return os.path.join(output_dir, f"{name}.json"), {
+        export_format: os.path.join(output_dir, f"{name}.report.{EXPORT_FORMATS[export_format]['extension']}")
+        for export_format in export_formats
+    }
+
+
+def render_exports(report, export_paths):
+    for export_format, export_path in export_paths.items():
+        with span('export', format=export_format) as attributes:
+            export = render_report(report, export_format)
+            attributes['bytes'] = len(export)
+        count('export_bytes', len(export))
+        with open(export_path, 'wb') as file:
+            file.write(export)
+
+
+def stage_seconds(trace):
+    """Total seconds per top-level stage of a trace."""
+    stages = {}
+    for span_record in trace.spans:
+        if span_record['depth'] == 0:
+            stages[span_record['name']] = round(stages.get(span_record['name'], 0) + span_record['duration'], 3)
+    return stages
+
+
+def is_complete(json_path, path, config_hash):
+    """Whether a previous run already audited this exact content from this file successfully."""
+    try:
+        with open(json_path) as file:
+            result = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return False
+    return (
+        result.get('status') == 'ok'
+        and result.get('config_hash') == config_hash
+        and os.path.abspath(result.get('file', '')) == os.path.abspath(path)
+    )
+
+
+def write_json(path, data):
+    # Write then rename, so an interrupted run never leaves a truncated result that looks complete
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(data, file, indent=2, default=str)
+    os.replace(temp_path, path)
+
+
+async def audit_container(path, name, args, backend, tag_cache):
+    """Audit one export, writing <name>.json (with the findings report) and <name>.report.<extension> per export format. Returns the result status."""
+    with start_trace('audit_container', file=path) as trace:
+        return await audit_traced(path, name, args, backend, tag_cache, trace)
+
+
+async def audit_traced(path, name, args, backend, tag_cache, trace):
+    json_path, export_paths = result_paths(name, args.output, args.formats)
+    with span('read') as attributes:
+        with open(path, 'rb') as file:
+            data = file.read()
+        attributes['bytes'] = len(data)
+    count('upload_bytes', len(data))
+    with span('hash'):
+        config_hash = hash_config_bytes(data)
+    if not args.force and is_complete(json_path, path, config_hash):
+        logger.info(f"Skipping {path}: already audited")
+        return 'skipped'
+
+    start = time.perf_counter()
+    result = {'file': path, 'config_hash': config_hash}
+    try:
+        with span('parse'):
+            index = ContainerIndex(parse_gtm_config(data), config_hash)
+        config_summary = index.summary()
+        with span('rules'):
+            findings = run_rules(index)
+        with span('llm_analysis', tags=len(index.tags)):
+            analysis = await analyze_batches(index, backend, args.token_budget, args.llm_concurrency, cache=tag_cache)
+        if BATCH_FAILURE_NOTE in analysis:
+            raise RuntimeError("Some tag batches failed to analyse")
+        analysis = combine_analysis(render_findings_markdown(findings), analysis)
+        with span('build_report'):
+            report = build_report(index, analysis)
+        # Rendering is CPU-bound, so keep it off the event loop while other containers wait on the LLM
+        await asyncio.to_thread(render_exports, report, export_paths)
+        result.update({
+            'status': 'ok',
+            'summary': config_summary,
+            'findings': findings,
+            'tracking_ids': report['tracking_ids'],
+            'report': report,
+            'analysis': analysis,
+            'exports': {
+                export_format: {'path': export_path, 'name': export_file_name(config_summary['container_name'], export_format)}
+                for export_format, export_path in export_paths.items()
+            },
+        })
+        logger.info(f"Audited {path} in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        logger.error(f"Error auditing {path}: {str(e)}")
+        result.update({'status': 'failed', 'error': str(e)})
+    result.update({
+        'duration_seconds': round(time.perf_counter() - start, 3),
+        'stage_seconds': stage_seconds(trace),
+        'completed_at': datetime.now().isoformat(),
+    })
+    write_json(json_path, result)
+    return result['status']
+
+
+async def audit_all(paths, names, args, backend):
+    limiter = RateLimiter(args.requests_per_minute)
+    rate_limited_backend = RateLimitedBackend(backend, limiter)
+    # Shared across containers, so tags duplicated between client containers are only analysed once
+    tag_cache = MemoryTagCache()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run(path):
+        async with semaphore:
+            return await audit_container(path, names[path], args, rate_limited_backend, tag_cache)
+
+    return await asyncio.gather(*(run(path) for path in paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit GTM container exports without the Streamlit UI, writing a JSON result and report exports per container.")
+    parser.add_argument("inputs", nargs='+', help="Directories of GTM exports or glob patterns, e.g. json-examples/ or 'exports/*.json'")
+    parser.add_argument("-o", "--output", default="./audit-results", help="Directory for results (default: ./audit-results)")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONTAINER_CONCURRENCY, help=f"Containers audited at once (default: {DEFAULT_CONTAINER_CONCURRENCY})")
+    parser.add_argument("--llm-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help=f"Concurrent LLM requests per container (default: {DEFAULT_MAX_CONCURRENCY})")
+    parser.add_argument("--requests-per-minute", type=float, default=DEFAULT_REQUESTS_PER_MINUTE, help=f"LLM request rate limit across all containers, 0 for none (default: {DEFAULT_REQUESTS_PER_MINUTE})")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_BATCH_TOKEN_BUDGET, help=f"Prompt tokens per batch (default: {DEFAULT_BATCH_TOKEN_BUDGET})")
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"), help="OpenAI-compatible API base URL, e.g. http://127.0.0.1:8787/v1 for mock_llm_server.py")
+    parser.add_argument("--formats", type=lambda value: value.split(','), default=['pdf'], help=f"Comma-separated export formats per container, from {', '.join(EXPORT_FORMATS)} (default: pdf)")
+    parser.add_argument("--metrics", help="File to write Prometheus text metrics (stage durations, tokens, bytes) to when the run finishes")
+    parser.add_argument("-f", "--force", action="store_true", help="Re-audit containers that already have successful results")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    unknown_formats = [export_format for export_format in args.formats if export_format not in EXPORT_FORMATS]
+    if unknown_formats:
+        parser.error(f"Unknown export formats: {', '.join(unknown_formats)}")
+
+    paths = find_inputs(args.inputs)
+    if not paths:
+        parser.error("No JSON files found")
+    try:
+        names = output_names(paths, args.formats)
+    except ValueError as e:
+        parser.error(str(e))
+    os.makedirs(args.output, exist_ok=True)
+
+    backend = create_backend(base_url=args.base_url)
+
+    start = time.perf_counter()
+    statuses = asyncio.run(audit_all(paths, names, args, backend))
+    counts = {status: statuses.count(status) for status in ('ok', 'skipped', 'failed')}
+    usage = backend.snapshot()
+    print(f"Audited {len(paths)} containers in {time.perf_counter() - start:.1f}s: {counts['ok']} ok, {counts['skipped']} skipped, {counts['failed']} failed")
+    print(f"LLM usage: {usage['requests']} requests, {usage['retries']} retries, {usage['prompt_tokens']} prompt tokens, {usage['completion_tokens']} completion tokens")
+    if args.metrics:
+        with open(args.metrics, 'w') as file:
+            file.write(metrics.prometheus_text())
+    if counts['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
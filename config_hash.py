@@ -0,0 +1,11 @@
+import hashlib
+import re
+
+# Fields that change on every export or version without the container's content changing
+VOLATILE_FIELDS = ('fingerprint', 'exportTime', 'containerVersionId', 'path', 'tagManagerUrl')
+VOLATILE_FIELD_PATTERN = re.compile(rb'"(?:' + b'|'.join(field.encode() for field in VOLATILE_FIELDS) + rb')"\s*:\s*"(?:[^"\\]|\\.)*",?')
+
+
+def hash_config_bytes(data):
+    """Hash a raw GTM export with volatile fields stripped, so re-exports of the same content match."""
+    return hashlib.blake2b(VOLATILE_FIELD_PATTERN.sub(b'', data), digest_size=16).hexdigest()
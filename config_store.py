@@ -0,0 +1,160 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+
+from query_timing import execute_timed
+from local_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+STORAGE_FORMAT = 'gtm-config/1'
+# Entity lists stored once per distinct content, so unchanged entities cost nothing on re-upload.
+# Custom templates are included because their templateData usually dominates the export's size
+DEDUPLICATED_SECTIONS = ('tag', 'trigger', 'variable', 'customTemplate')
+BLOB_QUERY_CHUNK_SIZE = 200  # Hashes per .in_() filter, keeping request URLs well under server limits
+
+# Decompressed entity JSON by content hash. Blobs are immutable, so this is shared across projects and sessions;
+# each decode parses its own entities from it, so a config changed in place never changes another's
+entity_cache = LRUCache(max_entries=20000)
+
+
+def compress_json(value):
+    """Compact JSON, gzipped and base64-encoded so it fits a text column."""
+    data = json.dumps(value, separators=(',', ':')).encode()
+    return base64.b64encode(gzip.compress(data, mtime=0)).decode()
+
+
+def decompress_json(text):
+    return json.loads(decompress_text(text))
+
+
+def decompress_text(text):
+    return gzip.decompress(base64.b64decode(text))
+
+
+def entity_hash(entity):
+    return hashlib.blake2b(json.dumps(entity, sort_keys=True, separators=(',', ':')).encode(), digest_size=16).hexdigest()
+
+
+def encode_config(config):
+    """Split a config into a manifest and its entity blobs.
+
+    The manifest holds the compressed config with tags, triggers, variables and templates replaced by
+    content hashes; blobs maps each hash to its compressed entity.
+    """
+    container_version = config.get('containerVersion', {})
+    skeleton = {**config, 'containerVersion': {key: value for key, value in container_version.items() if key not in DEDUPLICATED_SECTIONS}}
+    entities = {}
+    blobs = {}
+    for section in DEDUPLICATED_SECTIONS:
+        if section not in container_version:
+            continue
+        hashes = []
+        for entity in container_version.get(section, []):
+            hash_value = entity_hash(entity)
+            hashes.append(hash_value)
+            blobs[hash_value] = compress_json(entity)
+        entities[section] = hashes
+    manifest = {'format': STORAGE_FORMAT, 'skeleton': compress_json(skeleton), 'entities': entities}
+    return manifest, blobs
+
+
+def is_manifest(stored):
+    return isinstance(stored, dict) and stored.get('format') == STORAGE_FORMAT
+
+
+def decode_config(stored, blob_store):
+    """Rebuild a config from its stored form, fetching only entities not already decoded.
+
+    Projects saved before this format hold the raw config JSON, which is returned as-is.
+    """
+    if isinstance(stored, str):
+        stored = json.loads(stored)
+    if not is_manifest(stored):
+        return stored
+
+    config = decompress_json(stored['skeleton'])
+    all_hashes = {hash_value for hashes in stored['entities'].values() for hash_value in hashes}
+    entity_texts = {}
+    for hash_value in all_hashes:
+        text = entity_cache.get(hash_value)
+        if text is not None:
+            entity_texts[hash_value] = text
+    missing = all_hashes - entity_texts.keys()
+    if missing:
+        for hash_value, blob in blob_store.get_many(missing).items():
+            text = decompress_text(blob)
+            entity_cache.set(hash_value, text, size=len(text))
+            entity_texts[hash_value] = text
+        logger.info(f"Decoded {len(missing)} of {len(all_hashes)} config entities from storage")
+
+    container_version = config.setdefault('containerVersion', {})
+    for section, hashes in stored['entities'].items():
+        # Empty sections are kept, so configs round-trip exactly
+        container_version[section] = [json.loads(entity_texts[hash_value]) for hash_value in hashes]
+    return config
+
+
+def stored_config_hash(stored):
+    """Hash of a project's stored config, which changes whenever the config does, without decoding it."""
+    text = stored if isinstance(stored, str) else json.dumps(stored, sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def store_config(config, blob_store):
+    """Write a config's new entity blobs and return the manifest JSON to save on the project."""
+    manifest, blobs = encode_config(config)
+    # One upsert that skips stored hashes, rather than checking which exist first
+    blob_store.set_many(blobs)
+    logger.info(f"Stored config: {len(blobs)} entities")
+    return json.dumps(manifest)
+
+
+def chunks(values, size=BLOB_QUERY_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class SupabaseBlobStore:
+    """Compressed config entities keyed by content hash, stored in the Supabase 'config_blobs' table.
+
+    Errors propagate, since a project whose entities weren't stored can't be loaded back.
+    """
+
+    def __init__(self, client_factory, user_id):
+        self.client_factory = client_factory
+        self.user_id = str(user_id)
+
+    def get_many(self, hashes):
+        """Return {hash: blob} for the requested hashes."""
+        blobs = {}
+        for chunk in chunks(hashes):
+            result = execute_timed(self.client_factory().table('config_blobs').select("hash, data").eq('user_id', self.user_id).in_('hash', chunk), "get config blobs")
+            blobs.update((row['hash'], row['data']) for row in (result.data if result else []))
+        return blobs
+
+    def set_many(self, blobs):
+        """Store {hash: blob}; blobs are immutable, so existing rows are left alone."""
+        if not blobs:
+            return
+        execute_timed(self.client_factory().table('config_blobs').upsert([
+            {"hash": hash_value, "user_id": self.user_id, "data": blob}
+            for hash_value, blob in blobs.items()
+        ], on_conflict='hash,user_id', ignore_duplicates=True), "save config blobs")
+
+
+class MemoryBlobStore:
+    """In-process blob store with the same interface as SupabaseBlobStore."""
+
+    def __init__(self):
+        self.blobs = {}
+
+    def get_many(self, hashes):
+        return {hash_value: self.blobs[hash_value] for hash_value in hashes if hash_value in self.blobs}
+
+    def set_many(self, blobs):
+        for hash_value, blob in blobs.items():
+            self.blobs.setdefault(hash_value, blob)
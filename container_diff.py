@@ -0,0 +1,123 @@
+ENTITY_ID_KEYS = {'tag': 'tagId', 'trigger': 'triggerId', 'variable': 'variableId'}
+# Fields that differ between exports without the entity itself changing; parameters are diffed by key instead
+IGNORED_FIELDS = {'accountId', 'containerId', 'fingerprint', 'path', 'tagManagerUrl', 'parameter'}
+
+
+def diff_parameters(old_parameters, new_parameters):
+    """Diff two parameter lists by key, returning (added, removed, changed) key lists."""
+    old_by_key = {parameter.get('key'): parameter for parameter in old_parameters or []}
+    new_by_key = {parameter.get('key'): parameter for parameter in new_parameters or []}
+    added = [key for key in new_by_key if key not in old_by_key]
+    removed = [key for key in old_by_key if key not in new_by_key]
+    changed = [key for key, parameter in new_by_key.items() if key in old_by_key and old_by_key[key] != parameter]
+    return added, removed, changed
+
+
+def diff_entity(old, new):
+    """Describe how an entity changed, or return None if it didn't."""
+    fields = sorted(
+        key for key in old.keys() | new.keys()
+        if key not in IGNORED_FIELDS and old.get(key) != new.get(key)
+    )
+    added, removed, changed = diff_parameters(old.get('parameter'), new.get('parameter'))
+    if not (fields or added or removed or changed):
+        return None
+    return {
+        'fields': fields,
+        'parameters_added': added,
+        'parameters_removed': removed,
+        'parameters_changed': changed,
+    }
+
+
+def diff_section(old_entities, new_entities, id_key):
+    """Diff two entity lists matched by ID, in a single pass over each."""
+    old_by_id = {entity.get(id_key): entity for entity in old_entities}
+    diff = {'added': [], 'removed': [], 'changed': []}
+    seen = set()
+    for entity in new_entities:
+        entity_id = entity.get(id_key)
+        seen.add(entity_id)
+        old = old_by_id.get(entity_id)
+        if old is None:
+            diff['added'].append({'id': entity_id, 'name': entity.get('name')})
+            continue
+        changes = diff_entity(old, entity)
+        if changes:
+            diff['changed'].append({'id': entity_id, 'name': entity.get('name'), 'old_name': old.get('name'), **changes})
+    diff['removed'] = [
+        {'id': entity_id, 'name': entity.get('name')}
+        for entity_id, entity in old_by_id.items() if entity_id not in seen
+    ]
+    return diff
+
+
+def diff_configs(old_config, new_config):
+    """Structural diff of two container versions, keyed by kind ('tag', 'trigger', 'variable')."""
+    old_version = old_config.get('containerVersion', {})
+    new_version = new_config.get('containerVersion', {})
+    return {
+        kind: diff_section(old_version.get(kind, []), new_version.get(kind, []), id_key)
+        for kind, id_key in ENTITY_ID_KEYS.items()
+    }
+
+
+def has_changes(diff):
+    return any(section[change] for section in diff.values() for change in ('added', 'removed', 'changed'))
+
+
+def affected_tag_ids(diff, index):
+    """IDs of tags in the new version whose analysis may differ from the old one.
+
+    That's added and changed tags, tags using a changed or removed trigger, and tags reaching
+    a changed or removed variable through any chain of references.
+    """
+    affected = {entry['id'] for change in ('added', 'changed') for entry in diff['tag'][change]}
+
+    # Both names of renamed variables, since references may use either
+    variable_names = set()
+    for change in ('added', 'removed', 'changed'):
+        for entry in diff['variable'][change]:
+            variable_names.add(entry['name'])
+            if entry.get('old_name'):
+                variable_names.add(entry['old_name'])
+
+    trigger_ids = {entry['id'] for change in ('removed', 'changed') for entry in diff['trigger'][change]}
+
+    pending = list(variable_names)
+    while pending:
+        references = index.variable_references.get(pending.pop(), {})
+        affected.update(references.get('tag', []))
+        trigger_ids.update(references.get('trigger', []))
+        for variable_id in references.get('variable', []):
+            name = index.variables_by_id.get(variable_id, {}).get('name')
+            if name and name not in variable_names:
+                variable_names.add(name)
+                pending.append(name)
+
+    for trigger_id in trigger_ids:
+        affected.update(index.tags_by_firing_trigger.get(trigger_id, []))
+        affected.update(index.tags_by_blocking_trigger.get(trigger_id, []))
+    return affected
+
+
+def render_diff_markdown(diff):
+    """Render a diff as markdown, listing changed parameter keys per entity."""
+    if not has_changes(diff):
+        return "No changes to tags, triggers or variables."
+    lines = []
+    for kind, section in diff.items():
+        for entry in section['added']:
+            lines.append(f"- Added {kind} `{entry['name']}`")
+        for entry in section['removed']:
+            lines.append(f"- Removed {kind} `{entry['name']}`")
+        for entry in section['changed']:
+            details = []
+            if entry['old_name'] != entry['name']:
+                details.append(f"renamed from `{entry['old_name']}`")
+            details.extend(f"`{field}`" for field in entry['fields'] if field != 'name')
+            for label, keys in (('added', entry['parameters_added']), ('removed', entry['parameters_removed']), ('changed', entry['parameters_changed'])):
+                if keys:
+                    details.append(f"parameters {label}: {', '.join(f'`{key}`' for key in keys)}")
+            lines.append(f"- Changed {kind} `{entry['name']}`: {'; '.join(details)}")
+    return '\n'.join(lines)
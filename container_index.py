@@ -0,0 +1,226 @@
+import re
+
+from gtm_model import convert_config, parameter_value
+
+# Triggers GTM provides without listing them in the export
+BUILT_IN_TRIGGERS = {
+    '2147479553': 'All Pages',
+    '2147479572': 'Consent Initialization - All Pages',
+    '2147479573': 'Initialization - All Pages',
+}
+
+VARIABLE_REFERENCE_PATTERN = re.compile(r'\{\{([^{}]+)\}\}')
+
+
+def platform_from_name(name):
+    """Derive the platform from a '[Platform] | [Type] | [Description]' tag name."""
+    return name.split('|')[0].strip() if '|' in name else 'Unknown'
+
+
+def find_variable_references(value, found=None):
+    """Collect the names of all {{Variable}} references in a nested tag/trigger/variable structure."""
+    if found is None:
+        found = set()
+    if isinstance(value, str):
+        if '{{' in value:
+            found.update(name.strip() for name in VARIABLE_REFERENCE_PATTERN.findall(value))
+    elif isinstance(value, dict):
+        for item in value.values():
+            find_variable_references(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            find_variable_references(item, found)
+    return found
+
+
+class ContainerIndex:
+    """Lookup tables and cross-references for a GTM container, built once per upload."""
+
+    def __init__(self, config, config_hash=None):
+        # Entities from gtm_loader are already model instances; other sources are converted to copies once here
+        self.config = convert_config(config)
+        # Content hash of the upload (see config_hash.py) or saved project (config_store.stored_config_hash),
+        # used to key analyses and reports
+        self.config_hash = config_hash
+        container_version = self.config['containerVersion']
+        self.container_version = container_version
+        self.tags = container_version.get('tag', [])
+        self.triggers = container_version.get('trigger', [])
+        self.variables = container_version.get('variable', [])
+        self.folders = container_version.get('folder', [])
+
+        self.tags_by_id = {tag.get('tagId'): tag for tag in self.tags}
+        self.tags_by_name = {tag.get('name'): tag for tag in self.tags}
+        self.triggers_by_id = {trigger.get('triggerId'): trigger for trigger in self.triggers}
+        self.triggers_by_name = {trigger.get('name'): trigger for trigger in self.triggers}
+        self.variables_by_id = {variable.get('variableId'): variable for variable in self.variables}
+        self.variables_by_name = {variable.get('name'): variable for variable in self.variables}
+        self.folders_by_id = {folder.get('folderId'): folder for folder in self.folders}
+        self.built_in_variable_names = {variable.get('name') for variable in container_version.get('builtInVariable', [])}
+
+        # Custom template entity types are cvt_<containerId>_<templateId>
+        container_id = container_version.get('containerId', '')
+        self.templates_by_type = {
+            f"cvt_{container_id}_{template.get('templateId')}": template
+            for template in container_version.get('customTemplate', [])
+        }
+        self.template_names = {
+            template_type: template.get('name', 'Unknown')
+            for template_type, template in self.templates_by_type.items()
+        }
+
+        # Reverse maps: trigger id -> tag ids, variable name -> referencing entities
+        self.tags_by_firing_trigger = {}
+        self.tags_by_blocking_trigger = {}
+        # Tag name -> ids of the tags firing it as their setup or teardown tag (tag sequencing)
+        self.sequencing_tags = {}
+        self.variable_references = {}
+        # Variables referenced by each entity, keyed by (kind, id)
+        self.references_by_entity = {}
+        # Folder tree: folder id (None for unfiled) -> entity ids per kind
+        self.folder_contents = {folder_id: {'tag': [], 'trigger': [], 'variable': []} for folder_id in self.folders_by_id}
+        self.folder_contents[None] = {'tag': [], 'trigger': [], 'variable': []}
+
+        for tag in self.tags:
+            tag_id = tag.get('tagId')
+            for trigger_id in tag.get('firingTriggerId', []):
+                self.tags_by_firing_trigger.setdefault(trigger_id, []).append(tag_id)
+            for trigger_id in tag.get('blockingTriggerId', []):
+                self.tags_by_blocking_trigger.setdefault(trigger_id, []).append(tag_id)
+            for sequenced in tag.get('setupTag', []) + tag.get('teardownTag', []):
+                self.sequencing_tags.setdefault(sequenced.get('tagName'), []).append(tag_id)
+            self._index_entity('tag', tag_id, tag)
+
+        for trigger in self.triggers:
+            self._index_entity('trigger', trigger.get('triggerId'), trigger)
+
+        for variable in self.variables:
+            self._index_entity('variable', variable.get('variableId'), variable)
+
+        self._summary = None
+        self._entity_rows = {}
+
+    def _index_entity(self, kind, entity_id, entity):
+        """Record folder membership and variable references for one entity."""
+        folder_id = entity.get('parentFolderId')
+        self.folder_contents.setdefault(folder_id, {'tag': [], 'trigger': [], 'variable': []})[kind].append(entity_id)
+
+        references = find_variable_references(entity.get('parameter', []))
+        if kind == 'trigger':
+            for key in ('customEventFilter', 'filter', 'autoEventFilter'):
+                find_variable_references(entity.get(key, []), references)
+        self.references_by_entity[(kind, entity_id)] = references
+        for name in references:
+            self.variable_references.setdefault(name, {'tag': [], 'trigger': [], 'variable': []})[kind].append(entity_id)
+
+    def get_entity(self, kind, entity_id):
+        """Look up a tag, trigger or variable by kind and ID."""
+        lookup = {'tag': self.tags_by_id, 'trigger': self.triggers_by_id, 'variable': self.variables_by_id}[kind]
+        return lookup.get(entity_id)
+
+    def trigger_name(self, trigger_id):
+        """Resolve a trigger ID to its name, including GTM's built-in triggers."""
+        trigger = self.triggers_by_id.get(trigger_id)
+        if trigger:
+            return trigger.get('name', 'Unnamed Trigger')
+        return BUILT_IN_TRIGGERS.get(trigger_id)
+
+    def folder_name(self, folder_id):
+        """Resolve a folder ID to its name."""
+        folder = self.folders_by_id.get(folder_id)
+        return folder.get('name') if folder else None
+
+    def type_name(self, entity_type):
+        """Resolve cvt_ custom template types to the template name."""
+        return self.template_names.get(entity_type, entity_type)
+
+    def is_variable_defined(self, name):
+        """Check whether a {{Variable}} name resolves to a user-defined or built-in variable."""
+        # Names starting with an underscore (e.g. {{_event}}) are GTM internals
+        return name in self.variables_by_name or name in self.built_in_variable_names or name.startswith('_')
+
+    def resolve_value(self, value):
+        """Resolve a parameter value that is exactly one {{Variable}} reference to a constant, where possible."""
+        if not isinstance(value, str) or not value.startswith('{{') or not value.endswith('}}'):
+            return value
+        variable = self.variables_by_name.get(value[2:-2].strip())
+        if variable is None:
+            return value
+        # Constant variables hold the value directly; GA settings variables hold a UA tracking ID
+        key = {'c': 'value', 'gas': 'trackingId'}.get(variable.get('type'))
+        return parameter_value(variable, key, value) if key else value
+
+    def tag_triggers(self, tag):
+        """Return (firing, blocking) trigger names for a tag, keeping unresolved IDs as-is."""
+        firing = [self.trigger_name(trigger_id) or trigger_id for trigger_id in tag.get('firingTriggerId', [])]
+        blocking = [self.trigger_name(trigger_id) or trigger_id for trigger_id in tag.get('blockingTriggerId', [])]
+        return firing, blocking
+
+    def tag_dependencies(self, tag):
+        """Return the triggers and user-defined variables a tag depends on, resolved transitively."""
+        trigger_ids = tag.get('firingTriggerId', []) + tag.get('blockingTriggerId', [])
+        triggers = [self.triggers_by_id[trigger_id] for trigger_id in dict.fromkeys(trigger_ids) if trigger_id in self.triggers_by_id]
+
+        pending = list(self.references_by_entity.get(('tag', tag.get('tagId')), ()))
+        for trigger in triggers:
+            pending.extend(self.references_by_entity.get(('trigger', trigger.get('triggerId')), ()))
+        variables = {}
+        while pending:
+            name = pending.pop()
+            variable = self.variables_by_name.get(name)
+            if variable is None or name in variables:
+                continue
+            variables[name] = variable
+            pending.extend(self.references_by_entity.get(('variable', variable.get('variableId')), ()))
+        return triggers, list(variables.values())
+
+    def summary(self):
+        """Summarise the container; computed once and reused."""
+        if self._summary is None:
+            tag_types = {}
+            platforms = {}
+            folder_ids = {}
+            for tag in self.tags:
+                tag_type = tag['type']
+                tag_types[tag_type] = tag_types.get(tag_type, 0) + 1
+                platforms[platform_from_name(tag['name'])] = None
+                if 'parentFolderId' in tag:
+                    folder_ids[tag['parentFolderId']] = None
+            self._summary = {
+                'container_name': self.container_version.get('container', {}).get('name', 'Unknown'),
+                'tag_manager_url': self.container_version.get('tagManagerUrl', 'Unknown'),
+                'tag_count': len(self.tags),
+                'variable_count': len(self.variables),
+                'trigger_count': len(self.triggers),
+                'tag_types': tag_types,
+                'platforms': list(platforms),
+                'folder_ids': list(folder_ids),
+            }
+        return self._summary
+
+    def entity_rows(self, kind):
+        """One flat row per tag, trigger or variable for tabular display; computed once per kind."""
+        if kind not in self._entity_rows:
+            rows = []
+            for entity in {'tag': self.tags, 'trigger': self.triggers, 'variable': self.variables}[kind]:
+                row = {
+                    'ID': entity.id,
+                    'Name': entity.get('name', ''),
+                    'Type': self.type_name(entity.get('type', '')),
+                    'Folder': self.folder_name(entity.get('parentFolderId')) or '',
+                }
+                if kind == 'tag':
+                    firing, blocking = self.tag_triggers(entity)
+                    row['Fires on'] = ', '.join(firing)
+                    row['Blocked by'] = ', '.join(blocking)
+                    row['Paused'] = bool(entity.get('paused'))
+                elif kind == 'trigger':
+                    row['Tags'] = len(self.tags_by_firing_trigger.get(entity.id, []))
+                else:
+                    referencing = self.variable_references.get(entity.get('name'), {})
+                    row['Used by tags'] = len(referencing.get('tag', []))
+                    row['Used by triggers'] = len(referencing.get('trigger', []))
+                    row['Used by variables'] = len(referencing.get('variable', []))
+                rows.append(row)
+            self._entity_rows[kind] = rows
+        return self._entity_rows[kind]
@@ -0,0 +1,61 @@
+import logging
+import os
+import time
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "5"))  # Seconds before a query falls back to the local cache
+SUPABASE_CLIENT_POOL_SIZE = int(os.getenv("SUPABASE_CLIENT_POOL_SIZE", "100"))  # Concurrent sessions with a live client
+SESSION_REFRESH_MARGIN = 60  # Refresh access tokens this many seconds before they expire
+CLIENT_TTL = 60 * 60  # Access tokens last an hour, so pooled clients never need to outlive that
+
+
+def create_supabase_client():
+    """Create a new, unauthenticated Supabase client. The supabase package is imported on first use, as it's slow to import."""
+    from supabase import create_client
+    from supabase.lib.client_options import ClientOptions
+
+    return create_client(str(SUPABASE_URL or ''), str(SUPABASE_KEY or ''), ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT))
+
+
+@st.cache_resource(max_entries=SUPABASE_CLIENT_POOL_SIZE, ttl=CLIENT_TTL, show_spinner=False)
+def get_pooled_client(access_token, _refresh_token=None):
+    """Return a client authenticated with access_token, shared by every rerun of the session that holds it.
+
+    Keyed by access token only, so a refreshed token gets a fresh client and the old one ages out.
+    """
+    start = time.perf_counter()
+    client = create_supabase_client()
+    if access_token:
+        client.auth.set_session(access_token=access_token, refresh_token=_refresh_token)
+    logger.info(f"Supabase client created in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return client
+
+
+def refresh_session(session):
+    """Exchange the session's refresh token for a new session, storing it in session state."""
+    try:
+        client = get_pooled_client(session.access_token, session.refresh_token)
+        response = client.auth.refresh_session(session.refresh_token)
+        if response and response.session:
+            st.session_state['session'] = response.session
+            logger.info("Supabase session refreshed")
+            return response.session
+    except Exception as e:
+        logger.error(f"Error refreshing Supabase session: {str(e)}")
+    return session
+
+
+def get_supabase_client():
+    """Return the pooled client for the current session, refreshing the access token when it's about to expire."""
+    session = st.session_state.get('session')
+    if session is None:
+        return get_pooled_client(None)
+    if session.expires_at and session.expires_at - SESSION_REFRESH_MARGIN < time.time():
+        session = refresh_session(session)
+    return get_pooled_client(session.access_token, session.refresh_token)
+
@@ -0,0 +1,78 @@
+import logging
+import time
+
+import streamlit as st
+
+from app_common import JOB_POLL_INTERVAL
+from findings_report import build_report, report_cache_key
+from job_queue import FAILED, export_jobs
+from local_cache import report_cache
+from report_export import EXPORT_FORMATS, export_file_name, render_report
+from tracing import count, link_trace, span
+
+logger = logging.getLogger(__name__)
+
+def findings_report(index, analysis):
+    """The structured findings model for an analysis, built once and shared by every export format."""
+    key = (report_cache_key(index, analysis), 'model')
+    report = report_cache.get(key)
+    if report is None:
+        with span('build_report'):
+            report = build_report(index, analysis)
+        report_cache.set(key, report)
+    return report
+
+
+def render_export(key, index, analysis, export_format):
+    report = findings_report(index, analysis)
+    with span('export', format=export_format) as attributes:
+        export = render_report(report, export_format)
+        attributes['bytes'] = len(export)
+    count('export_bytes', len(export))
+    report_cache.set(key, export, size=len(export))
+    return export
+
+
+def export_findings(index, analysis):
+    """Offer the analysis findings as a download, rendering the chosen format in the background when first requested.
+
+    The findings model and each rendered format are cached, so switching formats or rerunning shows downloads directly.
+    """
+    export_format = st.selectbox(
+        "Export format",
+        list(EXPORT_FORMATS),
+        format_func=lambda export_format: EXPORT_FORMATS[export_format]['label'],
+        key="export_format"
+    )
+    label = EXPORT_FORMATS[export_format]['label']
+    key = (report_cache_key(index, analysis), export_format)
+    export = report_cache.get(key)
+    if export is None:
+        # Reruns while the export renders find its job in session state and resume polling it
+        job_ids = st.session_state.setdefault('export_job_ids', {})
+        job = export_jobs.get(job_ids[key]) if key in job_ids else None
+        if job is None:
+            if not st.button("Generate export of findings", type='primary'):
+                return
+            job_ids[key] = export_jobs.submit(key, lambda job: render_export(key, index, analysis, export_format))
+            job = export_jobs.get(job_ids[key])
+
+        with st.spinner(f"Generating {label}..."):
+            while not job.finished:
+                time.sleep(JOB_POLL_INTERVAL)
+        del job_ids[key]
+        link_trace(job.trace, job_id=job.id)
+
+        if job.status == FAILED:
+            st.error(f"Error generating {label} export: {job.error}")
+            return
+        export = job.result
+        logger.info(f"Findings exported as {label}")
+
+    # Provide download button with custom filename
+    st.download_button(
+        label=f"Download the findings ({label})",
+        data=export,
+        file_name=export_file_name(index.summary()['container_name'], export_format),
+        mime=EXPORT_FORMATS[export_format]['mime'],
+    )
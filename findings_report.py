@@ -0,0 +1,254 @@
+import hashlib
+import json
+import re
+
+from rules import (
+    RULE_TITLES, SEVERITY_ERROR, SEVERITY_INFO, SEVERITY_WARNING,
+    collect_tracking_ids, render_findings_markdown, run_rules,
+)
+
+REPORT_FORMAT = 'gtm-report/1'
+SEVERITY_ORDER = (SEVERITY_ERROR, SEVERITY_WARNING, SEVERITY_INFO)
+
+# Summary fields shown in every export
+SUMMARY_FIELDS = ('container_name', 'tag_manager_url', 'tag_count', 'variable_count', 'trigger_count')
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*?)\s*#*$')
+LIST_ITEM_PATTERN = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+RULE_PATTERN = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+TABLE_DIVIDER_PATTERN = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+INLINE_PATTERN = re.compile(r'`([^`]+)`|\*\*(.+?)\*\*|__(.+?)__|\*(\S(?:.*?\S)?)\*|~~(.+?)~~|\[([^\]]+)\]\(([^)\s]+)\)')
+MAX_LIST_DEPTH = 3
+
+# The analysis prompt asks for one section per tag, headed "Tag Name: 'XXXX'" in bold
+TAG_HEADING_PATTERN = re.compile(r"""^(?:#+\s*)?(?:\*\*|__)?\s*Tag Name:\s*['"‘’`]?(.+?)['"‘’`]?\s*(?:\*\*|__)?:?$""")
+# The prompt asks for ID discrepancies to be flagged as errors; other tag advice is a warning
+ERROR_TERMS = r'(errors?|discrepanc\w*|mismatch\w*|missing|broken)\b'
+ERROR_TERMS_PATTERN = re.compile(rf'\b{ERROR_TERMS}', re.IGNORECASE)
+# Negated terms, e.g. "No errors found", "Nothing is missing", "isn't broken", don't make advice an error
+NEGATED_ERROR_TERMS_PATTERN = re.compile(rf"(\b(no|not|nothing|none|without|never|zero)\b|n't\b)\s+([\w']+\s+){{0,2}}?{ERROR_TERMS}", re.IGNORECASE)
+# Links in exports may only point to these schemes; others (e.g. javascript:) are kept as plain text
+LINK_SCHEMES = ('http://', 'https://', 'mailto:')
+
+# Inline markup templates that just keep the text, for plain-text exports
+PLAIN_INLINE_TAGS = {'code': '{text}', 'bold': '{text}', 'italic': '{text}', 'strike': '{text}', 'link': '{text} ({url})'}
+
+
+def inline_markup(text, tags, escape=lambda text: text):
+    """Convert inline markdown (code, bold, italics, strikethrough, links) with a renderer's templates.
+
+    `tags` maps each span type to a template taking {text} (and {url} for links); `escape`
+    is applied to literal text, code and URLs.
+    """
+    parts = []
+    pos = 0
+    for match in INLINE_PATTERN.finditer(text):
+        parts.append(escape(text[pos:match.start()]))
+        code, bold, alt_bold, italic, strike, link_text, url = match.groups()
+        if code is not None:
+            parts.append(tags['code'].format(text=escape(code)))
+        elif bold is not None or alt_bold is not None:
+            parts.append(tags['bold'].format(text=inline_markup(bold if bold is not None else alt_bold, tags, escape)))
+        elif italic is not None:
+            parts.append(tags['italic'].format(text=inline_markup(italic, tags, escape)))
+        elif strike is not None:
+            parts.append(tags['strike'].format(text=inline_markup(strike, tags, escape)))
+        elif url.lower().startswith(LINK_SCHEMES):
+            parts.append(tags['link'].format(text=inline_markup(link_text, tags, escape), url=escape(url)))
+        else:
+            parts.append(escape(match.group(0)))
+        pos = match.end()
+    parts.append(escape(text[pos:]))
+    return ''.join(parts)
+
+
+def plain_text(text):
+    return inline_markup(text, PLAIN_INLINE_TAGS)
+
+
+def table_cells(line):
+    return [cell.strip() for cell in line.strip().strip('|').split('|')]
+
+
+def parse_markdown_blocks(text):
+    """Parse markdown into blocks, each a dict with a 'type' and that type's fields.
+
+    Covers what the analyses use: heading (level, text), paragraph (text), list_item (depth,
+    marker, text), code (text), table (rows) and rule. Text fields keep their inline markdown.
+    """
+    blocks = []
+    lines = text.splitlines()
+    paragraph = []
+    list_item = None
+
+    def flush():
+        nonlocal list_item
+        if paragraph:
+            blocks.append({'type': 'paragraph', 'text': ' '.join(paragraph)})
+            paragraph.clear()
+        if list_item is not None:
+            list_item['text'] = ' '.join(list_item['text'])
+            blocks.append(list_item)
+            list_item = None
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        i += 1
+
+        if not stripped:
+            flush()
+            continue
+
+        fence = FENCE_PATTERN.match(line)
+        if fence:
+            flush()
+            code_lines = []
+            while i < len(lines) and not lines[i].strip().startswith(fence.group(1)):
+                code_lines.append(lines[i])
+                i += 1
+            i += 1  # Closing fence
+            blocks.append({'type': 'code', 'text': '\n'.join(code_lines)})
+            continue
+
+        heading = HEADING_PATTERN.match(stripped)
+        if heading:
+            flush()
+            blocks.append({'type': 'heading', 'level': len(heading.group(1)), 'text': heading.group(2)})
+            continue
+
+        if RULE_PATTERN.match(line):
+            flush()
+            blocks.append({'type': 'rule'})
+            continue
+
+        if stripped.startswith('|') and i < len(lines) and TABLE_DIVIDER_PATTERN.match(lines[i]):
+            flush()
+            rows = [table_cells(line)]
+            i += 1  # Divider
+            while i < len(lines) and lines[i].strip().startswith('|'):
+                rows.append(table_cells(lines[i]))
+                i += 1
+            blocks.append({'type': 'table', 'rows': rows})
+            continue
+
+        item = LIST_ITEM_PATTERN.match(line)
+        if item:
+            flush()
+            depth = min(len(item.group(1).expandtabs(4)) // 2, MAX_LIST_DEPTH)
+            marker = '•' if item.group(2) in '-*+' else item.group(2)
+            list_item = {'type': 'list_item', 'depth': depth, 'marker': marker, 'text': [item.group(3)]}
+        elif list_item is not None:
+            list_item['text'].append(stripped)  # Continuation of the item's text
+        else:
+            paragraph.append(stripped)
+    flush()
+    return blocks
+
+
+def narrative_from_analysis(findings_markdown, analysis):
+    """Split the LLM narrative from an analysis stored with the automated check findings prepended."""
+    if findings_markdown and analysis.startswith(findings_markdown):
+        return analysis[len(findings_markdown):].lstrip()
+    return analysis
+
+
+def item_severity(text):
+    return SEVERITY_ERROR if ERROR_TERMS_PATTERN.search(NEGATED_ERROR_TERMS_PATTERN.sub('', text)) else SEVERITY_WARNING
+
+
+def highest_severity(severities):
+    return min(severities, key=SEVERITY_ORDER.index, default=SEVERITY_INFO)
+
+
+def build_checks(findings):
+    """Group the rule findings into one section per rule, in display order, with stable IDs."""
+    by_rule = {}
+    for finding in findings:
+        by_rule.setdefault(finding['rule'], []).append(finding)
+
+    checks = []
+    for rule, title in RULE_TITLES.items():
+        rule_findings = by_rule.get(rule)
+        if not rule_findings:
+            continue
+        seen = {}
+        items = []
+        for finding in rule_findings:
+            finding_id = f"{rule}:{finding['entity_kind'] or 'container'}:{finding['entity_id'] or ''}"
+            seen[finding_id] = seen.get(finding_id, 0) + 1
+            if seen[finding_id] > 1:
+                finding_id = f"{finding_id}#{seen[finding_id]}"
+            items.append({'id': finding_id, **finding})
+        checks.append({
+            'id': rule,
+            'title': title,
+            'severity': highest_severity(item['severity'] for item in items),
+            'findings': items,
+        })
+    return checks
+
+
+def build_tag_sections(index, blocks):
+    """Split narrative blocks into per-tag sections and the notes outside them."""
+    notes = []
+    sections = []
+    section = None
+    for block in blocks:
+        tag_heading = TAG_HEADING_PATTERN.match(block.get('text', '').strip()) if block['type'] in ('paragraph', 'heading') else None
+        if tag_heading:
+            tag_name = tag_heading.group(1)
+            tag = index.tags_by_name.get(tag_name)
+            section = {
+                'id': f"tag:{tag['tagId'] if tag else tag_name}",
+                'tag_id': tag['tagId'] if tag else None,
+                'tag_name': tag_name,
+                'items': [],
+            }
+            sections.append(section)
+        elif section is not None and block['type'] in ('list_item', 'paragraph'):
+            section['items'].append({
+                'id': f"{section['id']}:{len(section['items']) + 1}",
+                'severity': item_severity(block['text']),
+                'text': block['text'],
+            })
+        else:
+            # Headings and other blocks end the current tag's section
+            section = None
+            notes.append(block)
+
+    for section in sections:
+        section['severity'] = highest_severity(item['severity'] for item in section['items'])
+    return sections, notes
+
+
+def build_report(index, analysis):
+    """Turn an analysis into the findings model every export format renders.
+
+    The model is plain JSON data: the container summary, extracted tracking IDs, the automated
+    checks by rule, the LLM's per-tag sections, and the rest of its narrative as markdown blocks.
+    """
+    findings = run_rules(index)
+    narrative = narrative_from_analysis(render_findings_markdown(findings), analysis)
+    tags, notes = build_tag_sections(index, parse_markdown_blocks(narrative))
+    summary = index.summary()
+    return {
+        'format': REPORT_FORMAT,
+        'config_hash': index.config_hash,
+        'summary': {field: summary[field] for field in SUMMARY_FIELDS},
+        'tracking_ids': collect_tracking_ids(index),
+        'checks': build_checks(findings),
+        'tags': tags,
+        'notes': notes,
+    }
+
+
+def report_cache_key(index, analysis):
+    """Key a report by its config's content and its analysis; configs without a content hash are hashed whole."""
+    config_key = index.config_hash
+    if config_key is None:
+        config_json = json.dumps(index.config, sort_keys=True, separators=(',', ':'), default=str)
+        config_key = hashlib.blake2b(config_json.encode(), digest_size=16).hexdigest()
+    return f"{config_key}:{hashlib.blake2b(analysis.encode(), digest_size=16).hexdigest()}"
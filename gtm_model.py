@@ -0,0 +1,141 @@
+import sys
+
+# Short values repeated across every entity, interned along with parameter keys
+INTERNED_VALUE_KEYS = ('type', 'key')
+
+
+class Parameter(dict):
+    """A GTM {type, key, value|list|map} parameter."""
+
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return self.get('key')
+
+    @property
+    def type(self):
+        return self.get('type')
+
+    @property
+    def value(self):
+        return self.get('value')
+
+
+class Entity(dict):
+    """Base class for tags, triggers and variables.
+
+    Entities stay dicts, so they serialise, diff and display exactly as the export did; the
+    subclasses add typed accessors and O(1) parameter lookup by key, indexed on first use.
+    The index is rebuilt whenever the entity's 'parameter' list is replaced or changes length;
+    editing a parameter's key in place isn't tracked.
+    """
+
+    __slots__ = ('_parameter_index',)
+    id_key = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._parameter_index = None
+        if 'parameter' in self:
+            self['parameter'] = [as_parameter(parameter) for parameter in self['parameter']]
+
+    @property
+    def id(self):
+        return self.get(self.id_key)
+
+    @property
+    def name(self):
+        return self.get('name')
+
+    @property
+    def type(self):
+        return self.get('type')
+
+    def parameter(self, key):
+        """Return the top-level parameter with this key, or None."""
+        parameters = self.get('parameter', ())
+        # (list, length, {key: parameter}); copies made without __init__ have no index yet
+        index = getattr(self, '_parameter_index', None)
+        if index is None or index[0] is not parameters or index[1] != len(parameters):
+            by_key = {}
+            for parameter in parameters:
+                # First match wins, as in find_parameter
+                by_key.setdefault(parameter.get('key'), parameter)
+            index = self._parameter_index = (parameters, len(parameters), by_key)
+        return index[2].get(key)
+
+    def parameter_value(self, key, default=None):
+        """Return the value of the top-level parameter with this key, or default."""
+        parameter = self.parameter(key)
+        return parameter.get('value', default) if parameter is not None else default
+
+
+class Tag(Entity):
+    __slots__ = ()
+    id_key = 'tagId'
+
+
+class Trigger(Entity):
+    __slots__ = ()
+    id_key = 'triggerId'
+
+
+class Variable(Entity):
+    __slots__ = ()
+    id_key = 'variableId'
+
+
+ENTITY_CLASSES = {'tag': Tag, 'trigger': Trigger, 'variable': Variable}
+
+
+def find_parameter(entity, key):
+    """Return a tag's, trigger's or variable's top-level parameter with this key, or None.
+
+    Model entities use their index; plain dicts (e.g. entities not yet converted) are searched.
+    """
+    if isinstance(entity, Entity):
+        return entity.parameter(key)
+    for parameter in entity.get('parameter', ()):
+        if parameter.get('key') == key:
+            return parameter
+    return None
+
+
+def parameter_value(entity, key, default=None):
+    """Return the value of an entity's top-level parameter with this key, or default."""
+    parameter = find_parameter(entity, key)
+    return parameter.get('value', default) if parameter is not None else default
+
+
+def as_parameter(parameter):
+    if isinstance(parameter, Parameter):
+        return parameter
+    converted = Parameter(parameter)
+    for key in INTERNED_VALUE_KEYS:
+        if isinstance(converted.get(key), str):
+            converted[key] = sys.intern(converted[key])
+    return converted
+
+
+def as_entity(kind, entity):
+    """Convert a raw entity dict to its model class; already converted entities are returned as-is."""
+    entity_class = ENTITY_CLASSES[kind]
+    return entity if isinstance(entity, entity_class) else entity_class(entity)
+
+
+def convert_config(config):
+    """Return the config with its tags, triggers and variables as model classes.
+
+    Entities are converted as copies, so the caller's config (and any entities it shares, e.g.
+    from config_store's cache) is left unchanged; a config that is already converted is returned as-is.
+    """
+    container_version = config.get('containerVersion', {})
+    converted = {
+        kind: [as_entity(kind, entity) for entity in container_version[kind]]
+        for kind in ENTITY_CLASSES
+        if kind in container_version
+    }
+    if all(new is old for kind, entities in converted.items() for new, old in zip(entities, container_version[kind])):
+        return config
+    return {**config, 'containerVersion': {**container_version, **converted}}
@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import current_trace, start_trace
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))  # Analyses running at once across all sessions
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))  # PDF exports rendering at once across all sessions
+JOB_RETENTION = 10 * 60  # Seconds a finished job's result stays available for its sessions to collect
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    """A unit of background work; `progress` holds partial output while it runs.
+
+    `trace` is the job's own trace, set once it starts, which the run collecting the result links to.
+    """
+
+    def __init__(self, key, submitted_by=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = QUEUED
+        self.progress = ''
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.trace = None
+        self.submitted_by = submitted_by  # ID of the submitting run's trace
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class JobQueue:
+    """Thread pool running jobs outside the Streamlit script, so reruns poll them instead of repeating them.
+
+    Submissions with the key of a queued or running job are coalesced onto that job.
+    """
+
+    def __init__(self, max_workers=ANALYSIS_WORKERS, retention=JOB_RETENTION, name='analysis'):
+        self.retention = retention
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._jobs = {}
+        self._active_by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, func):
+        """Run func(job) in the background and return the job ID; func's return value becomes job.result."""
+        with self._lock:
+            self._evict_finished()
+            active_id = self._active_by_key.get(key)
+            if active_id is not None:
+                logger.info(f"Coalesced submission onto job {active_id} for {key}")
+                return active_id
+            trace = current_trace()
+            job = Job(key, submitted_by=trace.id if trace else None)
+            self._jobs[job.id] = job
+            self._active_by_key[key] = job.id
+        self._executor.submit(self._run, job, func)
+        logger.info(f"Submitted job {job.id} for {key}")
+        return job.id
+
+    def active(self, key):
+        """The ID of the queued or running job for this key, if any, so callers can skip preparing a duplicate submission."""
+        with self._lock:
+            return self._active_by_key.get(key)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, func):
+        job.status = RUNNING
+        start = time.perf_counter()
+        # A trace of its own, as the job can outlive the submitting run and coalesced submissions share it
+        with start_trace(f'{self.name}_job', job_id=job.id, submitted_by=job.submitted_by) as trace:
+            job.trace = trace
+            try:
+                job.result = func(job)
+                status = DONE
+            except Exception as e:
+                logger.error(f"Job {job.id} for {job.key} failed: {str(e)}")
+                job.error = e
+                job.traceback = traceback.format_exc()
+                status = FAILED
+        job.finished_at = time.time()
+        with self._lock:
+            if self._active_by_key.get(job.key) == job.id:
+                del self._active_by_key[job.key]
+        # Set last, so pollers that see a finished job also see its result
+        job.status = status
+        logger.info(f"Job {job.id} {status} in {time.perf_counter() - start:.1f}s")
+
+    def _evict_finished(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+# Module-level so jobs outlive the script run (and session) that submitted them
+analysis_jobs = JobQueue()
+# Separate workers, so exports aren't queued behind long-running analyses
+export_jobs = JobQueue(max_workers=EXPORT_WORKERS, name='export')
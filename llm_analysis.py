@@ -0,0 +1,69 @@
+import os
+
+from batch_analysis import analyze_chunked
+from prompts import FULL_INSTRUCTIONS, FULL_SYSTEM_PROMPT, LIMITED_INSTRUCTIONS, LIMITED_SYSTEM_PROMPT, create_base_prompt
+
+CHUNKED_ANALYSIS_MIN_TAGS = int(os.getenv("CHUNKED_ANALYSIS_MIN_TAGS", "30"))  # Full analyses of larger containers are batched
+
+
+def truncate_words(text, limit=150):
+    """Truncate text to approximately `limit` words while preserving paragraph formatting."""
+    paragraphs = text.split('\n\n')
+    truncated_paragraphs = []
+    word_count = 0
+    for paragraph in paragraphs:
+        words = paragraph.split()
+        if word_count + len(words) <= limit:
+            truncated_paragraphs.append(paragraph)
+            word_count += len(words)
+        else:
+            remaining_words = limit - word_count
+            truncated_paragraph = ' '.join(words[:remaining_words]) + '...'
+            truncated_paragraphs.append(truncated_paragraph)
+            break
+
+    return '\n\n'.join(truncated_paragraphs)
+
+
+def analyze_with_gpt(index, backend, on_update=None):
+    """Analyse the GTM configuration using OpenAI's GPT for full analysis."""
+    base_prompt = create_base_prompt(index)
+    full_prompt = base_prompt + FULL_INSTRUCTIONS
+
+    return backend.complete(
+        [
+            {"role": "system", "content": FULL_SYSTEM_PROMPT},
+            {"role": "user", "content": full_prompt}
+        ],
+        on_update
+    )
+
+
+def analyze_with_gpt_limited(index, backend, on_update=None):
+    """Analyse the GTM configuration using OpenAI's GPT with a limited output."""
+    base_prompt = create_base_prompt(index)
+    limited_prompt = base_prompt + LIMITED_INSTRUCTIONS
+
+    # Only stream the truncated view so the partial output never exceeds the word limit
+    analysis = backend.complete(
+        [
+            {"role": "system", "content": LIMITED_SYSTEM_PROMPT},
+            {"role": "user", "content": limited_prompt}
+        ],
+        (lambda text: on_update(truncate_words(text))) if on_update else None
+    )
+
+    return truncate_words(analysis)
+
+
+def analyze_index(index, backend, limited=False, on_update=None, tag_cache=None, previous_sections=None):
+    """Run the LLM analysis of a container through an LLM backend (see llm_backend.py).
+
+    Limited analyses are a single short completion; full analyses of containers with at least
+    CHUNKED_ANALYSIS_MIN_TAGS tags are batched (see batch_analysis.py), and smaller ones streamed.
+    """
+    if limited:
+        return analyze_with_gpt_limited(index, backend, on_update)
+    if len(index.tags) >= CHUNKED_ANALYSIS_MIN_TAGS:
+        return analyze_chunked(index, backend, on_update=on_update, cache=tag_cache, previous_sections=previous_sections)
+    return analyze_with_gpt(index, backend, on_update)
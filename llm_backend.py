@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+
+from prompts import ANALYSIS_MODEL
+from tracing import count, span
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))  # Seconds per request attempt
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))  # Seconds before the first retry, doubling per attempt
+LLM_BACKOFF_MAX = 30.0  # Seconds
+LLM_RECORD_PATH = os.getenv("LLM_RECORD_PATH", "")  # JSONL file completions are appended to, for mock_llm_server.py --replay
+DEFAULT_API_KEY = os.getenv("CHATGPT_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # Optional, e.g. a local mock_llm_server.py
+STREAM_UPDATE_INTERVAL = 0.1  # Seconds between partial text updates while streaming
+
+
+def completion_key(messages):
+    """Hash of a request's messages, matching recorded completions to the requests that replay them."""
+    return hashlib.blake2b(json.dumps(messages, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def backoff_delay(attempt, base=LLM_BACKOFF_BASE):
+    """Exponential backoff with full jitter, so clients retrying together spread out."""
+    return random.uniform(0, min(LLM_BACKOFF_MAX, base * 2 ** attempt))
+
+
+class LLMBackend:
+    """Chat completions with per-attempt timeouts, retries with exponential backoff, and token counts.
+
+    Subclasses implement _create and _create_async for one provider, each returning
+    (text, prompt_tokens, completion_tokens), and list the errors worth retrying.
+    """
+
+    retryable_errors = ()
+
+    def __init__(self, model=ANALYSIS_MODEL, timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES, backoff_base=LLM_BACKOFF_BASE, record_path=LLM_RECORD_PATH):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.record_path = record_path
+        self.usage = {'requests': 0, 'retries': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self._lock = threading.Lock()
+
+    def complete(self, messages, on_update=None):
+        """Return the completion's text, streaming partial text to on_update when given."""
+        with span('llm_request', model=self.model, stream=on_update is not None) as attributes:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = self._create(messages, on_update)
+                    break
+                except self.retryable_errors as e:
+                    if attempt == self.max_retries:
+                        raise
+                    time.sleep(self._retry_delay(attempt, e))
+            return self._finish(messages, *result, attributes)
+
+    async def complete_async(self, messages):
+        """Return the completion's text, without blocking the event loop."""
+        with span('llm_request', model=self.model, stream=False) as attributes:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = await self._create_async(messages)
+                    break
+                except self.retryable_errors as e:
+                    if attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(self._retry_delay(attempt, e))
+            return self._finish(messages, *result, attributes)
+
+    def snapshot(self):
+        """A copy of the usage counters, for measuring a span of requests."""
+        with self._lock:
+            return dict(self.usage)
+
+    def _retry_delay(self, attempt, error):
+        delay = backoff_delay(attempt, self.backoff_base)
+        count('llm_retries')
+        with self._lock:
+            self.usage['retries'] += 1
+        logger.warning(f"LLM request failed ({type(error).__name__}: {error}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def _finish(self, messages, text, prompt_tokens, completion_tokens, span_attributes):
+        span_attributes.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        count('llm_requests')
+        count('llm_prompt_tokens', prompt_tokens)
+        count('llm_completion_tokens', completion_tokens)
+        with self._lock:
+            self.usage['requests'] += 1
+            self.usage['prompt_tokens'] += prompt_tokens
+            self.usage['completion_tokens'] += completion_tokens
+            if self.record_path:
+                with open(self.record_path, 'a') as file:
+                    file.write(json.dumps({
+                        'key': completion_key(messages),
+                        'model': self.model,
+                        'content': text,
+                        'prompt_tokens': prompt_tokens,
+                        'completion_tokens': completion_tokens,
+                    }) + '\n')
+        return text
+
+    def _create(self, messages, on_update):
+        raise NotImplementedError
+
+    async def _create_async(self, messages):
+        raise NotImplementedError
+
+
+def usage_tokens(usage):
+    return (usage.prompt_tokens, usage.completion_tokens) if usage else (0, 0)
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI, or any API compatible with its chat completions, such as mock_llm_server.py.
+
+    The openai package is imported on the first request rather than with this module, as it's slow to import.
+    """
+
+    @property
+    def retryable_errors(self):
+        import openai
+        return (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+    def __init__(self, api_key=DEFAULT_API_KEY, base_url=OPENAI_BASE_URL, async_client=None, **kwargs):
+        super().__init__(**kwargs)
+        # The mock server ignores the key, but the client requires one
+        self.api_key = api_key or ("mock" if base_url else None)
+        self.base_url = base_url
+        self._client = None
+        self._async_client = async_client
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            # Retries are handled by LLMBackend, so the SDK's own are disabled
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0)
+        return self._client
+
+    def async_client(self):
+        """The async client for the running event loop; background jobs each run their own loop."""
+        if self._async_client is not None:
+            return self._async_client
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0)
+            self._async_clients[loop] = client
+        return client
+
+    def _create(self, messages, on_update):
+        if on_update is None:
+            response = self.client().chat.completions.create(model=self.model, messages=messages)
+            return (response.choices[0].message.content, *usage_tokens(response.usage))
+
+        stream = self.client().chat.completions.create(model=self.model, messages=messages, stream=True, stream_options={"include_usage": True})
+        chunks = []
+        usage = None
+        last_update = 0.0
+        for chunk in stream:
+            usage = chunk.usage or usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            chunks.append(chunk.choices[0].delta.content)
+            # Throttle updates so long completions don't flood the UI
+            now = time.monotonic()
+            if now - last_update >= STREAM_UPDATE_INTERVAL:
+                on_update(''.join(chunks))
+                last_update = now
+        text = ''.join(chunks)
+        on_update(text)
+        return (text, *usage_tokens(usage))
+
+    async def _create_async(self, messages):
+        response = await self.async_client().chat.completions.create(model=self.model, messages=messages)
+        return (response.choices[0].message.content, *usage_tokens(response.usage))
+
+
+BACKENDS = {'openai': OpenAIBackend}
+
+
+def create_backend(name=LLM_BACKEND, **kwargs):
+    """Create the configured LLM backend; kwargs are passed to its constructor."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
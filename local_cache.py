@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "256"))
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("LOCAL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", str(24 * 60 * 60)))  # Seconds
+LOCAL_CACHE_DB = os.getenv("LOCAL_CACHE_DB", "")  # SQLite file for the on-disk tier; empty disables it
+UPLOAD_MEMO_MAX_ENTRIES = int(os.getenv("UPLOAD_MEMO_MAX_ENTRIES", "32"))
+UPLOAD_MEMO_MAX_BYTES = int(os.getenv("UPLOAD_MEMO_MAX_BYTES", str(128 * 1024 * 1024)))
+UPLOAD_MEMO_TTL = 60 * 60  # Seconds; uploads are rarely revisited after the session that analysed them
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache bounded by entry count, total size and age."""
+
+    def __init__(self, max_entries=LOCAL_CACHE_MAX_ENTRIES, max_bytes=LOCAL_CACHE_MAX_BYTES, ttl=LOCAL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, size=None):
+        """Store value; size defaults to the length of its JSON encoding."""
+        if size is None:
+            size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """On-disk JSON cache that survives process restarts, with the same get/set interface."""
+
+    def __init__(self, path, ttl=LOCAL_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] + self.ttl < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, default=str), time.time())
+            )
+
+    def delete(self, key):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+class TieredCache:
+    """Memory tier in front of an optional disk tier; reads promote disk hits, writes go to both."""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error as e:
+                logger.error(f"Error reading local disk cache: {str(e)}")
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                logger.error(f"Error writing local disk cache: {str(e)}")
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+
+class UploadMemo:
+    """Data derived from one upload's content, shared by every session and rerun that sees it."""
+
+    __slots__ = ('index', 'cached_analyses', 'analyses', 'saved_analyses', 'version_diffs')
+
+    def __init__(self, index):
+        self.index = index
+        self.cached_analyses = {}  # user_id -> analysis cache row, or None for a miss
+        self.analyses = {}  # (limited, user_id or None if shared) -> finished analysis; bypassed runs are kept per session instead
+        self.saved_analyses = {}  # user_id -> analysis last saved to the user's project
+        self.version_diffs = {}  # user_id -> diff against the user's last saved version (see container_diff.py), set by the analysis job
+
+
+def create_tiered_cache(db_path=LOCAL_CACHE_DB):
+    """Create a tiered cache, with a disk tier only when a database path is configured."""
+    disk = None
+    if db_path:
+        try:
+            disk = SQLiteCache(db_path)
+        except sqlite3.Error as e:
+            logger.error(f"Error opening local disk cache at {db_path}, using memory only: {str(e)}")
+    return TieredCache(LRUCache(), disk)
+
+
+# Module-level so entries survive Streamlit reruns, which re-execute the app script but not its imports
+analysis_cache = create_tiered_cache()
+project_list_cache = LRUCache(ttl=5 * 60)  # user_id -> {page key: [project rows]}, invalidated by save_project
+project_config_list_cache = LRUCache(ttl=5 * 60)  # user_id -> [project rows with stored configs], invalidated by save_project
+report_cache = LRUCache(max_entries=256, ttl=60 * 60)  # (report_cache_key, 'model' or export format) -> findings model or export bytes
+upload_memo = LRUCache(max_entries=UPLOAD_MEMO_MAX_ENTRIES, max_bytes=UPLOAD_MEMO_MAX_BYTES, ttl=UPLOAD_MEMO_TTL)  # content hash -> UploadMemo
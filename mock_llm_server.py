@@ -0,0 +1,146 @@
+import argparse
+import json
+import random
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_backend import completion_key
+
+# Point the app at this server with OPENAI_BASE_URL=http://127.0.0.1:8787/v1
+DEFAULT_PORT = 8787
+
+
+def prompt_section(prompt, heading):
+    """Parse the compact JSON line that follows a section heading in a prompt, or None."""
+    match = re.search(rf'^{re.escape(heading)}:\n(.+)$', prompt, re.MULTILINE)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return None
+
+
+def mock_completion(prompt):
+    """Build a deterministic analysis for the tags named in the prompt."""
+    symbols = prompt_section(prompt, 'Symbols') or {}
+    tags = prompt_section(prompt, 'Tags') or []
+    tag_names = [symbols.get(tag.get('name'), tag.get('name')) for tag in tags]
+    if not tag_names:
+        return "No tags to analyse."
+    return '\n\n'.join(
+        f"**Tag Name: '{name}'**\n\n- Mock analysis of `{name}`."
+        for name in tag_names
+    )
+
+
+def load_recordings(path):
+    """Load completions recorded by llm_backend (LLM_RECORD_PATH) as {completion key: record}; later records win."""
+    recordings = {}
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                recordings[record['key']] = record
+    return recordings
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the OpenAI chat completions endpoint, including streaming.
+
+    Requests matching a recorded completion replay it; others get a deterministic mock analysis.
+    """
+
+    latency = 0.0  # Seconds before the first token
+    jitter = 0.0  # Up to this many seconds are added to the latency at random
+    tokens_per_second = 0.0  # Generation speed of the completion; 0 sends it at once
+    recordings = {}
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        record = self.recordings.get(completion_key(body['messages']))
+        if record is not None:
+            content = record['content']
+            prompt_tokens = record['prompt_tokens']
+            completion_tokens = record['completion_tokens']
+        else:
+            content = mock_completion(body['messages'][-1]['content'])
+            prompt_tokens = sum(len(message['content']) for message in body['messages']) // 4
+            completion_tokens = len(content) // 4
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            words = re.split(r'(?<=\s)', content)
+            for word in words:
+                if self.tokens_per_second:
+                    time.sleep(completion_tokens / len(words) / self.tokens_per_second)
+                self._write_event({
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': body['model'],
+                    'choices': [{'index': 0, 'delta': {'content': word}, 'finish_reason': None}],
+                })
+            self._write_event({
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': body['model'],
+                'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+            })
+            if (body.get('stream_options') or {}).get('include_usage'):
+                self._write_event({
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': body['model'],
+                    'choices': [], 'usage': usage,
+                })
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        if self.tokens_per_second:
+            time.sleep(completion_tokens / self.tokens_per_second)
+        payload = json.dumps({
+            'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': body['model'],
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': usage,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_event(self, data):
+        self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(port=DEFAULT_PORT, latency=0.0, jitter=0.0, tokens_per_second=0.0, recordings=None):
+    """Create (but don't start) a mock OpenAI server; use port 0 for a free port."""
+    handler = type('ConfiguredMockOpenAIHandler', (MockOpenAIHandler,), {
+        'latency': latency, 'jitter': jitter, 'tokens_per_second': tokens_per_second, 'recordings': recordings or {},
+    })
+    return ThreadingHTTPServer(('127.0.0.1', port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the OpenAI chat completions API.")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("-l", "--latency", type=float, default=0.0, help="Seconds to wait before each response (default: 0)")
+    parser.add_argument("-j", "--jitter", type=float, default=0.0, help="Up to this many extra seconds of random latency per response (default: 0)")
+    parser.add_argument("-t", "--tokens-per-second", type=float, default=0.0, help="Completion generation speed, 0 to respond at once (default: 0)")
+    parser.add_argument("-r", "--replay", help="JSONL completions recorded with LLM_RECORD_PATH, replayed for matching requests")
+
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.replay) if args.replay else {}
+    server = create_server(args.port, args.latency, args.jitter, args.tokens_per_second, recordings)
+    print(f"Mock OpenAI server listening on http://127.0.0.1:{server.server_address[1]}/v1 ({len(recordings)} recorded completions)")
+    server.serve_forever()
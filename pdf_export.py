@@ -0,0 +1,200 @@
+import functools
+import logging
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib.colors import grey, lightgrey
+from reportlab.lib.enums import TA_JUSTIFY
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from reportlab.platypus import HRFlowable, Paragraph, Preformatted, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from findings_report import inline_markup
+from rules import SEVERITY_ERROR, SEVERITY_INFO, SEVERITY_WARNING, finding_markdown
+
+logger = logging.getLogger(__name__)
+
+FOOTER_FONT = "Helvetica"
+FOOTER_FONT_SIZE = 9
+PAGE_COUNT_FORM = "pageCount"
+# The page count is drawn left-aligned from here, leaving room for four digits before the right margin
+PAGE_COUNT_X = 20*cm - stringWidth("0000", FOOTER_FONT, FOOTER_FONT_SIZE)
+CODE_LINE_LENGTH = 90  # Courier 8pt characters that fit the text width
+LIST_INDENT = 12  # Points per nesting level
+MAX_LIST_DEPTH = 3
+
+PDF_INLINE_TAGS = {
+    'code': '<font face="Courier">{text}</font>',
+    'bold': '<b>{text}</b>',
+    'italic': '<i>{text}</i>',
+    'strike': '<strike>{text}</strike>',
+    'link': '<link href="{url}">{text}</link>',
+}
+SEVERITY_COLORS = {SEVERITY_ERROR: '#b42318', SEVERITY_WARNING: '#b54708', SEVERITY_INFO: '#808080'}
+
+
+def escape_markup(text):
+    return escape(text, {'"': '&quot;'})
+
+
+class NumberedCanvas(canvas.Canvas):
+    """Canvas footing every page with "Page N of M".
+
+    M isn't known until the document is saved, so each page draws a reference to a form that's
+    filled in once at save time, instead of holding every page's state back until then.
+    """
+
+    def showPage(self):
+        self.draw_page_number()
+        canvas.Canvas.showPage(self)
+
+    def save(self):
+        self.beginForm(PAGE_COUNT_FORM)
+        self.setFont(FOOTER_FONT, FOOTER_FONT_SIZE)
+        self.drawString(PAGE_COUNT_X, 1*cm, str(self._pageNumber - 1))
+        self.endForm()
+        canvas.Canvas.save(self)
+
+    def draw_page_number(self):
+        self.setFont(FOOTER_FONT, FOOTER_FONT_SIZE)
+        self.drawRightString(PAGE_COUNT_X, 1*cm, f"Page {self._pageNumber} of ")
+        self.doForm(PAGE_COUNT_FORM)
+        self.drawString(1*cm, 1*cm, "Generated by GTM Auditor by Brad Farleigh - bradfarleigh.com")
+
+
+@functools.cache
+def findings_styles():
+    """Paragraph styles for the report, built once and shared by every export."""
+    styles = getSampleStyleSheet()
+    normal_style = ParagraphStyle('Normal', fontSize=10, leading=14, alignment=TA_JUSTIFY, spaceAfter=6)
+    return {
+        'title': styles['Heading1'],
+        'heading': styles['Heading2'],
+        'subheading': styles['Heading3'],
+        'minor_heading': styles['Heading4'],
+        'normal': normal_style,
+        'value': ParagraphStyle('Value', fontSize=10, leading=14, textColor=grey),
+        'code': ParagraphStyle('Code', fontName='Courier', fontSize=8, leading=10, spaceAfter=6),
+        'table': ParagraphStyle('TableCell', fontSize=9, leading=11),
+        'bullets': [
+            ParagraphStyle(
+                f'Bullet{depth}', parent=normal_style, spaceAfter=3, bulletFontName='Helvetica', bulletFontSize=10,
+                bulletIndent=LIST_INDENT * depth, leftIndent=LIST_INDENT * (depth + 1)
+            )
+            for depth in range(MAX_LIST_DEPTH + 1)
+        ],
+    }
+
+
+def markdown_paragraph(text, style, **kwargs):
+    """A Paragraph of inline markdown, falling back to plain text if ReportLab rejects the markup."""
+    try:
+        return Paragraph(inline_markup(text, PDF_INLINE_TAGS, escape_markup), style, **kwargs)
+    except ValueError as e:
+        logger.warning(f"Rendering a line of the PDF export as plain text: {e}")
+        return Paragraph(escape(text), style, **kwargs)
+
+
+def table_flowable(rows, width):
+    """A grid table of markdown cells with a bold header row, sharing the width equally between columns."""
+    styles = findings_styles()
+    column_count = max(len(row) for row in rows)
+    cells = [
+        [markdown_paragraph(row[column] if column < len(row) else '', styles['table']) for column in range(column_count)]
+        for row in rows
+    ]
+    table = Table(cells, colWidths=[width / column_count] * column_count, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, lightgrey),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    return table
+
+
+def block_flowables(blocks, width):
+    """Convert parsed markdown blocks (see findings_report.parse_markdown_blocks) to flowables."""
+    styles = findings_styles()
+    flowables = []
+    for block in blocks:
+        if block['type'] == 'heading':
+            style = styles['subheading'] if block['level'] <= 3 else styles['minor_heading']
+            flowables.append(markdown_paragraph(block['text'], style))
+        elif block['type'] == 'paragraph':
+            flowables.append(markdown_paragraph(block['text'], styles['normal']))
+        elif block['type'] == 'list_item':
+            flowables.append(markdown_paragraph(block['text'], styles['bullets'][block['depth']], bulletText=block['marker']))
+        elif block['type'] == 'code':
+            flowables.append(Preformatted(block['text'], styles['code'], maxLineLength=CODE_LINE_LENGTH))
+        elif block['type'] == 'table':
+            flowables.append(table_flowable(block['rows'], width))
+            flowables.append(Spacer(1, 6))
+        elif block['type'] == 'rule':
+            flowables.append(HRFlowable(width='100%', thickness=0.5, color=lightgrey, spaceBefore=6, spaceAfter=6))
+    return flowables
+
+
+def severity_label(severity):
+    return f'<font color="{SEVERITY_COLORS[severity]}">[{severity.upper()}]</font>'
+
+
+def build_report_pdf(report):
+    """Render a findings report (see findings_report.build_report) as PDF bytes."""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72)
+    styles = findings_styles()
+    summary = report['summary']
+    elements = []
+
+    # Add title
+    elements.append(Paragraph("GTM Audit Findings", styles['title']))
+    elements.append(Spacer(1, 24))
+
+    # Add summary information
+    summary_items = [
+        ("Container Name", summary['container_name']),
+        ("Tag Manager URL", summary['tag_manager_url']),
+        ("Tag Count", str(summary['tag_count'])),
+        ("Variable Count", str(summary['variable_count'])),
+        ("Trigger Count", str(summary['trigger_count']))
+    ]
+
+    for heading, value in summary_items:
+        elements.append(Paragraph(f"<b>{heading}:</b> {escape(value)}", styles['normal']))
+
+    elements.append(Spacer(1, 24))
+
+    # Add analysis
+    elements.append(Paragraph("Analysis", styles['heading']))
+    elements.append(Spacer(1, 12))
+
+    if report['tracking_ids']:
+        elements.append(Paragraph("Tracking IDs", styles['subheading']))
+        rows = [["Platform", "ID", "Tags"]] + [
+            [platform, f"`{tracking_id}`", ', '.join(tag_names)]
+            for platform, ids in report['tracking_ids'].items()
+            for tracking_id, tag_names in ids.items()
+        ]
+        elements.append(table_flowable(rows, doc.width))
+        elements.append(Spacer(1, 12))
+
+    if report['checks']:
+        elements.append(Paragraph("Automated checks", styles['subheading']))
+    for check in report['checks']:
+        elements.append(Paragraph(f"<b>{escape(check['title'])} ({len(check['findings'])})</b> {severity_label(check['severity'])}", styles['normal']))
+        for finding in check['findings']:
+            elements.append(markdown_paragraph(finding_markdown(finding), styles['bullets'][0], bulletText='•'))
+
+    elements.extend(block_flowables(report['notes'], doc.width))
+
+    for section in report['tags']:
+        elements.append(Paragraph(f"<b>Tag Name: '{escape(section['tag_name'])}'</b> {severity_label(section['severity'])}", styles['normal']))
+        for item in section['items']:
+            elements.append(markdown_paragraph(item['text'], styles['bullets'][0], bulletText='•'))
+
+    # Build PDF
+    doc.build(elements, canvasmaker=NumberedCanvas)
+    return buffer.getvalue()
@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+from container_index import ContainerIndex
+from local_cache import LRUCache
+from rules import CUSTOM_TEMPLATE_PREFIX, FB_PIXEL_INIT_PATTERN, TEMPLATE_TRACKING_ID_PARAMETERS, TRACKING_ID_PARAMETERS, UA_TAG_TYPES
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_CACHE_MAX_ENTRIES = int(os.getenv("PORTFOLIO_CACHE_MAX_ENTRIES", "5000"))  # Containers whose tables are kept
+PORTFOLIO_CACHE_MAX_BYTES = int(os.getenv("PORTFOLIO_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PORTFOLIO_CACHE_TTL = 24 * 60 * 60  # Seconds
+SHARED_ID_PLATFORMS = ('GA4', 'Floodlight')
+
+SCHEMAS = {
+    'tags': pa.schema([
+        ('tag_id', pa.string()), ('name', pa.string()), ('type', pa.string()), ('type_name', pa.string()),
+        ('paused', pa.bool_()), ('firing_triggers', pa.int32()), ('blocking_triggers', pa.int32()),
+    ]),
+    'triggers': pa.schema([('trigger_id', pa.string()), ('name', pa.string()), ('type', pa.string()), ('tag_count', pa.int32())]),
+    # Top-level parameters with a single value, from tags and variables. `resolved` has single
+    # {{Variable}} references to constants replaced by their value (see ContainerIndex.resolve_value)
+    'parameters': pa.schema([
+        ('kind', pa.string()), ('entity_id', pa.string()), ('entity_name', pa.string()), ('entity_type', pa.string()),
+        ('key', pa.string()), ('value', pa.string()), ('resolved', pa.string()),
+    ]),
+}
+CATEGORY_COLUMNS = ('container', 'type', 'type_name', 'kind', 'entity_type', 'key')
+
+# Tracking ID parameters by tag type, in priority order: UA tags only fall back to their settings variable
+TRACKING_ID_KEYS = pd.DataFrame(
+    [(tag_type, platform, key, 0) for tag_type, (platform, key) in TRACKING_ID_PARAMETERS.items()] + [('ua', 'UA', 'gaSettings', 1)],
+    columns=['entity_type', 'platform', 'key', 'priority'],
+)
+
+# Arrow tables per container, keyed by config content hash, so unchanged projects are never rebuilt
+# and identical configs saved under several projects share one copy
+container_table_cache = LRUCache(max_entries=PORTFOLIO_CACHE_MAX_ENTRIES, max_bytes=PORTFOLIO_CACHE_MAX_BYTES, ttl=PORTFOLIO_CACHE_TTL)
+# Combined portfolios, keyed by the (container ID, content hash) pairs they were built from
+portfolio_cache = LRUCache(max_entries=32, max_bytes=PORTFOLIO_CACHE_MAX_BYTES, ttl=PORTFOLIO_CACHE_TTL)
+
+
+def frame_bytes(frames):
+    return int(sum(frame.memory_usage(deep=True).sum() for frame in frames.values() if isinstance(frame, pd.DataFrame)))
+
+
+def arrow_table(rows, schema):
+    columns = list(zip(*rows)) or [[] for _ in schema]
+    return pa.Table.from_arrays([pa.array(column, field.type) for column, field in zip(columns, schema)], schema=schema)
+
+
+def with_categories(frame):
+    """Store the low-cardinality columns as categoricals, so grouping by them doesn't compare strings."""
+    return frame.astype({column: 'category' for column in CATEGORY_COLUMNS if column in frame.columns})
+
+
+def resolved_text(index, value):
+    resolved = index.resolve_value(value)
+    return resolved if isinstance(resolved, str) else value
+
+
+def container_tables(index):
+    """Flatten one indexed container into Arrow tables of tags, triggers and parameters (see SCHEMAS).
+
+    This is the only per-entity Python loop; everything the portfolio queries do afterwards is
+    vectorised over the tables of every container at once.
+    """
+    tags = [
+        (tag.id, tag.get('name', 'Unnamed Tag'), tag.get('type', ''), index.type_name(tag.get('type', '')),
+         bool(tag.get('paused')), len(tag.get('firingTriggerId', [])), len(tag.get('blockingTriggerId', [])))
+        for tag in index.tags
+    ]
+    triggers = [
+        (trigger.id, trigger.get('name', 'Unnamed Trigger'), trigger.get('type', ''), len(index.tags_by_firing_trigger.get(trigger.id, [])))
+        for trigger in index.triggers
+    ]
+    parameters = [
+        (kind, entity.id, entity.get('name', ''), entity.get('type', ''), parameter.key, parameter.value, resolved_text(index, parameter.value))
+        for kind, entities in (('tag', index.tags), ('variable', index.variables))
+        for entity in entities
+        for parameter in entity.get('parameter', [])
+        if isinstance(parameter.value, str)
+    ]
+    return {
+        'container': index.summary()['container_name'],
+        'tags': arrow_table(tags, SCHEMAS['tags']),
+        'triggers': arrow_table(triggers, SCHEMAS['triggers']),
+        'parameters': arrow_table(parameters, SCHEMAS['parameters']),
+    }
+
+
+def load_container_tables(config_hash, load_config):
+    """Build and cache the tables for one container, or return None if its config can't be loaded."""
+    config = load_config()
+    if config is None:
+        return None
+    tables = container_tables(ContainerIndex(config, config_hash))
+    if config_hash:
+        container_table_cache.set(config_hash, tables, size=sum(tables[name].nbytes for name in SCHEMAS))
+    return tables
+
+
+def combine_tables(tables_by_container, name):
+    """Concatenate one table of every container, adding container_id and container columns, and convert it to a frame once."""
+    tables = []
+    for container_id, tables_for_container in tables_by_container.items():
+        table = tables_for_container[name]
+        labels = [
+            pa.array([str(container_id)] * table.num_rows, pa.string()),
+            pa.array([tables_for_container['container']] * table.num_rows, pa.string()),
+        ]
+        tables.append(pa.Table.from_arrays(labels + table.columns, names=['container_id', 'container'] + table.column_names))
+    if not tables:
+        return pd.DataFrame(columns=['container_id', 'container'] + SCHEMAS[name].names)
+    # Concatenating Arrow tables only collects their chunks, so the one copy is the final conversion
+    return pa.concat_tables(tables).to_pandas()
+
+
+def portfolio_key(containers):
+    pairs = sorted(f"{container_id}:{config_hash}" for container_id, config_hash, _ in containers)
+    return hashlib.blake2b('\n'.join(pairs).encode(), digest_size=16).hexdigest()
+
+
+def build_portfolio(containers):
+    """Combine containers into portfolio-wide frames, rebuilding only containers whose content changed.
+
+    `containers` is a list of (container ID, content hash, load_config) tuples; load_config is only
+    called on a cache miss. Each frame gains container_id and container (name) columns. Returns a
+    dict of the combined 'tags', 'triggers' and 'parameters' frames, plus 'tracking_ids' (see tracking_ids)
+    and a 'queries' memo for run_query.
+    """
+    key = portfolio_key(containers)
+    portfolio = portfolio_cache.get(key)
+    if portfolio is not None:
+        return portfolio
+
+    with span('portfolio', containers=len(containers)) as attributes:
+        built = 0
+        pieces = {}
+        for container_id, config_hash, load_config in containers:
+            tables = container_table_cache.get(config_hash) if config_hash else None
+            if tables is None:
+                built += 1
+                tables = load_container_tables(config_hash, load_config)
+            if tables is not None:
+                pieces[container_id] = tables
+        attributes['rebuilt'] = built
+
+        portfolio = {name: with_categories(combine_tables(pieces, name)) for name in SCHEMAS}
+        portfolio['tracking_ids'] = tracking_ids(portfolio)
+        portfolio['queries'] = {}
+    logger.info(f"Built portfolio of {len(pieces)} containers, {built} rebuilt")
+    portfolio_cache.set(key, portfolio, size=frame_bytes(portfolio))
+    return portfolio
+
+
+def run_query(portfolio, query, *args):
+    """Return query(portfolio, *args), memoised on the portfolio.
+
+    Each query has a fixed pandas overhead of a few ms whatever the portfolio's size, so reruns
+    (e.g. changing the platform filter) reuse earlier results rather than paying it again.
+    Results are shared by every session viewing the portfolio, so callers mustn't change them.
+    """
+    key = (query.__name__, args)
+    results = portfolio['queries']
+    if key not in results:
+        results[key] = query(portfolio, *args)
+    return results[key]
+
+
+def tracking_ids(portfolio):
+    """One row per (container, tag, platform, tracking ID), extracted the same way as rules.collect_tracking_ids."""
+    parameters = portfolio['parameters']
+    tag_parameters = parameters[(parameters['kind'] == 'tag') & parameters['resolved'].notna() & (parameters['resolved'] != '')]
+    tag_parameters = tag_parameters.astype({'entity_type': 'object', 'key': 'object'})
+
+    direct = tag_parameters.merge(TRACKING_ID_KEYS, on=['entity_type', 'key'])
+    # A UA tag's settings variable only counts when it has no tracking ID of its own
+    direct = direct.sort_values('priority', kind='stable').drop_duplicates(['container_id', 'entity_id', 'platform'])
+
+    templates = tag_parameters[
+        tag_parameters['entity_type'].str.startswith(CUSTOM_TEMPLATE_PREFIX) & tag_parameters['key'].isin(list(TEMPLATE_TRACKING_ID_PARAMETERS))
+    ].assign(platform=lambda frame: frame['key'].map(TEMPLATE_TRACKING_ID_PARAMETERS))
+
+    html = tag_parameters[(tag_parameters['entity_type'] == 'html') & (tag_parameters['key'] == 'html')]
+    pixels = html['resolved'].str.extractall(FB_PIXEL_INIT_PATTERN)[0].droplevel('match').rename('resolved')
+    pixels = html.drop(columns='resolved').join(pixels, how='inner').assign(platform='Facebook')
+
+    columns = ['container_id', 'container', 'entity_id', 'entity_name', 'platform', 'resolved']
+    ids = pd.concat([direct[columns], templates[columns], pixels[columns]], ignore_index=True)
+    return ids.rename(columns={'entity_id': 'tag_id', 'entity_name': 'tag_name', 'resolved': 'tracking_id'})
+
+
+def ua_usage(portfolio):
+    """Containers that still have Universal Analytics tags, with how many and how many are paused."""
+    tags = portfolio['tags']
+    ua_tags = tags.loc[tags['type'].isin(UA_TAG_TYPES), ['container_id', 'container', 'paused']]
+    grouped = ua_tags.groupby('container_id', sort=False)
+    usage = pd.DataFrame({'container': grouped['container'].first(), 'ua_tags': grouped.size(), 'paused': grouped['paused'].sum()})
+    return usage.reset_index().sort_values(['ua_tags', 'container'], ascending=[False, True], ignore_index=True)
+
+
+def shared_tracking_ids(portfolio, platforms=SHARED_ID_PLATFORMS):
+    """Tracking IDs of the given platforms that appear in more than one container, with the containers and tags using them."""
+    ids = portfolio['tracking_ids']
+    ids = ids[ids['platform'].isin(platforms)]
+    pairs = ids.drop_duplicates(['platform', 'tracking_id', 'container_id'])
+    # Count containers per ID first, so only the (few) shared IDs are aggregated further
+    pairs = pairs[pairs.groupby(['platform', 'tracking_id'], sort=False)['container_id'].transform('size') > 1]
+    pairs = pairs.astype({'container': 'object'}).sort_values('container')
+    shared = pairs.groupby(['platform', 'tracking_id'], sort=False).agg(containers=('container_id', 'size'), container_names=('container', ', '.join))
+    shared.insert(1, 'tags', ids.groupby(['platform', 'tracking_id'], sort=False).size().reindex(shared.index))
+    return shared.reset_index().sort_values(['containers', 'platform', 'tracking_id'], ascending=[False, True, True], ignore_index=True)
+
+
+def tag_type_distribution(portfolio):
+    """Tags per type and container, with totals and the number of containers using each type, most used first."""
+    tags = portfolio['tags']
+    counts = tags.groupby(['type_name', 'container'], observed=True).size().unstack(fill_value=0)
+    counts.columns = counts.columns.astype(str)
+    counts.columns.name = None
+    counts.index = counts.index.astype(str)
+    counts.index.name = 'type'
+    counts.insert(0, 'containers', (counts > 0).sum(axis=1))
+    counts.insert(0, 'total', counts.drop(columns='containers').sum(axis=1))
+    return counts.sort_values(['total', 'containers'], ascending=False)
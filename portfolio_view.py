@@ -0,0 +1,59 @@
+import streamlit as st
+
+from app_common import get_user_id
+from config_store import stored_config_hash
+from portfolio import SHARED_ID_PLATFORMS, build_portfolio, run_query, shared_tracking_ids, tag_type_distribution, ua_usage
+from projects import list_project_configs, load_project_config
+
+TOP_TAG_TYPES = 15  # Tag types shown in the distribution chart
+
+
+def load_portfolio(user_id):
+    """The user's portfolio frames; only projects whose stored config changed since the last build are decoded."""
+    projects = list_project_configs(user_id)
+    return build_portfolio([
+        (project['id'], stored_config_hash(project['config']), lambda project=project: load_project_config(project))
+        for project in projects
+    ])
+
+
+def portfolio_page():
+    """Analytics across every saved container: UA still in use, tracking IDs shared between containers, and tag types."""
+    st.title("Portfolio overview")
+    with st.spinner("Loading your containers..."):
+        portfolio = load_portfolio(get_user_id())
+    tags = portfolio['tags']
+    if tags.empty:
+        st.info("Save some analyses to see an overview of all your containers.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Containers", tags['container_id'].nunique())
+    col2.metric("Tags", len(tags))
+    col3.metric("Triggers", len(portfolio['triggers']))
+
+    st.subheader("Containers still running Universal Analytics")
+    ua = run_query(portfolio, ua_usage)
+    if ua.empty:
+        st.success("No container has Universal Analytics tags")
+    else:
+        st.dataframe(ua.drop(columns='container_id'), hide_index=True, use_container_width=True)
+
+    st.subheader("Tracking IDs shared between containers")
+    platforms = sorted(portfolio['tracking_ids']['platform'].unique())
+    selected = st.multiselect(
+        "Platforms",
+        platforms,
+        default=[platform for platform in SHARED_ID_PLATFORMS if platform in platforms],
+        key="portfolio_platforms"
+    )
+    shared = run_query(portfolio, shared_tracking_ids, tuple(selected))
+    if shared.empty:
+        st.caption("No tracking ID of these platforms appears in more than one container")
+    else:
+        st.dataframe(shared, hide_index=True, use_container_width=True)
+
+    st.subheader("Tag types across containers")
+    distribution = run_query(portfolio, tag_type_distribution)
+    st.bar_chart(distribution['total'].head(TOP_TAG_TYPES))
+    st.dataframe(distribution, use_container_width=True)
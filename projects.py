@@ -0,0 +1,242 @@
+import logging
+import time
+from datetime import datetime
+
+from app_common import handle_error
+from config_store import SupabaseBlobStore, decode_config, store_config
+from db import get_supabase_client
+from local_cache import analysis_cache, project_config_list_cache, project_list_cache
+from query_timing import execute_timed
+from tag_cache import PROMPT_VERSION
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+PROJECT_PAGE_SIZE = 20  # Projects per page on the All Projects page
+
+def list_projects(user_id, limit=PROJECT_PAGE_SIZE, after=None):
+    """List a user's projects newest first, selecting only the columns listings need.
+
+    `after` is the last project of the previous page, for keyset pagination. Pages are cached
+    per user until save_project invalidates them; callers get a copy, so they can't change the cached page.
+    """
+    page_key = f"{limit}:{after['created_at']}:{after['id']}" if after else str(limit)
+    pages = project_list_cache.get(str(user_id)) or {}
+    if page_key in pages:
+        return list(pages[page_key])
+    try:
+        logger.info(f"Listing projects for user: {user_id}")
+        client = get_supabase_client()
+        query = client.table('projects').select("id, name, created_at").eq('user_id', str(user_id)).order('created_at', desc=True).order('id', desc=True).limit(limit)
+        if after:
+            query = query.or_(f"created_at.lt.{after['created_at']},and(created_at.eq.{after['created_at']},id.lt.{after['id']})")
+        result = execute_timed(query, "list_projects")
+        projects = result.data if result else []
+        project_list_cache.set(str(user_id), {**pages, page_key: projects})
+        logger.info(f"Projects listed: {len(projects)}")
+        return list(projects)
+    except Exception as e:
+        logger.error(f"Error listing projects for user {user_id}: {str(e)}")
+        handle_error(e)
+        return []
+
+
+def list_project_configs(user_id):
+    """All of a user's projects with their stored configs, for the portfolio view.
+
+    Cached per user until save_project invalidates it, so reruns of the portfolio page don't query Supabase;
+    callers get a copy of the cached list.
+    """
+    projects = project_config_list_cache.get(str(user_id))
+    if projects is not None:
+        return list(projects)
+    try:
+        client = get_supabase_client()
+        result = execute_timed(client.table('projects').select("id, name, user_id, config").eq('user_id', str(user_id)).order('name'), "list_project_configs")
+        projects = result.data if result else []
+        project_config_list_cache.set(str(user_id), projects)
+        return list(projects)
+    except Exception as e:
+        logger.error(f"Error listing project configs for user {user_id}: {str(e)}")
+        handle_error(e)
+        return []
+
+
+def get_project(project_id):
+    """Retrieve a specific project by its ID."""
+    try:
+        logger.info(f"Fetching project with ID: {project_id}")
+        client = get_supabase_client()
+        result = execute_timed(client.table('projects').select("*").eq('id', project_id), "get_project")
+        
+        if result and result.data:
+            project = result.data[0]
+            logger.info(f"Project fetched successfully: {project['name']}")
+            return project
+        else:
+            logger.warning(f"No project found with ID: {project_id}")
+            return None
+    except Exception as e:
+        logger.error(f"Error fetching project with ID {project_id}: {str(e)}")
+        handle_error(e)
+        return None
+
+
+def load_project_config(project):
+    """Decode a project's stored config, fetching only entities not already cached."""
+    try:
+        return decode_config(project['config'], SupabaseBlobStore(get_supabase_client, project['user_id']))
+    except Exception as e:
+        logger.error(f"Error loading config for project {project['id']}: {str(e)}")
+        handle_error(e)
+        return None
+
+
+def get_project_versions(project_id, limit=None):
+    """List a project's saved versions newest first, without their configs or analyses."""
+    try:
+        client = get_supabase_client()
+        query = client.table('project_versions').select("id, config_hash, prompt_version, created_at").eq('project_id', project_id).order('created_at', desc=True)
+        if limit:
+            query = query.limit(limit)
+        result = execute_timed(query, "get_project_versions")
+        return result.data if result else []
+    except Exception as e:
+        logger.error(f"Error fetching versions for project {project_id}: {str(e)}")
+        handle_error(e)
+        return []
+
+
+def get_project_version(version_id):
+    """Retrieve a saved version, including its stored config and analysis."""
+    try:
+        client = get_supabase_client()
+        result = execute_timed(client.table('project_versions').select("*").eq('id', version_id), "get_project_version")
+        return result.data[0] if result and result.data else None
+    except Exception as e:
+        logger.error(f"Error fetching project version {version_id}: {str(e)}")
+        handle_error(e)
+        return None
+
+
+def get_latest_version(user_id, name, client_factory=get_supabase_client):
+    """Retrieve the newest saved version of the user's project with this name, if any.
+
+    Errors are logged rather than shown, so background jobs can call this with the client of the session that submitted them.
+    """
+    try:
+        client = client_factory()
+        result = execute_timed(client.table('projects').select("id").eq('user_id', str(user_id)).eq('name', name), "get_latest_version project")
+        if not result or not result.data:
+            return None
+        result = execute_timed(client.table('project_versions').select("*").eq('project_id', result.data[0]['id']).order('created_at', desc=True).limit(1), "get_latest_version")
+        return result.data[0] if result and result.data else None
+    except Exception as e:
+        logger.error(f"Error fetching latest version of {name} for user {user_id}: {str(e)}")
+        return None
+
+
+def save_project_version(client, project_id, user_id, stored_config, analysis, config_hash):
+    """Record an upload in the project's history; a config already in it is left as it was.
+
+    One upsert on (project_id, config_hash) that ignores duplicates, so concurrent saves of
+    the same upload can't record it twice.
+    """
+    execute_timed(client.table('project_versions').upsert({
+        "project_id": project_id,
+        "user_id": user_id,
+        "config": stored_config,
+        "analysis": analysis,
+        "config_hash": config_hash,
+        "prompt_version": PROMPT_VERSION,
+        "created_at": datetime.now().isoformat()
+    }, on_conflict='project_id,config_hash', ignore_duplicates=True), "save_project_version")
+    logger.info(f"Saved version {config_hash} of project {project_id}")
+
+
+def analysis_cache_key(hash_value, user_id):
+    return f"{user_id}:{hash_value}"
+
+
+def get_cached_analysis(hash_value, user_id):
+    """Retrieve cached analysis, checking the local cache before Supabase."""
+    cache_key = analysis_cache_key(hash_value, user_id)
+    with span('cache_lookup') as attributes:
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            attributes.update(tier='local', hit=True)
+            logger.info(f"Local cache hit for hash: {hash_value}, user: {user_id}")
+            return cached
+        attributes.update(tier='supabase', hit=False)
+        try:
+            client = get_supabase_client()
+            result = execute_timed(client.table('analysis_cache').select("*").eq('hash', hash_value).eq('user_id', user_id), "get_cached_analysis")
+            cached = result.data[0] if result and result.data else None
+            if cached:
+                attributes['hit'] = True
+                analysis_cache.set(cache_key, cached)
+            return cached
+        except Exception as e:
+            # The local tier has already been checked, so treat an unreachable or slow Supabase as a miss
+            logger.error(f"Error retrieving cached analysis for hash {hash_value} and user {user_id}: {str(e)}")
+            return None
+
+
+def save_cached_analysis(hash_value, analysis, user_id, project_id):
+    """Save analysis to the local cache and Supabase (write-through), replacing any earlier row for the hash and user."""
+    row = {
+        "hash": hash_value,
+        "analysis": analysis,
+        "user_id": user_id,
+        "project_id": project_id,
+        "created_at": datetime.now().isoformat()
+    }
+    analysis_cache.set(analysis_cache_key(hash_value, user_id), row)
+    try:
+        client = get_supabase_client()
+        data = execute_timed(client.table('analysis_cache').upsert(row, on_conflict='hash,user_id'), "save_cached_analysis")
+        logger.info(f"Analysis cached for hash: {hash_value}, user: {user_id}, project: {project_id}")
+        return data.data[0] if data and data.data else None
+    except Exception as e:
+        logger.error(f"Error saving cached analysis for hash {hash_value}, user {user_id}, project {project_id}: {str(e)}")
+        handle_error(e)
+        return None
+
+
+def save_project(user_id, name, config, analysis, config_hash=None):
+    """Save an upload's project, version and cached analysis, returning the project row.
+
+    Four upserts, one round trip each: entity blobs, project, version and cached analysis. Each is
+    idempotent, so saving the same upload again leaves the same rows.
+    """
+    start = time.perf_counter()
+    with span('save_project'):
+        try:
+            logger.info(f"Attempting to save project for user: {user_id}, name: {name}")
+            client = get_supabase_client()
+            stored_config = store_config(config, SupabaseBlobStore(get_supabase_client, user_id))
+
+            # One round trip whether the project is new or not. created_at keeps its value from the first insert,
+            # which the database defaults (see supabase/migrations)
+            data = execute_timed(client.table('projects').upsert({
+                "user_id": user_id,
+                "name": name,
+                "config": stored_config,
+                "analysis": analysis,
+            }, on_conflict='user_id,name'), "save_project upsert")
+            project_list_cache.delete(str(user_id))
+            project_config_list_cache.delete(str(user_id))
+            if not data or not data.data:
+                logger.error(f"No data returned when saving project for user {user_id}, name {name}")
+                return None
+
+            project = data.data[0]
+            save_project_version(client, project['id'], user_id, stored_config, analysis, config_hash)
+            if config_hash:
+                save_cached_analysis(config_hash, analysis, user_id, project['id'])
+            logger.info(f"Project saved for user: {user_id}, name: {name} in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return project
+        except Exception as e:
+            logger.error(f"Error saving project for user {user_id}, name {name}: {str(e)}")
+            handle_error(e)
+            return None
@@ -0,0 +1,147 @@
+import json
+import re
+
+from container_index import VARIABLE_REFERENCE_PATTERN
+
+HTML_SUMMARY_MIN_LENGTH = 200  # Shorter HTML bodies are kept verbatim
+SYMBOL_MIN_LENGTH = 12  # Shorter repeated values aren't worth a symbol reference
+FILTER_KEYS = ('customEventFilter', 'filter', 'autoEventFilter')
+LITERAL_KEYS = ('name',)  # Entity names, which the model's answer is matched back to entities by
+
+URL_PATTERN = re.compile(r'(?:https?:)?//[^\s"\'<>()\\]+')
+TRACKING_ID_PATTERNS = re.compile(
+    r'\b(?:G-[A-Z0-9]{6,}|UA-\d+-\d+|AW-\d+|DC-\d+|GTM-[A-Z0-9]+)\b'
+    r'|fbq\(\s*[\'"]init[\'"]\s*,\s*[\'"]?(\d+)'
+    r'|ttq\.load\(\s*[\'"]([A-Z0-9]+)'
+)
+
+
+def estimate_tokens(text):
+    """Roughly estimate the token count of text (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def compact_value(parameter):
+    """Collapse a GTM {type, key, value|list|map} parameter to a plain JSON value."""
+    param_type = parameter.get('type')
+    if param_type == 'LIST':
+        return [compact_value(item) for item in parameter.get('list', [])]
+    if param_type == 'MAP':
+        return compact_parameters(parameter.get('map', []))
+    value = parameter.get('value')
+    if param_type == 'BOOLEAN' and value in ('true', 'false'):
+        return value == 'true'
+    if param_type == 'INTEGER' and isinstance(value, str) and value.lstrip('-').isdigit():
+        return int(value)
+    return value
+
+
+def compact_parameters(parameters):
+    """Flatten a GTM parameter list to {key: value}, summarising long HTML bodies."""
+    compacted = {}
+    for parameter in parameters:
+        value = compact_value(parameter)
+        if parameter.get('key') == 'html' and isinstance(value, str) and len(value) >= HTML_SUMMARY_MIN_LENGTH:
+            value = summarize_html(value)
+        compacted[parameter.get('key')] = value
+    return compacted
+
+
+def summarize_html(html_content):
+    """Reduce a Custom HTML body to the URLs, tracking IDs and variables it contains."""
+    ids = []
+    for match in TRACKING_ID_PATTERNS.finditer(html_content):
+        ids.append(next((group for group in match.groups() if group), match.group(0)))
+    summary = {
+        'htmlLength': len(html_content),
+        'urls': list(dict.fromkeys(URL_PATTERN.findall(html_content))),
+        'ids': list(dict.fromkeys(ids)),
+        'variables': list(dict.fromkeys(VARIABLE_REFERENCE_PATTERN.findall(html_content))),
+    }
+    return {key: value for key, value in summary.items() if value}
+
+
+def compact_condition(condition):
+    """Render a trigger filter condition as a single 'arg0 TYPE arg1' string."""
+    args = compact_parameters(condition.get('parameter', []))
+    text = f"{args.get('arg0')} {condition.get('type')} {args.get('arg1')}"
+    return f"NOT {text}" if args.get('negate') else text
+
+
+def compact_entity(entity):
+    """Compact a sanitised tag, trigger or variable dict."""
+    compacted = {}
+    for key, value in entity.items():
+        if key == 'parameter':
+            compacted[key] = compact_parameters(value)
+        elif key in FILTER_KEYS:
+            compacted[key] = [compact_condition(condition) for condition in value]
+        else:
+            compacted[key] = value
+    return compacted
+
+
+def dumps_compact(data):
+    """Serialise without indentation or padding."""
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+def build_symbol_table(data, literal_keys=LITERAL_KEYS):
+    """Replace long string values that repeat across the data with $N references.
+
+    Values of literal_keys are never replaced, so entity names stay verbatim for the model to quote
+    back (see tag_cache.split_tag_sections). Returns the rewritten data and the symbol table mapping each $N to its value.
+    """
+    counts = {}
+
+    def count(value):
+        if isinstance(value, str):
+            if len(value) >= SYMBOL_MIN_LENGTH:
+                counts[value] = counts.get(value, 0) + 1
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if key not in literal_keys:
+                    count(item)
+        elif isinstance(value, list):
+            for item in value:
+                count(item)
+
+    count(data)
+
+    symbols = {}
+    references = {}
+    for value, occurrences in sorted(counts.items(), key=lambda item: -item[1] * len(item[0])):
+        if occurrences < 2:
+            continue
+        reference = f"${len(symbols) + 1}"
+        # Only use a symbol when the definition plus references is shorter than repeating the value
+        if len(value) + occurrences * len(reference) < occurrences * len(value):
+            symbols[reference] = value
+            references[value] = reference
+
+    def replace(value):
+        if isinstance(value, str):
+            return references.get(value, value)
+        if isinstance(value, dict):
+            return {key: item if key in literal_keys else replace(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [replace(item) for item in value]
+        return value
+
+    return replace(data), symbols
+
+
+def compact_prompt_data(sections):
+    """Compact named prompt sections (lists of sanitised entities) into dense text.
+
+    Returns the compacted text and before/after token estimates against the indented JSON.
+    """
+    before = sum(estimate_tokens(json.dumps(entities, indent=2)) for entities in sections.values())
+    compacted, symbols = build_symbol_table({name: [compact_entity(entity) for entity in entities] for name, entities in sections.items()})
+
+    parts = []
+    if symbols:
+        parts.append(f"Symbols:\n{dumps_compact(symbols)}")
+    parts.extend(f"{name}:\n{dumps_compact(entities)}" for name, entities in compacted.items())
+    text = '\n\n'.join(parts)
+    return text, {'before_tokens': before, 'after_tokens': estimate_tokens(text)}
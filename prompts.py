@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+
+from prompt_compaction import compact_prompt_data
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")  # Part of PROMPT_VERSION, so changing it invalidates cached tag findings
+
+FULL_SYSTEM_PROMPT = "You are a marketing expert responsible for reviewing and providing feedback on Google Tag Manager configurations. You should follow the instructions directly and not omit any steps. Do not guess any results. Do not output any vague suggestions - all action points should have clear and concise instructions that will lead to the problem being solved. Use EN-AU spelling. Do not say 'in conclusion'"
+
+LIMITED_SYSTEM_PROMPT = "You are a marketing expert providing a brief overview of a GTM configuration. Focus on the most important points within the word limit. Use proper formatting with paragraphs and line breaks. Use EN-AU spelling. Do not say 'conclusion'"
+
+TRACKING_ID_INSTRUCTIONS = """
+    First - output a summary of the tracking ID's used for each of the platforms detected so we can sanity check vs our measurement plan. We should also check to see if there are any discrepancies between ID's used in tags - which could be cause for concern. If you find discrepancies between ID usage flag these as errors.
+    """
+
+FULL_INSTRUCTIONS = """
+    Output your analysis of each tag following the guidelines below:
+    1. List tags that have problems - one section for each tag, output tag name in format "Tag Name: 'XXXX'" in bold heading (not large)
+    2. For each tag provide a dot-point analysis on improvements based on best practice
+    3. We should analyse tag names based on best practice naming convention -  [Platform] - [Type] - [Description] - if they are not, we should provide a suggestion for a rename
+    4. Do not number headings
+    5. When outputting tracking ID's or tag names in content wrap them in code tags for better readability
+    6. Skip output for tags that have no problems (we should limit redundant output)
+    7. UA tags, paused tags, custom template names, Floodlight advertiser ID and activity tag values, TTD pixel URLs and NOT_SET consent status are reported separately by automated checks - do not repeat them, and do not analyse UA tags
+    """
+
+LIMITED_INSTRUCTIONS = """
+    Provide a brief summary of the configuration and highlight the most critical issues or improvements. Focus on the following:
+    1. Summarize the main tracking IDs used and any discrepancies.
+    2. Highlight up to 3 of the most critical issues or improvements needed.
+    3. Outdated or paused tags (e.g., UA tags) are reported separately by automated checks - do not mention them.
+    
+    Limit your response to about 150 words. Use proper formatting with paragraphs and line breaks.
+    """
+
+
+BATCH_PROMPT_TEMPLATE = """
+    Analyse the following tags from a Google Tag Manager (GTM) configuration. This is one batch of {batch_size} of the container's {tag_count} tags - only analyse the tags listed here.
+
+    Container Name: {container_name}
+
+{sections}
+    """
+
+# Batch replies are cached per tag, so tags without problems must be named rather than left out
+CLEAN_TAGS_LABEL = "Tags without problems:"
+BATCH_INSTRUCTIONS = f"""
+    8. Finish with one line "{CLEAN_TAGS_LABEL} `Tag Name`, `Tag Name`" naming each tag of this batch that has no problems, or "{CLEAN_TAGS_LABEL} none"
+    """
+
+COMPACT_FORMAT_NOTE = """
+    The configuration below is compact JSON. Parameters are {key: value} objects, trigger filters are "arg0 TYPE arg1" strings, and values such as "$1" refer to entries in the Symbols table. Long Custom HTML bodies are replaced by the URLs, tracking IDs and variables extracted from them.
+    """
+
+
+def sanitize_tag(index, tag):
+    """Reduce a tag to the fields the LLM needs, with trigger, folder and template IDs resolved."""
+    sanitized = {k: v for k, v in tag.items() if k in ['name', 'type', 'parameter']}
+    if tag.get('type') in index.template_names:
+        sanitized['templateName'] = index.template_names[tag['type']]
+    firing, blocking = index.tag_triggers(tag)
+    sanitized['firingTriggers'] = firing
+    if blocking:
+        sanitized['blockingTriggers'] = blocking
+    if 'parentFolderId' in tag:
+        sanitized['folder'] = index.folder_name(tag['parentFolderId'])
+    return sanitized
+
+
+def sanitize_variable(variable):
+    """Reduce a variable to the fields the LLM needs."""
+    return {k: v for k, v in variable.items() if k in ['name', 'type', 'parameter']}
+
+
+def sanitize_trigger(trigger):
+    """Reduce a trigger to the fields the LLM needs."""
+    return {k: v for k, v in trigger.items() if k in ['name', 'type', 'customEventFilter']}
+
+
+def format_sections(sections, compact):
+    """Serialise named lists of sanitised entities for a prompt, compacted unless compact is False."""
+    if not compact:
+        return '\n\n'.join(f"{name}:\n{json.dumps(entities, indent=2)}" for name, entities in sections.items())
+    text, stats = compact_prompt_data(sections)
+    logger.info(f"Prompt data compacted from ~{stats['before_tokens']} to ~{stats['after_tokens']} tokens")
+    return COMPACT_FORMAT_NOTE + '\n' + text
+
+
+def create_base_prompt(index, compact=True):
+    """Create the base prompt for both full and limited analyses."""
+    config_summary = index.summary()
+    sections = format_sections({
+        'Tags': [sanitize_tag(index, tag) for tag in index.tags],
+        'Variables': [sanitize_variable(var) for var in index.variables],
+        'Triggers': [sanitize_trigger(trigger) for trigger in index.triggers],
+    }, compact)
+
+    return f"""
+    Analyse the following Google Tag Manager (GTM) configuration:
+
+    Container Name: {config_summary['container_name']}
+    Tag Manager URL: {config_summary['tag_manager_url']}
+
+    Configuration Summary:
+    {json.dumps(config_summary, separators=(',', ':') if compact else None, indent=None if compact else 2)}
+
+{sections}
+    """ + TRACKING_ID_INSTRUCTIONS
+
+
+def create_batch_prompt(index, tags, triggers, variables, compact=True):
+    """Create the prompt for one batch of tags, carrying only the triggers and variables they reference."""
+    config_summary = index.summary()
+    sections = format_sections({
+        'Tags': [sanitize_tag(index, tag) for tag in tags],
+        'Variables referenced by these tags': [sanitize_variable(var) for var in variables],
+        'Triggers referenced by these tags': [sanitize_trigger(trigger) for trigger in triggers],
+    }, compact)
+
+    return BATCH_PROMPT_TEMPLATE.format(
+        batch_size=len(tags),
+        tag_count=config_summary['tag_count'],
+        container_name=config_summary['container_name'],
+        sections=sections,
+    ) + FULL_INSTRUCTIONS + BATCH_INSTRUCTIONS
@@ -0,0 +1,16 @@
+import logging
+import time
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+def execute_timed(query, description):
+    """Execute a Supabase query as a traced span, logging how long the round trip took."""
+    start = time.perf_counter()
+    try:
+        with span('supabase', query=description):
+            return query.execute()
+    finally:
+        logger.info(f"Supabase {description} took {(time.perf_counter() - start) * 1000:.0f} ms")
@@ -0,0 +1,197 @@
+import csv
+import html
+import io
+import json
+import re
+
+from findings_report import inline_markup, plain_text
+from rules import finding_markdown
+
+# Columns of the flat findings table shared by the CSV and XLSX exports
+FINDING_COLUMNS = ('id', 'section', 'source', 'severity', 'entity_kind', 'entity_id', 'entity_name', 'message')
+
+HTML_INLINE_TAGS = {
+    'code': '<code>{text}</code>',
+    'bold': '<strong>{text}</strong>',
+    'italic': '<em>{text}</em>',
+    'strike': '<s>{text}</s>',
+    'link': '<a href="{url}">{text}</a>',
+}
+
+HTML_STYLE = """
+body { font-family: Helvetica, Arial, sans-serif; font-size: 14px; line-height: 1.5; max-width: 900px; margin: 2em auto; color: #101828; }
+table { border-collapse: collapse; margin: 1em 0; }
+th, td { border: 1px solid #d0d5dd; padding: 4px 8px; text-align: left; vertical-align: top; }
+code, pre { font-family: Courier, monospace; font-size: 12px; }
+.severity { font-size: 11px; font-weight: bold; }
+.error { color: #b42318; }
+.warning { color: #b54708; }
+.info { color: #808080; }
+"""
+
+
+def markdown_html(text):
+    return inline_markup(text, HTML_INLINE_TAGS, html.escape)
+
+
+def finding_rows(report):
+    """Flatten a report's check findings and tag advice into rows of FINDING_COLUMNS."""
+    rows = []
+    for check in report['checks']:
+        for finding in check['findings']:
+            rows.append({
+                'id': finding['id'],
+                'section': check['title'],
+                'source': 'rule',
+                'severity': finding['severity'],
+                'entity_kind': finding['entity_kind'],
+                'entity_id': finding['entity_id'],
+                'entity_name': finding['entity_name'],
+                'message': finding['message'],
+            })
+    for section in report['tags']:
+        for item in section['items']:
+            rows.append({
+                'id': item['id'],
+                'section': 'Tag analysis',
+                'source': 'llm',
+                'severity': item['severity'],
+                'entity_kind': 'tag',
+                'entity_id': section['tag_id'],
+                'entity_name': section['tag_name'],
+                'message': plain_text(item['text']),
+            })
+    return rows
+
+
+def tracking_id_rows(report):
+    return [
+        {'platform': platform, 'tracking_id': tracking_id, 'tag_count': len(tag_names), 'tags': ', '.join(tag_names)}
+        for platform, ids in report['tracking_ids'].items()
+        for tracking_id, tag_names in ids.items()
+    ]
+
+
+def render_json(report):
+    return json.dumps(report, indent=2, default=str).encode()
+
+
+def render_csv(report):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FINDING_COLUMNS)
+    writer.writeheader()
+    writer.writerows(finding_rows(report))
+    # BOM so Excel opens the UTF-8 file with the right encoding
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+def render_pdf(report):
+    """PDF with the same sections as the HTML. ReportLab is imported on first use."""
+    from pdf_export import build_report_pdf
+    return build_report_pdf(report)
+
+
+def render_xlsx(report):
+    """Workbook with Findings, Tracking IDs and Summary sheets. Needs openpyxl."""
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        pd.DataFrame(finding_rows(report), columns=FINDING_COLUMNS).to_excel(writer, sheet_name='Findings', index=False)
+        pd.DataFrame(tracking_id_rows(report), columns=['platform', 'tracking_id', 'tag_count', 'tags']).to_excel(writer, sheet_name='Tracking IDs', index=False)
+        pd.DataFrame(list(report['summary'].items()), columns=['field', 'value']).to_excel(writer, sheet_name='Summary', index=False)
+    return buffer.getvalue()
+
+
+def blocks_html(blocks):
+    """Convert parsed markdown blocks (see findings_report.parse_markdown_blocks) to HTML."""
+    parts = []
+    for block in blocks:
+        if block['type'] == 'heading':
+            level = min(block['level'] + 1, 6)
+            parts.append(f"<h{level}>{markdown_html(block['text'])}</h{level}>")
+        elif block['type'] == 'paragraph':
+            parts.append(f"<p>{markdown_html(block['text'])}</p>")
+        elif block['type'] == 'list_item':
+            # Items are rendered flat, indented by depth, so lists needn't be rebuilt from them
+            marker = html.escape(block['marker'])
+            parts.append(f"<p style=\"margin: 0 0 0.25em {1.5 * block['depth'] + 1}em; text-indent: -1em\">{marker} {markdown_html(block['text'])}</p>")
+        elif block['type'] == 'code':
+            parts.append(f"<pre>{html.escape(block['text'])}</pre>")
+        elif block['type'] == 'table':
+            parts.append(html_table(block['rows'], cell=markdown_html))
+        elif block['type'] == 'rule':
+            parts.append("<hr>")
+    return '\n'.join(parts)
+
+
+def html_table(rows, cell=html.escape):
+    header, *body = rows
+    lines = ["<table>", "<tr>" + ''.join(f"<th>{cell(value)}</th>" for value in header) + "</tr>"]
+    lines.extend("<tr>" + ''.join(f"<td>{cell(value)}</td>" for value in row) + "</tr>" for row in body)
+    lines.append("</table>")
+    return '\n'.join(lines)
+
+
+def severity_html(severity):
+    return f'<span class="severity {severity}">{severity.upper()}</span>'
+
+
+def render_html(report):
+    """Standalone HTML page with the same sections as the PDF."""
+    summary = report['summary']
+    container_name = html.escape(summary['container_name'])
+    parts = [
+        "<!DOCTYPE html>",
+        f"<html><head><meta charset=\"utf-8\"><title>GTM Audit Findings - {container_name}</title><style>{HTML_STYLE}</style></head><body>",
+        "<h1>GTM Audit Findings</h1>",
+        html_table([
+            ["Container Name", summary['container_name']],
+            ["Tag Manager URL", summary['tag_manager_url']],
+            ["Tag Count", str(summary['tag_count'])],
+            ["Variable Count", str(summary['variable_count'])],
+            ["Trigger Count", str(summary['trigger_count'])],
+        ]),
+        "<h2>Analysis</h2>",
+    ]
+
+    tracking_ids = tracking_id_rows(report)
+    if tracking_ids:
+        parts.append("<h3>Tracking IDs</h3>")
+        parts.append(html_table([["Platform", "ID", "Tags"]] + [[row['platform'], row['tracking_id'], row['tags']] for row in tracking_ids]))
+
+    if report['checks']:
+        parts.append("<h3>Automated checks</h3>")
+    for check in report['checks']:
+        parts.append(f"<p id=\"{html.escape(check['id'])}\"><strong>{html.escape(check['title'])} ({len(check['findings'])})</strong> {severity_html(check['severity'])}</p>")
+        parts.append("<ul>" + ''.join(f"<li>{markdown_html(finding_markdown(finding))}</li>" for finding in check['findings']) + "</ul>")
+
+    parts.append(blocks_html(report['notes']))
+
+    for section in report['tags']:
+        parts.append(f"<p id=\"{html.escape(section['id'])}\"><strong>Tag Name: '{html.escape(section['tag_name'])}'</strong> {severity_html(section['severity'])}</p>")
+        parts.append("<ul>" + ''.join(f"<li>{markdown_html(item['text'])}</li>" for item in section['items']) + "</ul>")
+
+    parts.append("</body></html>")
+    return '\n'.join(parts).encode()
+
+
+# Format -> label, MIME type, file extension and renderer
+EXPORT_FORMATS = {
+    'pdf': {'label': "PDF", 'mime': "application/pdf", 'extension': 'pdf', 'render': render_pdf},
+    'html': {'label': "HTML", 'mime': "text/html", 'extension': 'html', 'render': render_html},
+    'csv': {'label': "CSV", 'mime': "text/csv", 'extension': 'csv', 'render': render_csv},
+    'xlsx': {'label': "Excel (XLSX)", 'mime': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 'extension': 'xlsx', 'render': render_xlsx},
+    'json': {'label': "JSON", 'mime': "application/json", 'extension': 'json', 'render': render_json},
+}
+
+
+def render_report(report, export_format):
+    """Render a findings report (see findings_report.build_report) in one of EXPORT_FORMATS, as bytes."""
+    return EXPORT_FORMATS[export_format]['render'](report)
+
+
+def export_file_name(container_name, export_format):
+    """Download file name for a container's findings, with spaces and periods replaced by hyphens."""
+    clean_container_name = re.sub(r'[\s.]+', '-', container_name)
+    return f"{clean_container_name}.{EXPORT_FORMATS[export_format]['extension']}"
@@ -0,0 +1,264 @@
+import html
+import re
+
+from gtm_model import parameter_value
+
+# Severity levels used by findings, in display order
+SEVERITY_ERROR = 'error'
+SEVERITY_WARNING = 'warning'
+SEVERITY_INFO = 'info'
+
+# Tag types handled by the rule engine
+UA_TAG_TYPES = ('ua',)
+FLOODLIGHT_TAG_TYPES = ('flc', 'fls')
+CUSTOM_TEMPLATE_PREFIX = 'cvt_'
+TTD_PIXEL_HOST = 'insight.adsrvr.org'
+
+# Findings listed per rule in limited (anonymous) analyses, which are trimmed like their LLM narrative
+LIMITED_FINDINGS_PER_RULE = 3
+
+# Section headings for rendered findings, in display order
+RULE_TITLES = {
+    'ua_tag': "UA tags to delete",
+    'paused_tag': "Paused tags to review",
+    'floodlight_advertiser_mismatch': "Floodlight advertiser ID discrepancies",
+    'floodlight_tag': "Floodlight tags",
+    'ttd_pixel': "TTD pixels",
+    'custom_template': "Custom template tags",
+    'missing_trigger': "Tags referencing missing triggers",
+    'undefined_variable': "Undefined variable references",
+    'no_firing_trigger': "Tags without firing triggers",
+    'consent_not_set': "Tags with NOT_SET consent",
+}
+
+# Tag type -> (platform, parameter key holding the platform's tracking ID)
+TRACKING_ID_PARAMETERS = {
+    'googtag': ('GA4', 'tagId'),
+    'gaawe': ('GA4', 'measurementIdOverride'),
+    'ua': ('UA', 'trackingId'),
+    'awct': ('Google Ads', 'conversionId'),
+    'awud': ('Google Ads', 'conversionId'),
+    'sp': ('Google Ads', 'conversionId'),
+    'flc': ('Floodlight', 'advertiserId'),
+    'fls': ('Floodlight', 'advertiserId'),
+    'hjtc': ('Hotjar', 'hotjar_site_id'),
+}
+
+# Custom template parameter key -> platform
+TEMPLATE_TRACKING_ID_PARAMETERS = {
+    'pixelId': 'Facebook',
+    'pixel_code': 'TikTok',
+    'partnerId': 'LinkedIn',
+}
+
+FB_PIXEL_INIT_PATTERN = re.compile(r"fbq\(\s*['\"]init['\"]\s*,\s*['\"]?(\d+)")
+IMG_SRC_PATTERN = re.compile(r'<img[^>]*\ssrc=["\']([^"\']+)["\']', re.IGNORECASE)
+ADSRVR_URL_PATTERN = re.compile(r'https?://[^\s"\'<>()]*adsrvr\.org[^\s"\'<>()]*', re.IGNORECASE)
+
+
+def get_parameter(entity, key):
+    """Return the value of a top-level parameter on a tag or variable, model (see gtm_model.py) or plain dict, or None."""
+    return parameter_value(entity, key)
+
+
+ENTITY_ID_KEYS = {'tag': 'tagId', 'trigger': 'triggerId', 'variable': 'variableId'}
+
+
+def make_finding(rule, severity, entity, message, kind='tag', **details):
+    """Build a finding dict for a single tag, trigger or variable (or the whole container when entity is None)."""
+    return {
+        'rule': rule,
+        'severity': severity,
+        'entity_kind': kind if entity else None,
+        'entity_id': entity.get(ENTITY_ID_KEYS[kind]) if entity else None,
+        'entity_name': entity.get('name', f'Unnamed {kind.capitalize()}') if entity else None,
+        'message': message,
+        'details': details,
+    }
+
+
+def extract_ttd_urls(html_content):
+    """Extract TTD pixel URLs from Custom HTML, preferring image sources."""
+    content = html.unescape(html_content or '')
+    urls = [src for src in IMG_SRC_PATTERN.findall(content) if 'adsrvr.org' in src]
+    if not urls:
+        urls = ADSRVR_URL_PATTERN.findall(content)
+    return list(dict.fromkeys(urls))
+
+
+def run_rules(index):
+    """Run the deterministic checks over an indexed GTM config in a single pass over its tags."""
+    findings = []
+    advertiser_ids = {}
+
+    for tag in index.tags:
+        tag_type = tag.get('type', '')
+
+        if tag_type in UA_TAG_TYPES:
+            findings.append(make_finding(
+                'ua_tag', SEVERITY_ERROR, tag,
+                "Universal Analytics is no longer active - delete this tag.",
+                tracking_id=get_parameter(tag, 'trackingId') or get_parameter(tag, 'gaSettings'),
+            ))
+            # UA tags are only ever flagged for deletion
+            continue
+
+        # Tags fired as another tag's setup or teardown tag need no triggers of their own
+        if not tag.get('firingTriggerId') and tag.get('name') not in index.sequencing_tags:
+            findings.append(make_finding(
+                'no_firing_trigger', SEVERITY_WARNING, tag,
+                "Tag has no firing triggers and will never fire.",
+            ))
+        for trigger_id in tag.get('firingTriggerId', []) + tag.get('blockingTriggerId', []):
+            if index.trigger_name(trigger_id) is None:
+                findings.append(make_finding(
+                    'missing_trigger', SEVERITY_ERROR, tag,
+                    f"References trigger ID `{trigger_id}`, which does not exist in this container.",
+                    trigger_id=trigger_id,
+                ))
+
+        if tag.get('paused'):
+            findings.append(make_finding(
+                'paused_tag', SEVERITY_WARNING, tag,
+                "Tag is paused - review and remove it if it is no longer needed.",
+            ))
+
+        if tag_type.startswith(CUSTOM_TEMPLATE_PREFIX):
+            template_name = index.template_names.get(tag_type)
+            if template_name:
+                findings.append(make_finding(
+                    'custom_template', SEVERITY_INFO, tag,
+                    f"Custom template tag of type `{template_name}`.",
+                    template_type=tag_type, template_name=template_name,
+                ))
+            else:
+                findings.append(make_finding(
+                    'custom_template', SEVERITY_WARNING, tag,
+                    f"Custom template `{tag_type}` is not defined in this container.",
+                    template_type=tag_type, template_name=None,
+                ))
+
+        elif tag_type in FLOODLIGHT_TAG_TYPES:
+            # Resolved like collect_tracking_ids, so a constant holding the same ID isn't a second advertiser
+            advertiser_id = index.resolve_value(get_parameter(tag, 'advertiserId'))
+            activity_tag = get_parameter(tag, 'activityTag')
+            advertiser_ids.setdefault(advertiser_id, []).append(tag.get('name', 'Unnamed Tag'))
+            findings.append(make_finding(
+                'floodlight_tag', SEVERITY_INFO, tag,
+                f"Advertiser ID `{advertiser_id}`, activity tag `{activity_tag}`.",
+                advertiser_id=advertiser_id, activity_tag=activity_tag,
+                group_tag=get_parameter(tag, 'groupTag'),
+            ))
+
+        elif tag_type == 'html':
+            html_content = get_parameter(tag, 'html')
+            if html_content and TTD_PIXEL_HOST in html_content:
+                urls = extract_ttd_urls(html_content)
+                url_list = ', '.join(f"`{url}`" for url in urls) or 'no URL found'
+                findings.append(make_finding(
+                    'ttd_pixel', SEVERITY_INFO, tag,
+                    f"TTD pixel URL for verification: {url_list}.",
+                    urls=urls,
+                ))
+
+        if tag.get('consentSettings', {}).get('consentStatus') == 'NOT_SET':
+            findings.append(make_finding(
+                'consent_not_set', SEVERITY_WARNING, tag,
+                "Consent status is NOT_SET - configure consent checks for this tag.",
+            ))
+
+    for name, referencing in index.variable_references.items():
+        if index.is_variable_defined(name):
+            continue
+        for kind, entity_ids in referencing.items():
+            for entity_id in entity_ids:
+                findings.append(make_finding(
+                    'undefined_variable', SEVERITY_ERROR, index.get_entity(kind, entity_id),
+                    f"References `{{{{{name}}}}}`, which is not defined in this container.",
+                    kind=kind, variable_name=name,
+                ))
+
+    if len(advertiser_ids) > 1:
+        id_list = ', '.join(f"`{advertiser_id}` ({len(names)} tag{'s' if len(names) != 1 else ''})" for advertiser_id, names in advertiser_ids.items())
+        findings.append(make_finding(
+            'floodlight_advertiser_mismatch', SEVERITY_ERROR, None,
+            f"Floodlight tags use more than one advertiser ID: {id_list}.",
+            advertiser_ids=advertiser_ids,
+        ))
+
+    return findings
+
+
+def finding_markdown(finding):
+    """A finding's message as a line of markdown, prefixed with its entity's name."""
+    if finding['entity_name'] is None:
+        return finding['message']
+    if finding['entity_kind'] == 'tag':
+        return f"`{finding['entity_name']}`: {finding['message']}"
+    return f"{finding['entity_kind'].capitalize()} `{finding['entity_name']}`: {finding['message']}"
+
+
+def render_findings_markdown(findings, limit=None):
+    """Render findings as markdown, one section per rule, listing at most `limit` findings per rule when given."""
+    if not findings:
+        return ""
+
+    by_rule = {}
+    for finding in findings:
+        by_rule.setdefault(finding['rule'], []).append(finding)
+
+    lines = ["### Automated checks", ""]
+    for rule, title in RULE_TITLES.items():
+        rule_findings = by_rule.get(rule)
+        if not rule_findings:
+            continue
+        lines.append(f"**{title} ({len(rule_findings)})**")
+        lines.append("")
+        for finding in rule_findings[:limit]:
+            lines.append(f"- {finding_markdown(finding)}")
+        if limit is not None and len(rule_findings) > limit:
+            lines.append(f"- ...and {len(rule_findings) - limit} more")
+        lines.append("")
+    return '\n'.join(lines).strip()
+
+
+def combine_analysis(findings_markdown, analysis):
+    """Prepend the automated check findings to the LLM narrative."""
+    return '\n\n'.join(part for part in (findings_markdown, analysis) if part)
+
+
+def collect_tracking_ids(index):
+    """Collect tracking IDs per platform as {platform: {id: [tag names]}}, resolving constant variables."""
+    tracking_ids = {}
+
+    def add(platform, value, tag):
+        if value:
+            tracking_ids.setdefault(platform, {}).setdefault(index.resolve_value(value), []).append(tag.get('name', 'Unnamed Tag'))
+
+    for tag in index.tags:
+        tag_type = tag.get('type', '')
+        if tag_type in TRACKING_ID_PARAMETERS:
+            platform, key = TRACKING_ID_PARAMETERS[tag_type]
+            add(platform, get_parameter(tag, key) or (get_parameter(tag, 'gaSettings') if tag_type == 'ua' else None), tag)
+        elif tag_type.startswith(CUSTOM_TEMPLATE_PREFIX):
+            for key, platform in TEMPLATE_TRACKING_ID_PARAMETERS.items():
+                add(platform, get_parameter(tag, key), tag)
+        elif tag_type == 'html':
+            for pixel_id in FB_PIXEL_INIT_PATTERN.findall(get_parameter(tag, 'html') or ''):
+                add('Facebook', pixel_id, tag)
+    return tracking_ids
+
+
+def render_tracking_ids_markdown(tracking_ids):
+    """Render the tracking ID summary, flagging platforms that use more than one ID."""
+    if not tracking_ids:
+        return ""
+
+    lines = ["### Tracking IDs", ""]
+    for platform, ids in tracking_ids.items():
+        id_list = ', '.join(f"`{tracking_id}` ({len(names)} tag{'s' if len(names) != 1 else ''})" for tracking_id, names in ids.items())
+        if len(ids) > 1:
+            lines.append(f"- **{platform}**: {id_list} - **Error: more than one ID in use, check these are intentional.**")
+        else:
+            lines.append(f"- **{platform}**: {id_list}")
+    return '\n'.join(lines)
@@ -1,215 +1,47 @@
 import streamlit as st
+import gzip
 import json
 import os
 import logging
-import hashlib
-from intro_text import INTRO_TEXT
-from openai import OpenAI
 from dotenv import load_dotenv
-import pandas as pd
-from supabase import create_client, Client
-from datetime import datetime
-import traceback
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Preformatted
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY
-from reportlab.platypus.tableofcontents import TableOfContents
-from reportlab.lib.units import cm
-from io import BytesIO
-import markdown2
-from reportlab.lib.colors import grey
-import re
-from reportlab.pdfgen import canvas
-import logging
-from logging import getLogger
+
+# Load environment variables before importing modules that read configuration
+load_dotenv()
+
+# The LLM, PDF and dataframe machinery (analysis_view, export_view, pandas) is imported where
+# it's first used, so the landing page and a session's first run don't pay for it
+from intro_text import INTRO_TEXT
+from container_index import ContainerIndex
+from gtm_loader import load_gtm_config, parse_gtm_config
+from config_hash import hash_config_bytes
+from config_store import stored_config_hash
+from local_cache import UploadMemo, upload_memo
+from container_diff import diff_configs, render_diff_markdown
+from db import SUPABASE_URL, create_supabase_client
+from app_common import get_user_id, handle_error, is_logged_in
+from projects import (
+    PROJECT_PAGE_SIZE, get_project, get_project_version, get_project_versions, list_projects, load_project_config, save_project,
+)
+from tracing import count, span, start_metrics_server, start_trace
+import time
 
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 # Configuration constants
-DEFAULT_API_KEY = os.getenv("CHATGPT_API_KEY")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-BRAD_LINKEDIN_URL = "https://www.linkedin.com/in/brad-farleigh"
-
-# Initialize Supabase client
-supabase: Client = create_client(str(SUPABASE_URL or ''), str(SUPABASE_KEY or ''))
-
-def get_supabase_client():
-    if 'session' in st.session_state and st.session_state['session'] is not None:
-        client = create_client(str(SUPABASE_URL or ''), str(SUPABASE_KEY or ''))
-        client.auth.set_session(
-            access_token=st.session_state['session'].access_token,
-            refresh_token=st.session_state['session'].refresh_token
-        )
-        return client
-    else:
-        return create_client(str(SUPABASE_URL or ''), str(SUPABASE_KEY or ''))
-
-def handle_error(e):
-    error_message = f"An error occurred: {str(e)}"
-    stack_trace = traceback.format_exc()
-    
-    st.error(error_message)
-    st.code(stack_trace, language="python")
-    
-    logger.error(f"Error: {error_message}\n{stack_trace}")
-    st.markdown(f"If you're experiencing issues, please reach out to Brad on [LinkedIn]({BRAD_LINKEDIN_URL}) and provide the error details above.")
+ENTITY_PAGE_SIZE = 25  # Rows per page in the Tags, Variables and Triggers tabs
+UPLOAD_MEMO_SIZE_FACTOR = 3  # Parsed config plus index, relative to the upload's size in bytes
+DEBUG_PANEL = os.getenv("DEBUG_PANEL", "").lower() in ("1", "true")  # Show the debug panel without ?debug=1
 
-def load_gtm_config(file):
-    """Load and validate GTM configuration from a JSON file."""
-    try:
-        config = json.load(file)
-        if 'containerVersion' not in config or 'tag' not in config['containerVersion']:
-            raise ValueError("Invalid GTM export format")
-        return config
-    except json.JSONDecodeError:
-        raise ValueError("Invalid JSON file")
-
-def summarize_config(config):
-    """Summarize the GTM configuration."""
-    container_version = config['containerVersion']
-    tags = container_version.get('tag', [])
-    variables = container_version.get('variable', [])
-    triggers = container_version.get('trigger', [])
-    summary = {
-        'container_name': container_version.get('container', {}).get('name', 'Unknown'),
-        'tag_manager_url': container_version.get('tagManagerUrl', 'Unknown'),
-        'tag_count': len(tags),
-        'variable_count': len(variables),
-        'trigger_count': len(triggers),
-        'tag_types': {},
-        'platforms': [],
-        'folder_ids': []
-    }
-    for tag in tags:
-        tag_type = tag['type']
-        summary['tag_types'][tag_type] = summary['tag_types'].get(tag_type, 0) + 1
-        platform = tag['name'].split('|')[0].strip() if '|' in tag['name'] else 'Unknown'
-        if platform not in summary['platforms']:
-            summary['platforms'].append(platform)
-        if 'parentFolderId' in tag and tag['parentFolderId'] not in summary['folder_ids']:
-            summary['folder_ids'].append(tag['parentFolderId'])
-    return summary
-
-def create_base_prompt(config_summary, tags, variables, triggers):
-    """Create the base prompt for both full and limited analyses."""
-    sanitized_summary = json.dumps(config_summary, indent=2)
-    sanitized_tags = json.dumps([{k: v for k, v in tag.items() if k in ['name', 'type', 'parameter']} for tag in tags], indent=2)
-    sanitized_variables = json.dumps([{k: v for k, v in var.items() if k in ['name', 'type', 'parameter']} for var in variables], indent=2)
-    sanitized_triggers = json.dumps([{k: v for k, v in trigger.items() if k in ['name', 'type', 'customEventFilter']} for trigger in triggers], indent=2)
-
-    return f"""
-    Analyse the following Google Tag Manager (GTM) configuration:
-
-    Container Name: {config_summary['container_name']}
-    Tag Manager URL: {config_summary['tag_manager_url']}
-
-    Configuration Summary:
-    {sanitized_summary}
-
-    Tags:
-    {sanitized_tags}
-
-    Variables:
-    {sanitized_variables}
-
-    Triggers:
-    {sanitized_triggers}
-
-    First - output a summary of the tracking ID's used for each of the platforms detected so we can sanity check vs our measurement plan. We should also check to see if there are any discrepancies between ID's used in tags - which could be cause for concern. If you find discrepancies between ID usage flag these as errors.
-    """
-
-def analyze_with_gpt(config_summary, tags, variables, triggers, client):
-    """Analyse the GTM configuration using OpenAI's GPT for full analysis."""
-    base_prompt = create_base_prompt(config_summary, tags, variables, triggers)
-    full_instructions = """
-    Output your analysis of each tag following the guidelines below:
-    1. List tags that have problems - one section for each tag, output tag name in format "Tag Name: 'XXXX'" in bold heading (not large)
-    2. For each tag provide a dot-point analysis on improvements based on best practice
-    3. We should analyse tag names based on best practice naming convention -  [Platform] - [Type] - [Description] - if they are not, we should provide a suggestion for a rename
-    4. Any UA tags should be deleted - for these do not mention any other output except for the fact they should be deleted because UA is no longer active
-    5. Any paused tags should be reviewed and removed if unnecessary
-    6. Do not number headings
-    7. When outputting tracking ID's or tag names in content wrap them in code tags for better readability
-    8. Skip the UA output analysis if no UA tags were found - this applies with all tags (we should limit redundant output)
-    9. If a tag type starts with CVT_ then it is a custom template tag - you should find the matching template ID in the JSON and find the "name" of the tag type
-    10. When outputting floodlight tags we should output the "activity tag" and "advertiser ID" - values for each tag. Do not disregard this step
-    11. When we encounter a html type tag with "insight.adsrvr.org" in the output, it is a "TTD" tag and we should find the image src within the HTML content, extract the URL and display it for verification
-    """
-    
-    full_prompt = base_prompt + full_instructions
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a marketing expert responsible for reviewing and providing feedback on Google Tag Manager configurations. You should follow the instructions directly and not omit any steps. Do not guess any results. Do not output any vague suggestions - all action points should have clear and concise instructions that will lead to the problem being solved. Use EN-AU spelling. Do not say 'in conclusion'"},
-                {"role": "user", "content": full_prompt}
-            ]
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        handle_error(e)
-        return "An error occurred during analysis. Please try again later."
-
-def analyze_with_gpt_limited(config_summary, tags, variables, triggers, client):
-    """Analyse the GTM configuration using OpenAI's GPT with a limited output."""
-    base_prompt = create_base_prompt(config_summary, tags, variables, triggers)
-    limited_instructions = """
-    Provide a brief summary of the configuration and highlight the most critical issues or improvements. Focus on the following:
-    1. Summarize the main tracking IDs used and any discrepancies.
-    2. Highlight up to 3 of the most critical issues or improvements needed.
-    3. Mention any outdated or unnecessary tags (e.g., UA tags).
-    
-    Limit your response to about 150 words. Use proper formatting with paragraphs and line breaks.
-    """
-    
-    limited_prompt = base_prompt + limited_instructions
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a marketing expert providing a brief overview of a GTM configuration. Focus on the most important points within the word limit. Use proper formatting with paragraphs and line breaks. Use EN-AU spelling. Do not say 'conclusion'"},
-                {"role": "user", "content": limited_prompt}
-            ]
-        )
-        analysis = response.choices[0].message.content
-
-        # Truncate the analysis to approximately 150 words while preserving formatting
-        paragraphs = analysis.split('\n\n')
-        truncated_paragraphs = []
-        word_count = 0
-        for paragraph in paragraphs:
-            words = paragraph.split()
-            if word_count + len(words) <= 150:
-                truncated_paragraphs.append(paragraph)
-                word_count += len(words)
-            else:
-                remaining_words = 150 - word_count
-                truncated_paragraph = ' '.join(words[:remaining_words]) + '...'
-                truncated_paragraphs.append(truncated_paragraph)
-                break
-
-        truncated_analysis = '\n\n'.join(truncated_paragraphs)
-
-        return truncated_analysis
-
-    except Exception as e:
-        handle_error(e)
-        return "An error occurred during analysis. Please try again later."
+# Serves /metrics when METRICS_PORT is set; only the first run starts it
+start_metrics_server()
 
 def signup(email, password):
     """Sign up a new user using Supabase authentication."""
     try:
-        response = supabase.auth.sign_up({"email": email, "password": password})
+        response = create_supabase_client().auth.sign_up({"email": email, "password": password})
         logger.info(f"User signed up: {email}")
         return response
     except Exception as e:
@@ -219,7 +51,7 @@ def signup(email, password):
 def login(email, password):
     """Log in an existing user using Supabase authentication."""
     try:
-        response = supabase.auth.sign_in_with_password({"email": email, "password": password})
+        response = create_supabase_client().auth.sign_in_with_password({"email": email, "password": password})
         if response.user and response.session:
             st.session_state['user'] = response.user
             st.session_state['session'] = response.session
@@ -229,50 +61,6 @@ def login(email, password):
         handle_error(e)
         return None
 
-def get_projects(user_id, limit=None):
-    """Retrieve projects for a specific user."""
-    try:
-        logger.info(f"Fetching projects for user: {user_id}")
-        client = get_supabase_client()
-        query = client.table('projects').select("*").eq('user_id', str(user_id)).order('created_at', desc=True)
-        if limit:
-            query = query.limit(limit)
-        result = query.execute()
-        projects = result.data if result else []
-        logger.info(f"Projects fetched: {len(projects)}")
-        return projects
-    except Exception as e:
-        logger.error(f"Error fetching projects for user {user_id}: {str(e)}")
-        handle_error(e)
-        return []
-
-def get_project(project_id):
-    """Retrieve a specific project by its ID."""
-    try:
-        logger.info(f"Fetching project with ID: {project_id}")
-        client = get_supabase_client()
-        result = client.table('projects').select("*").eq('id', project_id).execute()
-        
-        if result and result.data:
-            project = result.data[0]
-            logger.info(f"Project fetched successfully: {project['name']}")
-            return project
-        else:
-            logger.warning(f"No project found with ID: {project_id}")
-            return None
-    except Exception as e:
-        logger.error(f"Error fetching project with ID {project_id}: {str(e)}")
-        handle_error(e)
-        return None
-
-def is_logged_in():
-    """Check if a user is logged in."""
-    return 'user' in st.session_state and 'session' in st.session_state and st.session_state['user'] is not None and st.session_state['session'] is not None
-
-def get_user_id():
-    """Get the current logged-in user's ID."""
-    return st.session_state['user'].id if is_logged_in() else None
-
 def on_project_select():
     if st.session_state.selected_project != "Select a project":
         project = next((p for p in st.session_state.projects if p['name'] == st.session_state.selected_project), None)
@@ -287,9 +75,9 @@ def sidebar_menu():
         
         # st.sidebar.write(f"G'day, {st.session_state['user'].email}")
         
-        # Retrieve the projects for the user and create the dropdown with "New Analysis" at the top
-        projects = get_projects(get_user_id(), limit=5)
-        project_names = ["Start New Analysis"] + [project['name'] for project in projects]
+        # Retrieve the projects for the user and create the dropdown with "New Analysis" and the portfolio at the top
+        projects = list_projects(get_user_id(), limit=5)
+        project_names = ["Start New Analysis", "Portfolio overview"] + [project['name'] for project in projects]
         
         selected_index = st.sidebar.selectbox(
             "Select a project",
@@ -305,8 +93,12 @@ def sidebar_menu():
             st.session_state['page'] = 'home'
             # st.rerun()  # Rerun to apply the changes
         
-        elif selected_index > 0:  # If a specific project is selected
-            selected_project = projects[selected_index - 1]  # Adjust index due to "Start New Analysis"
+        elif selected_index == 1:  # Analytics across all of the user's projects
+            st.session_state.pop('selected_project_id', None)
+            st.session_state['page'] = 'portfolio'
+
+        elif selected_index > 1:  # If a specific project is selected
+            selected_project = projects[selected_index - 2]  # Adjust index due to the two options above
             st.session_state['selected_project_id'] = selected_project['id']
             st.session_state['page'] = 'project_details'
     
@@ -367,72 +159,26 @@ def load_json_example(filename):
     with open(os.path.join("./json-examples", filename), 'r') as file:
         return json.load(file)
 
-def hash_json(json_content):
-    """Create a hash of the JSON content."""
-    return hashlib.md5(json.dumps(json_content, sort_keys=True).encode()).hexdigest()
-
-def get_cached_analysis(hash_value, user_id):
-    """Retrieve cached analysis from Supabase."""
-    try:
-        client = get_supabase_client()
-        result = client.table('analysis_cache').select("*").eq('hash', hash_value).eq('user_id', user_id).execute()
-        return result.data[0] if result and result.data else None
-    except Exception as e:
-        logger.error(f"Error retrieving cached analysis for hash {hash_value} and user {user_id}: {str(e)}")
-        handle_error(e)
-        return None
-
-def save_cached_analysis(hash_value, analysis, user_id, project_id):
-    """Save analysis to Supabase cache."""
-    try:
-        client = get_supabase_client()
-        data = client.table('analysis_cache').insert({
-            "hash": hash_value,
-            "analysis": analysis,
-            "user_id": user_id,
-            "project_id": project_id,
-            "created_at": datetime.now().isoformat()
-        }).execute()
-        logger.info(f"Analysis cached for hash: {hash_value}, user: {user_id}, project: {project_id}")
-        return data.data[0] if data and data.data else None
-    except Exception as e:
-        logger.error(f"Error saving cached analysis for hash {hash_value}, user {user_id}, project {project_id}: {str(e)}")
-        handle_error(e)
-        return None
-    
-def analyze_config(config, user_id, project_id, limited=False):
-    hash_value = hash_json(config)
-    cached_analysis = None
-    
-    bypass_cache = st.checkbox("Bypass cache and re-run analysis")
-    skip_gpt_analysis = st.checkbox("Skip analysis and output extraction only")
-
-    if user_id != "anonymous":
-        cached_analysis = get_cached_analysis(hash_value, user_id)
-        if cached_analysis and not bypass_cache and not skip_gpt_analysis:
-            st.info("ℹ️ This configuration has been analyzed before. Showing cached results.")
-            return cached_analysis['analysis']
-    
-    config_summary = summarize_config(config)
-    tags = config['containerVersion'].get('tag', [])
-    variables = config['containerVersion'].get('variable', [])
-    triggers = config['containerVersion'].get('trigger', [])
-
-    if skip_gpt_analysis:
-        st.success("Skipped GPT analysis. Displaying JSON summary.")
-        return json.dumps(config_summary, indent=4)
-
-    client = OpenAI(api_key=DEFAULT_API_KEY)
-    with st.spinner("Analyzing GTM configuration..."):
-        if limited:
-            analysis = analyze_with_gpt_limited(config_summary, tags, variables, triggers, client)
-        else:
-            analysis = analyze_with_gpt(config_summary, tags, variables, triggers, client)
-
-    if not bypass_cache and user_id != "anonymous":
-        save_cached_analysis(hash_value, analysis, user_id, project_id)
-
-    return analysis
+def get_upload_hash(uploaded_file):
+    """Hash the uploaded bytes once per upload, memoised in session state by file ID."""
+    cached = st.session_state.get('upload_hash')
+    if cached and cached[0] == uploaded_file.file_id:
+        return cached[1]
+    with span('hash', bytes=uploaded_file.size):
+        hash_value = hash_config_bytes(uploaded_file.getvalue())
+    st.session_state['upload_hash'] = (uploaded_file.file_id, hash_value)
+    return hash_value
+
+def get_upload_memo(uploaded_file):
+    """Parse and index an upload once per content hash, so reruns and other sessions reuse the result."""
+    hash_value = get_upload_hash(uploaded_file)
+    memo = upload_memo.get(hash_value)
+    if memo is None:
+        with span('parse', bytes=uploaded_file.size):
+            memo = UploadMemo(ContainerIndex(load_gtm_config(uploaded_file), hash_value))
+        count('upload_bytes', uploaded_file.size)
+        upload_memo.set(hash_value, memo, size=uploaded_file.size * UPLOAD_MEMO_SIZE_FACTOR)
+    return memo
 
 def new_analysis_page():
     if not is_logged_in():
@@ -443,19 +189,25 @@ def new_analysis_page():
         uploaded_file = st.file_uploader("Choose a GTM configuration JSON file", type="json")
         
         if uploaded_file is not None:
-            config = load_gtm_config(uploaded_file)
             try:
+                from analysis_view import analyze_config
+                memo = get_upload_memo(uploaded_file)
+                index = memo.index
                 user_id = "anonymous"  # Use a placeholder for non-logged in users
-                project_id = None
-                analysis = analyze_config(config, user_id, project_id, limited=True)
-                display_analysis(config, analysis, full_access=False)
+                analysis = display_analysis(index, lambda: analyze_config(memo, user_id, limited=True), full_access=False)
                 st.warning("Sign up to get access to your full analysis, save projects, and more")
                 
-                # Store the analysis in session state for later use
-                st.session_state['temp_analysis'] = {
-                    'config': config,
-                    'analysis': analysis
-                }
+                # Store the analysis in session state for later use. The compressed upload is a
+                # fraction of its parsed config's size, and the config is rebuilt if it's saved
+                temp_analysis = st.session_state.get('temp_analysis')
+                if not temp_analysis or temp_analysis['hash'] != index.config_hash:
+                    st.session_state['temp_analysis'] = {
+                        'data': gzip.compress(uploaded_file.getvalue()),
+                        'hash': index.config_hash,
+                        'analysis': analysis
+                    }
+                else:
+                    temp_analysis['analysis'] = analysis
             except ValueError as e:
                 handle_error(e)
     else:
@@ -468,51 +220,55 @@ def new_analysis_page():
         if 'temp_analysis' in st.session_state:
             st.info("We found an analysis from before you logged in. Would you like to save it?")
             if st.button("Save previous analysis"):
-                config = st.session_state['temp_analysis']['config']
+                config = parse_gtm_config(gzip.decompress(st.session_state['temp_analysis']['data']))
+                hash_value = st.session_state['temp_analysis']['hash']
                 analysis = st.session_state['temp_analysis']['analysis']
-                save_temp_analysis(config, analysis)
+                save_temp_analysis(config, hash_value, analysis)
                 del st.session_state['temp_analysis']
                 st.success("Previous analysis saved successfully!")
                 st.rerun()
         
         uploaded_file = st.file_uploader("Choose a GTM configuration JSON file", type="json")
         if uploaded_file is not None:
-            config = load_gtm_config(uploaded_file)
             try:
+                from analysis_view import analyze_config
+                memo = get_upload_memo(uploaded_file)
+                index = memo.index
+                config = index.config
                 user_id = get_user_id()
-                project_id = None
-                analysis = analyze_config(config, user_id, project_id, limited=False)
-                display_analysis(config, analysis, full_access=True)
+                analysis = display_analysis(index, lambda: analyze_config(memo, user_id, limited=False), full_access=True)
                 
-                # Automatically save the project
+                # Automatically save the project, once per user and analysis rather than on every rerun
                 container_name = config['containerVersion']['container']['name']
-                saved_project = save_project(user_id, container_name, config, analysis)
-                if saved_project:
-                    project_id = saved_project['id']
-                    hash_value = hash_json(config)
-                    save_cached_analysis(hash_value, analysis, user_id, project_id)
+                if memo.saved_analyses.get(user_id) == analysis:
+                    st.success(f"Container '{container_name}' saved to profile")
+                elif save_project(user_id, container_name, config, analysis, index.config_hash):
+                    memo.saved_analyses[user_id] = analysis
+                    memo.cached_analyses[user_id] = {'analysis': analysis}
                     st.success(f"Container '{container_name}' saved to profile")
                 else:
                     st.error("Failed to save the analysis.")
             except ValueError as e:
                 handle_error(e)
 
-def save_temp_analysis(config, analysis):
+def save_temp_analysis(config, hash_value, analysis):
     """Save the temporary analysis after user logs in."""
     user_id = get_user_id()
     container_name = config['containerVersion']['container']['name']
-    saved_project = save_project(user_id, container_name, config, analysis)
-    if saved_project:
-        project_id = saved_project['id']
-        hash_value = hash_json(config)
-        save_cached_analysis(hash_value, analysis, user_id, project_id)
+    if save_project(user_id, container_name, config, analysis, hash_value):
         st.success(f"Container '{container_name}' saved to profile")
     else:
         st.error("Failed to save the analysis.")
 
 def all_projects_page():
     st.title("All Projects")
-    projects = get_projects(get_user_id())
+    user_id = get_user_id()
+    projects = list_projects(user_id)
+    # Pages already shown come from the listing cache, so "Load more" only fetches the next one
+    for _ in range(st.session_state.get('project_pages', 1) - 1):
+        if len(projects) % PROJECT_PAGE_SIZE:
+            break
+        projects = projects + list_projects(user_id, after=projects[-1])
     
     for project in projects:
         col1, col2 = st.columns([3, 1])
@@ -525,52 +281,62 @@ def all_projects_page():
                 st.session_state['page'] = 'project_details'
                 st.rerun()
 
-def save_project(user_id, name, config, analysis):
-    """Save a new project to the Supabase 'projects' table."""
-    try:
-        logger.info(f"Attempting to save project for user: {user_id}, name: {name}")
-        client = get_supabase_client()
-        
-        # Check if a project with the same name already exists for this user
-        result = client.table('projects').select("*").eq('user_id', str(user_id)).eq('name', name).execute()
-        
-        existing_projects = result.data if result else []
-        
-        logger.info(f"Existing projects: {existing_projects}")
-
-        if existing_projects:
-            # Update existing project
-            project_id = existing_projects[0]['id']
-            logger.info(f"Updating existing project with id: {project_id}")
-            data = client.table('projects').update({
-                "config": json.dumps(config),
-                "analysis": analysis,
-            }).eq('id', project_id).execute()
-            logger.info(f"Project updated for user: {user_id}, name: {name}")
-        else:
-            # Insert new project
-            logger.info(f"Inserting new project for user: {user_id}, name: {name}")
-            data = client.table('projects').insert({
-                "user_id": user_id,
-                "name": name,
-                "config": json.dumps(config),
-                "analysis": analysis,
-                "created_at": datetime.now().isoformat()
-            }).execute()
-            logger.info(f"New project saved for user: {user_id}, name: {name}")
-        
-        if data and data.data:
-            return data.data[0]
-        else:
-            logger.error(f"No data returned when saving project for user {user_id}, name {name}")
-            return None
-    except Exception as e:
-        logger.error(f"Error saving project for user {user_id}, name {name}: {str(e)}")
-        handle_error(e)
-        return None
+    if projects and len(projects) % PROJECT_PAGE_SIZE == 0:
+        if st.button("Load more", key="load_more_projects"):
+            st.session_state['project_pages'] = st.session_state.get('project_pages', 1) + 1
+            st.rerun()
+
+def entity_tab(index, kind, label):
+    """Filterable, sortable table of one page of entities, with details for a single selected entity.
+
+    Only the current page and selected entity are sent to the browser, whatever the container's size.
+    """
+    import pandas as pd
+
+    rows = pd.DataFrame(index.entity_rows(kind))
+    if rows.empty:
+        st.caption(f"No {label.lower()} in this container")
+        return
+
+    col1, col2, col3 = st.columns([3, 2, 1])
+    query = col1.text_input(f"Filter {label.lower()}", key=f"{kind}_filter", placeholder="Name, type, folder or trigger")
+    sort_by = col2.selectbox("Sort by", list(rows.columns), index=1, key=f"{kind}_sort")
+    descending = col3.checkbox("Descending", key=f"{kind}_descending")
+
+    if query:
+        matches = rows.astype(str).apply(lambda column: column.str.contains(query, case=False, regex=False))
+        rows = rows[matches.any(axis=1)]
+    rows = rows.sort_values(
+        sort_by,
+        ascending=not descending,
+        kind='stable',
+        key=lambda column: column.str.lower() if pd.api.types.is_string_dtype(column) else column
+    )
+
+    page_count = max(1, -(-len(rows) // ENTITY_PAGE_SIZE))
+    # Keyed by page count, so filtering down to fewer pages starts again from page 1
+    page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, key=f"{kind}_page_{page_count}")
+    start = (page - 1) * ENTITY_PAGE_SIZE
+    page_rows = rows.iloc[start:start + ENTITY_PAGE_SIZE]
+    st.dataframe(page_rows, hide_index=True, use_container_width=True)
+    st.caption(f"Showing {start + 1 if len(page_rows) else 0}-{start + len(page_rows)} of {len(rows)} {label.lower()}")
+
+    names = dict(zip(page_rows['ID'], page_rows['Name']))
+    selected = st.selectbox(
+        "Show details for",
+        [None] + list(names),
+        format_func=lambda entity_id: "Select..." if entity_id is None else names[entity_id],
+        key=f"{kind}_detail"
+    )
+    if selected is not None:
+        st.json(index.get_entity(kind, selected))
 
-def display_analysis(config, analysis, full_access=True):
-    config_summary = summarize_config(config)
+def display_analysis(index, analysis, full_access=True):
+    """Render the analysis and entity tabs, returning the analysis text.
+
+    `analysis` may be a callable that runs the analysis, so streamed output lands in the Analysis tab.
+    """
+    config_summary = index.summary()
     st.divider()
     if not is_logged_in():
         st.header(f"Your analysis")
@@ -582,135 +348,91 @@ def display_analysis(config, analysis, full_access=True):
         tab1, tab2, tab3, tab4 = st.tabs(["Analysis",f"Tags ({config_summary['tag_count']})", f"Variables ({config_summary['variable_count']})", f"Triggers ({config_summary['trigger_count']})"])
 
         with tab1:
+            if callable(analysis):
+                analysis = analysis()
             st.markdown(analysis)
 
             st.divider()
-            if st.button("Generate export of findings",type='primary'):
-                export_findings(config_summary, analysis)
+            from export_view import export_findings
+            export_findings(index, analysis)
 
         with tab2:
-            for i, tag in enumerate(config['containerVersion'].get('tag', []), 1):
-                with st.expander(f"Tag {i}: {tag.get('name', 'Unnamed Tag')}"):
-                    st.json(tag)
+            entity_tab(index, 'tag', "Tags")
 
         with tab3:
-            for i, variable in enumerate(config['containerVersion'].get('variable', []), 1):
-                with st.expander(f"Variable {i}: {variable.get('name', 'Unnamed Variable')}"):
-                    st.json(variable)
+            entity_tab(index, 'variable', "Variables")
 
         with tab4:
-            for i, trigger in enumerate(config['containerVersion'].get('trigger', []), 1):
-                with st.expander(f"Trigger {i}: {trigger.get('name', 'Unnamed Trigger')}"):
-                    st.json(trigger)
+            entity_tab(index, 'trigger', "Triggers")
     else:
+        if callable(analysis):
+            analysis = analysis()
         st.markdown(analysis)
 
-class NumberedCanvas(canvas.Canvas):
-    def __init__(self, *args, **kwargs):
-        canvas.Canvas.__init__(self, *args, **kwargs)
-        self._saved_page_states = []
-
-    def showPage(self):
-        self._saved_page_states.append(dict(self.__dict__))
-        self._startPage()
-
-    def save(self):
-        num_pages = len(self._saved_page_states)
-        for state in self._saved_page_states:
-            self.__dict__.update(state)
-            self.draw_page_number(num_pages)
-            canvas.Canvas.showPage(self)
-        canvas.Canvas.save(self)
-
-    def draw_page_number(self, page_count):
-        self.setFont("Helvetica", 9)
-        self.drawRightString(20*cm, 1*cm, f"Page {self._pageNumber} of {page_count}")
-        self.drawString(1*cm, 1*cm, "Generated by GTM Auditor by Brad Farleigh - bradfarleigh.com")
-
-
-def export_findings(config_summary, analysis):
-    """Export the analysis findings as a PDF file."""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72)
-    elements = []
-
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = styles['Heading1']
-    heading_style = styles['Heading2']
-    normal_style = ParagraphStyle('Normal', fontSize=10, leading=14, alignment=TA_JUSTIFY)
-    value_style = ParagraphStyle('Value', fontSize=10, leading=14, textColor=grey)
-    bullet_style = ParagraphStyle('Bullet', fontSize=10, leading=14, alignment=TA_JUSTIFY, bulletFontName='Helvetica', bulletIndent=0, bulletFontSize=10)
-    code_style = ParagraphStyle('Code', fontName='Courier', fontSize=8, leading=10)
-
-    # Add title
-    elements.append(Paragraph("GTM Audit Findings", title_style))
-    elements.append(Spacer(1, 24))
-
-    # Add summary information
-    summary_items = [
-        ("Container Name", config_summary['container_name']),
-        ("Tag Manager URL", config_summary['tag_manager_url']),
-        ("Tag Count", str(config_summary['tag_count'])),
-        ("Variable Count", str(config_summary['variable_count'])),
-        ("Trigger Count", str(config_summary['trigger_count']))
-    ]
-
-    for heading, value in summary_items:
-        elements.append(Paragraph(f"<b>{heading}:</b> {value}", normal_style))
-        elements.append(Spacer(1, 6))
-
-    elements.append(Spacer(1, 24))
-
-    # Add analysis
-    elements.append(Paragraph("Analysis", heading_style))
-    elements.append(Spacer(1, 12))
-
-    # Convert markdown to HTML and sanitize it
-    try:
-        html_analysis = markdown2.markdown(analysis, extras=["fenced-code-blocks", "footnotes", "toc", "cuddled-lists", "tables", "strike"])
-    except Exception as e:
-        st.error(f"Error converting markdown to HTML: {e}")
-        return
+    return analysis
 
-    # Safely handle HTML, ensuring no unclosed tags are passed to Paragraph
-    sanitized_html = re.sub(r'<(strong|em|b|i)>', '', html_analysis)  # Remove potential unclosed tags for simplicity
-    sanitized_html = re.sub(r'</(strong|em|b|i)>', '', sanitized_html)
-
-    # Convert the sanitized HTML into paragraphs, supporting bullet points
-    for line in sanitized_html.split('\n'):
-        if line.strip():
-            if line.strip().startswith("<ul>") or line.strip().startswith("<ol>"):  # Detect bullet point lists
-                elements.append(Spacer(1, 6))
-            elif line.strip().startswith("<li>"):  # Handle list items
-                bullet_text = line[4:-5].strip()  # Strip <li> and </li> tags
-                elements.append(Paragraph(f"• {bullet_text}", bullet_style))  # Add bullet point
-                elements.append(Spacer(1, 6))
-            else:
-                try:
-                    elements.append(Paragraph(line, normal_style))
-                    elements.append(Spacer(1, 6))
-                except ValueError as e:
-                    st.error(f"Error processing line for PDF export: {e}")
-                    continue
-
-    # Build PDF
-    doc.build(elements, canvasmaker=NumberedCanvas)
-    pdf = buffer.getvalue()
-    buffer.close()
-
-    # Generate filename from container name
-    container_name = config_summary['container_name']
-    clean_container_name = re.sub(r'[\s.]+', '-', container_name)  # Replace spaces and periods with hyphens
-
-    # Provide download button with custom filename
-    st.download_button(
-        label="Download the findings (PDF)",
-        data=pdf,
-        file_name=f"{clean_container_name}.pdf",
-        mime="application/pdf",
+def version_history(project):
+    """Show the project's saved versions, with a structural diff of any version against the one before it."""
+    versions = get_project_versions(project['id'])
+    if len(versions) < 2:
+        return
+    st.divider()
+    st.subheader(f"Version history ({len(versions)})")
+    selected = st.selectbox(
+        "Compare a version with the one before it",
+        range(len(versions) - 1),
+        format_func=lambda i: f"{versions[i]['created_at']} vs {versions[i + 1]['created_at']}",
+        key="compare_version_index"
     )
-    logger.info("Findings exported as PDF")
+    new_version = get_project_version(versions[selected]['id'])
+    old_version = get_project_version(versions[selected + 1]['id'])
+    if not new_version or not old_version:
+        return
+    new_config = load_project_config(new_version)
+    old_config = load_project_config(old_version)
+    if new_config is not None and old_config is not None:
+        st.markdown(render_diff_markdown(diff_configs(old_config, new_config)))
+
+def debug_panel(trace):
+    """Waterfall of this run's stages so far, shown when the URL has ?debug=1 or DEBUG_PANEL is set."""
+    if not DEBUG_PANEL and st.query_params.get('debug') != '1':
+        return
+    import pandas as pd
+
+    data = trace.to_dict()
+    elapsed = (time.perf_counter() - trace.start) * 1000
+    with st.expander(f"Debug: {len(data['spans'])} stages in {elapsed:.0f} ms"):
+        rows = pd.DataFrame([
+            {
+                # Numbered, so repeated stages (e.g. several Supabase queries) get their own bars
+                'stage': f"{i + 1}. {'  ' * span_record['depth']}{span_record['name']}",
+                'start_ms': round(span_record['start'] * 1000, 1),
+                'end_ms': round((span_record['start'] + span_record['duration']) * 1000, 1),
+                'duration_ms': round(span_record['duration'] * 1000, 1),
+                'thread': span_record['thread'],
+                'details': json.dumps(span_record['attributes'], default=str),
+            }
+            for i, span_record in enumerate(data['spans'])
+        ], columns=['stage', 'start_ms', 'end_ms', 'duration_ms', 'thread', 'details'])
+        if rows.empty:
+            st.caption("No stages recorded in this run")
+            return
+        st.vega_lite_chart(rows, {
+            'mark': 'bar',
+            'encoding': {
+                'y': {'field': 'stage', 'type': 'nominal', 'sort': None, 'title': None},
+                'x': {'field': 'start_ms', 'type': 'quantitative', 'title': "ms since the run started"},
+                'x2': {'field': 'end_ms'},
+                'color': {'field': 'thread', 'type': 'nominal'},
+                'tooltip': [{'field': 'stage'}, {'field': 'duration_ms'}, {'field': 'details'}],
+            },
+        }, use_container_width=True)
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        if data['counters']:
+            st.json(data['counters'])
+        # Background jobs record into their own traces, written to TRACE_LOG_PATH under these IDs
+        for link in data['links']:
+            st.caption(f"{link['name']} {link['attributes'].get('job_id')}: trace {link['id']}, {link['duration'] * 1000:.0f} ms")
 
 def main():
     st.set_page_config(
@@ -721,27 +443,39 @@ def main():
         menu_items=None
     )
 
-    if not supabase:
-        st.error("Supabase client is not initialized")
+    with start_trace('script_run', page=st.session_state.get('page', 'home')) as trace:
+        render_page()
+        debug_panel(trace)
+
+def render_page():
+    if not SUPABASE_URL:
+        st.error("Supabase is not configured")
         return
 
     sidebar_menu()
 
     if 'page' not in st.session_state:
         st.session_state['page'] = 'home'
+    if st.session_state['page'] != 'all_projects':
+        # Coming back to All Projects (e.g. after a save changed the listing) starts from its first page
+        st.session_state.pop('project_pages', None)
 
     if st.session_state['page'] == 'home':
         new_analysis_page()
     elif st.session_state['page'] == 'all_projects':
         all_projects_page()
+    elif st.session_state['page'] == 'portfolio':
+        from portfolio_view import portfolio_page
+        portfolio_page()
     elif st.session_state['page'] == 'project_details':
         if 'selected_project_id' in st.session_state:
             project = get_project(st.session_state['selected_project_id'])
             if project:
                 st.title(f"Project: {project['name']}")
-                config = json.loads(project['config'])
-                analysis = project['analysis']
-                display_analysis(config, analysis, full_access=True)
+                config = load_project_config(project)
+                if config is not None:
+                    display_analysis(ContainerIndex(config, stored_config_hash(project['config'])), project['analysis'], full_access=True)
+                    version_history(project)
 
             else:
                 st.error("Project not found")
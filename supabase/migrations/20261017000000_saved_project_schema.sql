@@ -0,0 +1,104 @@
+-- Keys and defaults the app's saves rely on (see projects.py, config_store.py and tag_cache.py).
+-- Safe to run more than once.
+
+-- save_project upserts projects on (user_id, name) and leaves created_at out, so an update keeps the
+-- first save's value. New rows need a default, and the project listing's keyset cursor needs no NULLs
+alter table projects alter column created_at set default now();
+update projects set created_at = now() where created_at is null;
+alter table projects alter column created_at set not null;
+
+do $$
+begin
+    if not exists (select 1 from pg_constraint where conname = 'projects_user_id_name_key') then
+        alter table projects add constraint projects_user_id_name_key unique (user_id, name);
+    end if;
+end $$;
+
+-- Earlier versions inserted a cache row on every analysis; keep the newest per (hash, user_id) before
+-- save_cached_analysis upserts on that pair
+delete from analysis_cache older
+using analysis_cache newer
+where older.hash = newer.hash
+  and older.user_id = newer.user_id
+  and (
+      coalesce(older.created_at, '-infinity') < coalesce(newer.created_at, '-infinity')
+      or (coalesce(older.created_at, '-infinity') = coalesce(newer.created_at, '-infinity') and older.ctid < newer.ctid)
+  );
+
+do $$
+begin
+    if not exists (select 1 from pg_constraint where conname = 'analysis_cache_hash_user_id_key') then
+        alter table analysis_cache add constraint analysis_cache_hash_user_id_key unique (hash, user_id);
+    end if;
+end $$;
+
+-- Version history. project_id takes its type from projects.id (uuid or bigint, depending on how the
+-- table was created), so it's read from the catalog rather than assumed
+do $$
+declare
+    project_id_type text;
+begin
+    select format_type(atttypid, atttypmod) into strict project_id_type
+    from pg_attribute
+    where attrelid = 'projects'::regclass and attname = 'id' and not attisdropped;
+    execute format($sql$
+        create table if not exists project_versions (
+            id bigint generated by default as identity primary key,
+            project_id %s not null references projects (id) on delete cascade,
+            user_id text not null,
+            config text,
+            analysis text,
+            config_hash text,
+            prompt_version text,
+            created_at timestamptz not null default now()
+        )
+    $sql$, project_id_type);
+end $$;
+create index if not exists project_versions_project_id_created_at_idx on project_versions (project_id, created_at desc);
+
+-- save_project_version upserts on (project_id, config_hash), ignoring duplicates; keep the newest of any repeats first
+delete from project_versions older
+using project_versions newer
+where older.project_id = newer.project_id
+  and older.config_hash = newer.config_hash
+  and (older.created_at, older.id) < (newer.created_at, newer.id);
+
+do $$
+begin
+    if not exists (select 1 from pg_constraint where conname = 'project_versions_project_id_config_hash_key') then
+        alter table project_versions add constraint project_versions_project_id_config_hash_key unique (project_id, config_hash);
+    end if;
+end $$;
+
+-- Compressed config entities, content-addressed per user
+create table if not exists config_blobs (
+    hash text not null,
+    user_id text not null,
+    data text not null,
+    primary key (hash, user_id)
+);
+
+-- Per-tag findings by fingerprint
+create table if not exists tag_analysis_cache (
+    fingerprint text not null,
+    user_id text not null,
+    analysis text not null,
+    created_at timestamptz not null default now(),
+    primary key (fingerprint, user_id)
+);
+
+-- The app connects with the anon key, so rows are only reachable by the signed-in user who owns them
+do $$
+declare
+    table_name text;
+begin
+    foreach table_name in array array['project_versions', 'config_blobs', 'tag_analysis_cache'] loop
+        execute format('alter table %I enable row level security', table_name);
+        execute format('drop policy if exists "Users read their own rows" on %I', table_name);
+        execute format('create policy "Users read their own rows" on %I for select using (user_id = auth.uid()::text)', table_name);
+        execute format('drop policy if exists "Users insert their own rows" on %I', table_name);
+        execute format('create policy "Users insert their own rows" on %I for insert with check (user_id = auth.uid()::text)', table_name);
+        execute format('drop policy if exists "Users update their own rows" on %I', table_name);
+        execute format('create policy "Users update their own rows" on %I for update using (user_id = auth.uid()::text) with check (user_id = auth.uid()::text)', table_name);
+    end loop;
+end $$;
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime
+
+from query_timing import execute_timed
+from prompt_compaction import compact_entity
+from prompts import (
+    ANALYSIS_MODEL, BATCH_INSTRUCTIONS, BATCH_PROMPT_TEMPLATE, CLEAN_TAGS_LABEL, COMPACT_FORMAT_NOTE, FULL_INSTRUCTIONS, FULL_SYSTEM_PROMPT,
+    sanitize_tag, sanitize_trigger, sanitize_variable,
+)
+
+logger = logging.getLogger(__name__)
+
+# Changing the model or any part of the batch prompt changes every fingerprint, so stale findings are never reused
+PROMPT_VERSION = hashlib.blake2b('\n'.join((
+    ANALYSIS_MODEL, FULL_SYSTEM_PROMPT, BATCH_PROMPT_TEMPLATE, FULL_INSTRUCTIONS, BATCH_INSTRUCTIONS, COMPACT_FORMAT_NOTE,
+)).encode(), digest_size=8).hexdigest()
+
+TAG_HEADING_PATTERN = re.compile(r"""^[*#\s]*Tag Name:\s*['"`]?(.+?)['"`]?[*\s]*$""", re.MULTILINE)
+CLEAN_TAGS_PATTERN = re.compile(rf"^[*\s]*{re.escape(CLEAN_TAGS_LABEL)}[*\s]*(.*)$", re.MULTILINE | re.IGNORECASE)
+
+
+def tag_fingerprint(index, tag):
+    """Content hash of a tag plus the triggers and variables it references, as sent to the LLM."""
+    triggers, variables = index.tag_dependencies(tag)
+    payload = {
+        'version': PROMPT_VERSION,
+        'tag': compact_entity(sanitize_tag(index, tag)),
+        'triggers': sorted((compact_entity(sanitize_trigger(trigger)) for trigger in triggers), key=lambda t: json.dumps(t, sort_keys=True)),
+        'variables': sorted((compact_entity(sanitize_variable(variable)) for variable in variables), key=lambda v: v.get('name', '')),
+    }
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode(), digest_size=16).hexdigest()
+
+
+def fingerprint_tags(index):
+    """Map each tag ID to its fingerprint."""
+    return {tag.get('tagId'): tag_fingerprint(index, tag) for tag in index.tags}
+
+
+def clean_tag_names(text):
+    """The tag names in a "Tags without problems:" line, in code tags or else comma separated."""
+    names = re.findall(r"`([^`]+)`", text)
+    if not names:
+        names = [name.strip(" '\"*.") for name in text.split(',')]
+    return [name.strip() for name in names if name.strip()]
+
+
+def split_tag_sections(analysis, tags):
+    """Split a batch analysis into per-tag sections keyed by tag ID.
+
+    Only tags with a section of their own, or named in the closing list of tags without
+    problems (mapped to an empty string), are included. Tags the reply leaves out, e.g.
+    because it was cut short, are missing rather than assumed clean. Returns None when no
+    heading or clean tag name matches a tag of the batch, so it can't be split per tag.
+    """
+    tag_ids_by_name = {tag.get('name'): tag.get('tagId') for tag in tags}
+    clean = CLEAN_TAGS_PATTERN.search(analysis)
+    sections_end = clean.start() if clean else len(analysis)
+
+    sections = {}
+    if clean:
+        for name in clean_tag_names(clean.group(1)):
+            if name in tag_ids_by_name:
+                sections[tag_ids_by_name[name]] = ''
+    headings = list(TAG_HEADING_PATTERN.finditer(analysis, 0, sections_end))
+    for i, heading in enumerate(headings):
+        tag_id = tag_ids_by_name.get(heading.group(1).strip())
+        if tag_id is None:
+            continue
+        end = headings[i + 1].start() if i + 1 < len(headings) else sections_end
+        sections[tag_id] = analysis[heading.start():end].strip()
+    return sections or None
+
+
+class SupabaseTagCache:
+    """Per-tag findings keyed by fingerprint, stored in the Supabase 'tag_analysis_cache' table."""
+
+    def __init__(self, client_factory, user_id):
+        self.client_factory = client_factory
+        self.user_id = user_id
+
+    def get_many(self, fingerprints):
+        """Return {fingerprint: analysis} for the fingerprints that are cached."""
+        if not fingerprints:
+            return {}
+        try:
+            result = execute_timed(self.client_factory().table('tag_analysis_cache').select("fingerprint, analysis").eq('user_id', self.user_id).in_('fingerprint', list(fingerprints)), "get tag analyses")
+            return {row['fingerprint']: row['analysis'] for row in (result.data if result else [])}
+        except Exception as e:
+            logger.error(f"Error retrieving cached tag analyses for user {self.user_id}: {str(e)}")
+            return {}
+
+    def set_many(self, analyses):
+        """Store {fingerprint: analysis}, replacing existing rows."""
+        if not analyses:
+            return
+        try:
+            execute_timed(self.client_factory().table('tag_analysis_cache').upsert([
+                {
+                    "fingerprint": fingerprint,
+                    "user_id": self.user_id,
+                    "analysis": analysis,
+                    "created_at": datetime.now().isoformat()
+                }
+                for fingerprint, analysis in analyses.items()
+            ], on_conflict='fingerprint,user_id'), "save tag analyses")
+            logger.info(f"Cached {len(analyses)} tag analyses for user: {self.user_id}")
+        except Exception as e:
+            logger.error(f"Error saving cached tag analyses for user {self.user_id}: {str(e)}")
+
+
+class MemoryTagCache:
+    """In-process per-tag findings cache with the same interface as SupabaseTagCache."""
+
+    def __init__(self):
+        self.analyses = {}
+
+    def get_many(self, fingerprints):
+        return {fingerprint: self.analyses[fingerprint] for fingerprint in fingerprints if fingerprint in self.analyses}
+
+    def set_many(self, analyses):
+        self.analyses.update(analyses)
@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import json
+import os
+
+import pytest
+
+from batch_audit import audit_container, output_names, result_paths
+from tag_cache import MemoryTagCache
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'json-examples')
+
+
+class CannedBackend:
+    async def complete_async(self, messages):
+        return "Tags without problems: none"
+
+
+def test_exports_are_named_apart_from_the_result():
+    json_path, export_paths = result_paths('gtm-aa', 'out', ['json', 'pdf'])
+    assert json_path == os.path.join('out', 'gtm-aa.json')
+    assert export_paths == {'json': os.path.join('out', 'gtm-aa.report.json'), 'pdf': os.path.join('out', 'gtm-aa.report.pdf')}
+
+
+def test_inputs_sharing_a_file_name_get_distinct_names():
+    names = output_names(['a/gtm.json', 'b/GTM.json', 'c/other.json'])
+    assert names['c/other.json'] == 'other'
+    assert len({name.lower() for name in names.values()}) == 3
+
+
+def test_inputs_named_like_another_inputs_export_are_rejected():
+    output_names(['x.json', 'x.report.json'])
+    with pytest.raises(ValueError):
+        output_names(['x.json', 'x.report.json'], ['json'])
+
+
+def test_json_export_doesnt_overwrite_the_result(tmp_path):
+    args = argparse.Namespace(output=str(tmp_path), formats=['json'], force=False, token_budget=6000, llm_concurrency=1)
+    status = asyncio.run(audit_container(os.path.join(EXAMPLES, 'gtm-jtsi.json'), 'gtm-jtsi', args, CannedBackend(), MemoryTagCache()))
+    assert status == 'ok'
+    with open(tmp_path / 'gtm-jtsi.json') as file:
+        result = json.load(file)
+    export_path = result['exports']['json']['path']
+    assert export_path == str(tmp_path / 'gtm-jtsi.report.json')
+    with open(export_path) as file:
+        assert 'status' not in json.load(file)
@@ -0,0 +1,87 @@
+import copy
+import glob
+import json
+import os
+
+import pytest
+
+from config_store import MemoryBlobStore, decode_config, entity_cache, store_config, stored_config_hash
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'json-examples', '*.json')))
+
+
+class CountingBlobStore(MemoryBlobStore):
+    def __init__(self):
+        super().__init__()
+        self.fetched = []
+
+    def get_many(self, hashes):
+        self.fetched.extend(hashes)
+        return super().get_many(hashes)
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+@pytest.mark.parametrize('path', EXAMPLES, ids=os.path.basename)
+def test_stored_configs_load_back_unchanged(path):
+    config = load(path)
+    store = MemoryBlobStore()
+    assert decode_config(store_config(config, store), store) == config
+
+
+def test_empty_and_absent_sections_round_trip():
+    config = {'exportFormatVersion': 2, 'containerVersion': {'container': {'name': 'Site'}, 'tag': [], 'variable': [{'variableId': '1', 'name': 'V'}]}}
+    store = MemoryBlobStore()
+    decoded = decode_config(store_config(config, store), store)
+    assert decoded == config
+    assert 'trigger' not in decoded['containerVersion']
+
+
+def test_unchanged_entities_are_stored_once():
+    config = load(EXAMPLES[0])
+    store = MemoryBlobStore()
+    store_config(config, store)
+    stored = len(store.blobs)
+    revision = copy.deepcopy(config)
+    revision['containerVersion']['tag'][0]['name'] += ' (edited)'
+    store_config(revision, store)
+    assert len(store.blobs) == stored + 1
+
+
+def test_only_uncached_entities_are_fetched():
+    config = load(EXAMPLES[0])
+    store = CountingBlobStore()
+    manifest = store_config(config, store)
+    decode_config(manifest, store)
+    evicted = json.loads(manifest)['entities']['tag'][0]
+    entity_cache.delete(evicted)
+    store.fetched.clear()
+    assert decode_config(manifest, store) == config
+    assert store.fetched == [evicted]
+
+
+def test_decoded_configs_dont_share_entities():
+    config = load(EXAMPLES[0])
+    store = MemoryBlobStore()
+    manifest = store_config(config, store)
+    first, second = decode_config(manifest, store), decode_config(manifest, store)
+    first['containerVersion']['tag'][0]['name'] = 'Changed'
+    assert second['containerVersion']['tag'][0]['name'] == config['containerVersion']['tag'][0]['name']
+    assert entity_cache.get(next(iter(json.loads(manifest)['entities']['tag']))) is not None
+
+
+def test_projects_saved_before_the_manifest_format_load_as_is():
+    config = {'containerVersion': {'tag': []}}
+    assert decode_config(json.dumps(config), MemoryBlobStore()) == config
+
+
+def test_stored_config_hash_follows_content():
+    store = MemoryBlobStore()
+    config = load(EXAMPLES[0])
+    manifest = store_config(config, store)
+    assert stored_config_hash(manifest) == stored_config_hash(store_config(config, store))
+    config['containerVersion']['tag'][0]['paused'] = True
+    assert stored_config_hash(store_config(config, store)) != stored_config_hash(manifest)
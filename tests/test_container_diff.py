@@ -0,0 +1,74 @@
+import copy
+import glob
+import json
+import os
+
+from container_diff import affected_tag_ids, diff_configs, has_changes, render_diff_markdown
+from container_index import ContainerIndex
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'json-examples', '*.json')))
+
+
+def container():
+    return {'containerVersion': {
+        'tag': [
+            {'tagId': '1', 'name': 'GA4 - Config', 'type': 'googtag', 'firingTriggerId': ['10'], 'fingerprint': '1',
+             'parameter': [{'type': 'TEMPLATE', 'key': 'tagId', 'value': '{{GA4 ID}}'}]},
+            {'tagId': '2', 'name': 'Meta - Pixel', 'type': 'html', 'firingTriggerId': ['11'], 'parameter': []},
+            {'tagId': '3', 'name': 'Old tag', 'type': 'html', 'firingTriggerId': ['10'], 'parameter': []},
+        ],
+        'trigger': [{'triggerId': '10', 'name': 'All Pages', 'type': 'pageview'}, {'triggerId': '11', 'name': 'Purchase', 'type': 'customEvent'}],
+        'variable': [{'variableId': '20', 'name': 'GA4 ID', 'type': 'c', 'parameter': [{'type': 'TEMPLATE', 'key': 'value', 'value': 'G-1'}]}],
+    }}
+
+
+def test_identical_configs_have_no_changes():
+    diff = diff_configs(container(), container())
+    assert not has_changes(diff)
+    assert render_diff_markdown(diff) == "No changes to tags, triggers or variables."
+
+
+def test_added_removed_and_changed_entities():
+    old, new = container(), container()
+    tags = new['containerVersion']['tag']
+    del tags[2]
+    tags.append({'tagId': '4', 'name': 'Ads - Conversion', 'type': 'awct', 'firingTriggerId': ['11']})
+    tags[1]['name'] = 'Meta - Pixel - PageView'
+    tags[1]['paused'] = True
+    tags[0]['parameter'] = [{'type': 'TEMPLATE', 'key': 'tagId', 'value': 'G-2'}, {'type': 'BOOLEAN', 'key': 'sendPageView', 'value': 'true'}]
+    # Export bookkeeping isn't a change
+    tags[0]['fingerprint'] = '2'
+
+    diff = diff_configs(old, new)['tag']
+    assert diff['added'] == [{'id': '4', 'name': 'Ads - Conversion'}]
+    assert diff['removed'] == [{'id': '3', 'name': 'Old tag'}]
+    changed = {entry['id']: entry for entry in diff['changed']}
+    assert set(changed) == {'1', '2'}
+    assert changed['1']['fields'] == [] and changed['1']['parameters_changed'] == ['tagId'] and changed['1']['parameters_added'] == ['sendPageView']
+    assert changed['2']['fields'] == ['name', 'paused'] and changed['2']['old_name'] == 'Meta - Pixel'
+
+    markdown = render_diff_markdown(diff_configs(old, new))
+    assert "- Added tag `Ads - Conversion`" in markdown
+    assert "- Removed tag `Old tag`" in markdown
+    assert "- Changed tag `Meta - Pixel - PageView`: renamed from `Meta - Pixel`; `paused`" in markdown
+
+
+def test_changes_reach_tags_through_triggers_and_variables():
+    old, new = container(), container()
+    new['containerVersion']['variable'][0]['parameter'][0]['value'] = 'G-2'
+    assert affected_tag_ids(diff_configs(old, new), ContainerIndex(new)) == {'1'}
+
+    new = container()
+    new['containerVersion']['trigger'][1]['type'] = 'click'
+    assert affected_tag_ids(diff_configs(old, new), ContainerIndex(new)) == {'2'}
+
+
+def test_one_edited_tag_in_an_example():
+    with open(EXAMPLES[0]) as file:
+        old = json.load(file)
+    new = copy.deepcopy(old)
+    tag = new['containerVersion']['tag'][0]
+    tag['name'] += ' (edited)'
+    diff = diff_configs(old, new)
+    assert [entry['id'] for entry in diff['tag']['changed']] == [tag['tagId']]
+    assert not any(diff[kind][change] for kind in ('trigger', 'variable') for change in ('added', 'removed', 'changed'))
@@ -0,0 +1,65 @@
+from container_index import ContainerIndex
+from rules import run_rules
+
+
+def container():
+    return {'containerVersion': {
+        'container': {'name': 'Site'},
+        'tag': [
+            {'tagId': '1', 'name': 'Consent', 'type': 'html', 'parameter': [{'type': 'TEMPLATE', 'key': 'html', 'value': '<script></script>'}]},
+            {'tagId': '2', 'name': 'Cleanup', 'type': 'html', 'parameter': []},
+            {'tagId': '3', 'name': 'Orphan', 'type': 'html', 'parameter': []},
+            {
+                'tagId': '4', 'name': 'GA4 - Event', 'type': 'gaawe', 'firingTriggerId': ['10'], 'blockingTriggerId': ['11'],
+                'setupTag': [{'tagName': 'Consent'}], 'teardownTag': [{'tagName': 'Cleanup', 'stopTeardownOnFailure': False}],
+                'parameter': [{'type': 'TEMPLATE', 'key': 'measurementIdOverride', 'value': '{{GA4 ID}}'}],
+            },
+        ],
+        'trigger': [
+            {'triggerId': '10', 'name': 'Click', 'type': 'click', 'filter': [{'parameter': [{'key': 'arg0', 'value': '{{Click URL}}'}]}]},
+            {'triggerId': '11', 'name': 'Bots', 'type': 'customEvent'},
+        ],
+        'variable': [
+            {'variableId': '20', 'name': 'GA4 ID', 'type': 'c', 'parameter': [{'type': 'TEMPLATE', 'key': 'value', 'value': 'G-ABC'}]},
+            {'variableId': '21', 'name': 'Lookup', 'type': 'smm', 'parameter': [{'type': 'TEMPLATE', 'key': 'input', 'value': '{{GA4 ID}}'}]},
+        ],
+        'builtInVariable': [{'name': 'Click URL', 'type': 'CLICK_URL'}],
+    }}
+
+
+def test_trigger_reverse_maps():
+    index = ContainerIndex(container())
+    assert index.tags_by_firing_trigger == {'10': ['4']}
+    assert index.tags_by_blocking_trigger == {'11': ['4']}
+    assert index.tag_triggers(index.tags_by_id['4']) == (['Click'], ['Bots'])
+    assert index.trigger_name('2147479553') == 'All Pages'
+
+
+def test_variable_references_cover_tags_triggers_and_variables():
+    index = ContainerIndex(container())
+    assert index.variable_references['GA4 ID'] == {'tag': ['4'], 'trigger': [], 'variable': ['21']}
+    assert index.variable_references['Click URL']['trigger'] == ['10']
+    assert index.is_variable_defined('Click URL') and index.is_variable_defined('_event')
+    assert not index.is_variable_defined('Missing')
+
+
+def test_dependencies_are_resolved_transitively():
+    index = ContainerIndex(container())
+    triggers, variables = index.tag_dependencies(index.tags_by_id['4'])
+    assert [trigger['triggerId'] for trigger in triggers] == ['10', '11']
+    assert [variable['name'] for variable in variables] == ['GA4 ID']
+
+
+def test_constants_resolve_and_other_values_dont():
+    index = ContainerIndex(container())
+    assert index.resolve_value('{{GA4 ID}}') == 'G-ABC'
+    assert index.resolve_value('{{Lookup}}') == '{{Lookup}}'
+    assert index.resolve_value('{{Missing}}') == '{{Missing}}'
+    assert index.resolve_value('prefix {{GA4 ID}}') == 'prefix {{GA4 ID}}'
+
+
+def test_setup_and_teardown_tags_need_no_firing_triggers():
+    index = ContainerIndex(container())
+    assert index.sequencing_tags == {'Consent': ['4'], 'Cleanup': ['4']}
+    flagged = [finding['entity_id'] for finding in run_rules(index) if finding['rule'] == 'no_firing_trigger']
+    assert flagged == ['3']
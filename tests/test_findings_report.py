@@ -0,0 +1,48 @@
+from container_index import ContainerIndex
+from findings_report import PLAIN_INLINE_TAGS, inline_markup, item_severity, report_cache_key
+from rules import SEVERITY_ERROR, SEVERITY_WARNING
+
+HTML_LINK_TAGS = {**PLAIN_INLINE_TAGS, 'link': '<a href="{url}">{text}</a>'}
+
+
+def test_error_terms_make_advice_an_error():
+    assert item_severity("Tracking ID mismatch between the GA4 tags") == SEVERITY_ERROR
+    assert item_severity("Missing firing trigger") == SEVERITY_ERROR
+
+
+def test_negated_error_terms_dont():
+    assert item_severity("No errors found") == SEVERITY_WARNING
+    assert item_severity("Nothing missing.") == SEVERITY_WARNING
+    assert item_severity("There are no ID discrepancies") == SEVERITY_WARNING
+    assert item_severity("This tag isn't broken") == SEVERITY_WARNING
+
+
+def test_negation_only_covers_its_own_clause():
+    assert item_severity("No consent settings; tracking ID missing") == SEVERITY_ERROR
+
+
+def test_links_keep_allowed_schemes():
+    assert inline_markup("[docs](https://example.com)", HTML_LINK_TAGS) == '<a href="https://example.com">docs</a>'
+    assert inline_markup("[mail](mailto:a@example.com)", HTML_LINK_TAGS) == '<a href="mailto:a@example.com">mail</a>'
+
+
+def test_other_links_are_plain_text():
+    assert inline_markup("[x](javascript:alert(1))", HTML_LINK_TAGS) == "[x](javascript:alert(1))"
+    assert inline_markup("[x](data:text/html,hi)", HTML_LINK_TAGS) == "[x](data:text/html,hi)"
+
+
+def container(html):
+    return {'containerVersion': {'container': {'name': 'Site'}, 'tag': [
+        {'tagId': '1', 'name': 'Custom HTML', 'type': 'html', 'parameter': [{'type': 'TEMPLATE', 'key': 'html', 'value': html}]},
+    ]}}
+
+
+def test_unhashed_configs_with_the_same_summary_get_their_own_reports():
+    first, second = ContainerIndex(container('<script>a()</script>')), ContainerIndex(container('<script>b()</script>'))
+    assert first.summary() == second.summary()
+    assert report_cache_key(first, '') != report_cache_key(second, '')
+    assert report_cache_key(first, '') == report_cache_key(ContainerIndex(container('<script>a()</script>')), '')
+
+
+def test_content_hashes_key_reports():
+    assert report_cache_key(ContainerIndex(container('a'), 'hash-1'), '').startswith('hash-1:')
@@ -0,0 +1,48 @@
+import copy
+
+from gtm_model import Tag, convert_config, find_parameter, parameter_value
+
+
+def tag(*parameters):
+    return Tag({'tagId': '1', 'name': 'GA4 - Config', 'parameter': [dict(parameter) for parameter in parameters]})
+
+
+def test_model_and_plain_lookups_agree():
+    raw = {'tagId': '1', 'parameter': [{'type': 'TEMPLATE', 'key': 'measurementId', 'value': 'G-1'}]}
+    model = Tag(copy.deepcopy(raw))
+    assert parameter_value(raw, 'measurementId') == parameter_value(model, 'measurementId') == 'G-1'
+    assert find_parameter(raw, 'missing') is find_parameter(model, 'missing') is None
+    assert model.parameter_value('missing', 'default') == 'default'
+
+
+def test_first_parameter_with_a_key_wins():
+    entity = tag({'key': 'html', 'value': 'first'}, {'key': 'html', 'value': 'second'})
+    assert entity.parameter_value('html') == 'first'
+
+
+def test_index_follows_changes_to_the_parameter_list():
+    entity = tag({'key': 'trackingId', 'value': 'UA-1'})
+    assert entity.parameter_value('trackingId') == 'UA-1'
+    entity['parameter'] = [{'key': 'trackingId', 'value': 'UA-2'}]
+    assert entity.parameter_value('trackingId') == 'UA-2'
+    entity['parameter'].append({'key': 'html', 'value': '<script></script>'})
+    assert entity.parameter_value('html') == '<script></script>'
+    del entity['parameter']
+    assert entity.parameter('trackingId') is None
+
+
+def test_copies_have_working_lookups():
+    entity = tag({'key': 'trackingId', 'value': 'UA-1'})
+    entity.parameter('trackingId')
+    duplicate = copy.deepcopy(entity)
+    duplicate['parameter'][0]['value'] = 'UA-2'
+    assert duplicate.parameter_value('trackingId') == 'UA-2'
+    assert entity.parameter_value('trackingId') == 'UA-1'
+
+
+def test_convert_config_leaves_the_callers_config_alone():
+    config = {'containerVersion': {'tag': [{'tagId': '1', 'parameter': []}], 'trigger': []}}
+    converted = convert_config(config)
+    assert type(config['containerVersion']['tag'][0]) is dict
+    assert isinstance(converted['containerVersion']['tag'][0], Tag)
+    assert convert_config(converted) is converted
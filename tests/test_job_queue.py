@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import DONE, FAILED, JobQueue
+
+
+def wait(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, "job didn't finish"
+        time.sleep(0.005)
+    return job
+
+
+@pytest.fixture
+def queue():
+    return JobQueue(max_workers=2, name='test')
+
+
+def test_submissions_for_an_active_key_are_coalesced(queue):
+    release = threading.Event()
+    calls = []
+
+    def work(job):
+        calls.append(job.id)
+        release.wait(5)
+        return 'result'
+
+    first = queue.submit('key', work)
+    assert queue.submit('key', work) == first
+    assert queue.active('key') == first
+    release.set()
+    job = wait(queue.get(first))
+    assert (job.status, job.result, calls) == (DONE, 'result', [first])
+    assert queue.active('key') is None
+
+
+def test_finished_keys_run_again(queue):
+    first = wait(queue.get(queue.submit('key', lambda job: 1)))
+    second = wait(queue.get(queue.submit('key', lambda job: 2)))
+    assert first.id != second.id and second.result == 2
+
+
+def test_other_keys_dont_wait(queue):
+    release = threading.Event()
+    blocked = queue.submit('slow', lambda job: release.wait(5))
+    quick = wait(queue.get(queue.submit('quick', lambda job: 'done')))
+    assert quick.result == 'done' and not queue.get(blocked).finished
+    release.set()
+    wait(queue.get(blocked))
+
+
+def test_failures_reach_the_job(queue):
+    def fail(job):
+        job.progress = 'partial'
+        raise ValueError("bad config")
+
+    job = wait(queue.get(queue.submit('key', fail)))
+    assert job.status == FAILED
+    assert isinstance(job.error, ValueError) and str(job.error) == "bad config"
+    assert "ValueError: bad config" in job.traceback
+    assert job.progress == 'partial' and job.result is None
+    assert queue.active('key') is None
+
+
+def test_jobs_have_their_own_traces(queue):
+    job = wait(queue.get(queue.submit('key', lambda job: None)))
+    assert job.trace.name == 'test_job'
+    assert job.trace.attributes['job_id'] == job.id
+    assert job.trace.duration is not None
+
+
+def test_finished_jobs_are_evicted_after_retention():
+    queue = JobQueue(max_workers=1, retention=0, name='test')
+    job = wait(queue.get(queue.submit('key', lambda job: None)))
+    time.sleep(0.01)
+    # Eviction happens on the next submission
+    queue.submit('other', lambda job: None)
+    assert queue.get(job.id) is None
@@ -0,0 +1,71 @@
+import time
+
+from local_cache import LRUCache, SQLiteCache, TieredCache
+
+
+def tiered(tmp_path, memory=None, disk_ttl=60):
+    return TieredCache(LRUCache() if memory is None else memory, SQLiteCache(str(tmp_path / 'cache.db'), ttl=disk_ttl))
+
+
+def test_writes_reach_both_tiers(tmp_path):
+    cache = tiered(tmp_path)
+    cache.set('key', {'analysis': 'text'})
+    assert cache.memory.get('key') == {'analysis': 'text'}
+    assert cache.disk.get('key') == {'analysis': 'text'}
+
+
+def test_memory_misses_fall_through_to_disk_and_are_promoted(tmp_path):
+    cache = tiered(tmp_path)
+    cache.set('key', {'analysis': 'text'})
+    # A new process starts with an empty memory tier over the same database
+    restarted = tiered(tmp_path)
+    assert restarted.memory.get('key') is None
+    assert restarted.get('key') == {'analysis': 'text'}
+    assert restarted.memory.get('key') == {'analysis': 'text'}
+
+
+def test_expired_entries_are_misses_in_both_tiers(tmp_path):
+    cache = tiered(tmp_path, memory=LRUCache(ttl=0.01), disk_ttl=0.01)
+    cache.set('key', 'value')
+    time.sleep(0.05)
+    assert cache.memory.get('key') is None
+    assert cache.get('key') is None
+
+
+def test_memory_expiry_falls_back_to_a_fresh_disk_entry(tmp_path):
+    cache = tiered(tmp_path, memory=LRUCache(ttl=0.01))
+    cache.set('key', 'value')
+    time.sleep(0.05)
+    assert cache.get('key') == 'value'
+
+
+def test_deletes_reach_both_tiers(tmp_path):
+    cache = tiered(tmp_path)
+    cache.set('key', 'value')
+    cache.delete('key')
+    assert cache.get('key') is None
+    assert tiered(tmp_path).get('key') is None
+
+
+def test_lru_evicts_least_recently_used_by_count_and_size():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+    cache = LRUCache(max_bytes=10)
+    cache.set('a', 'x', size=6)
+    cache.set('b', 'y', size=6)
+    assert (cache.get('a'), cache.get('b')) == (None, 'y')
+    cache.set('too big', 'z', size=11)
+    assert cache.get('too big') is None and cache.get('b') == 'y'
+
+
+def test_memory_only_without_a_disk_tier():
+    cache = TieredCache(LRUCache())
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    cache.delete('key')
+    assert cache.get('key') is None
@@ -0,0 +1,67 @@
+import glob
+import json
+import os
+import re
+
+import pytest
+
+from container_index import ContainerIndex
+from gtm_loader import parse_gtm_config
+from prompt_compaction import build_symbol_table, compact_entity, compact_prompt_data
+from prompts import sanitize_tag, sanitize_trigger, sanitize_variable
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'json-examples', '*.json')))
+SYMBOL_REFERENCE = re.compile(r'"(\$\d+)"')
+
+
+def sections(path):
+    with open(path, 'rb') as file:
+        index = ContainerIndex(parse_gtm_config(file.read()))
+    return {
+        'Tags': [sanitize_tag(index, tag) for tag in index.tags],
+        'Variables': [sanitize_variable(variable) for variable in index.variables],
+        'Triggers': [sanitize_trigger(trigger) for trigger in index.triggers],
+    }
+
+
+def expand(value, symbols):
+    if isinstance(value, str):
+        return symbols.get(value, value)
+    if isinstance(value, dict):
+        return {key: expand(item, symbols) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand(item, symbols) for item in value]
+    return value
+
+
+@pytest.mark.parametrize('path', EXAMPLES, ids=os.path.basename)
+def test_tag_names_stay_verbatim(path):
+    data = sections(path)
+    compacted, symbols = build_symbol_table({name: [compact_entity(entity) for entity in entities] for name, entities in data.items()})
+    assert [tag['name'] for tag in compacted['Tags']] == [tag['name'] for tag in data['Tags']]
+    text, _ = compact_prompt_data(data)
+    for tag in data['Tags']:
+        assert json.dumps(tag['name'], ensure_ascii=False) in text
+
+
+@pytest.mark.parametrize('path', EXAMPLES, ids=os.path.basename)
+def test_every_symbol_reference_is_defined_and_expands_back(path):
+    data = sections(path)
+    original = {name: [compact_entity(entity) for entity in entities] for name, entities in data.items()}
+    compacted, symbols = build_symbol_table(original)
+    assert expand(compacted, symbols) == original
+    text, stats = compact_prompt_data(data)
+    assert set(SYMBOL_REFERENCE.findall(text)) <= set(symbols)
+    assert stats['after_tokens'] < stats['before_tokens']
+
+
+def test_names_repeated_elsewhere_are_symbols_outside_name_fields():
+    trigger_name = 'All Pages - Consent Granted'
+    data = {
+        'Tags': [{'name': trigger_name, 'firingTriggers': [trigger_name]}, {'name': 'Other tag', 'firingTriggers': [trigger_name]}],
+        'Triggers': [{'name': trigger_name}],
+    }
+    compacted, symbols = build_symbol_table(data)
+    assert symbols == {'$1': trigger_name}
+    assert compacted['Tags'][0] == {'name': trigger_name, 'firingTriggers': ['$1']}
+    assert compacted['Triggers'][0] == {'name': trigger_name}
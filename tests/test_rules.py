@@ -0,0 +1,117 @@
+import glob
+import json
+import os
+
+import pytest
+
+from container_index import ContainerIndex
+from gtm_loader import parse_gtm_config
+from rules import LIMITED_FINDINGS_PER_RULE, collect_tracking_ids, render_findings_markdown, run_rules
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'json-examples', '*.json')))
+
+
+def load(path):
+    """The raw export, for deriving expectations independently of the index, and the indexed one."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    return json.loads(data)['containerVersion'], ContainerIndex(parse_gtm_config(data))
+
+
+def flagged(findings, rule):
+    return sorted(finding['entity_id'] for finding in findings if finding['rule'] == rule)
+
+
+def raw_parameter(tag, key):
+    return next((parameter.get('value') for parameter in tag.get('parameter', []) if parameter.get('key') == key), None)
+
+
+def minimal_index(tags, **container_version):
+    return ContainerIndex({'containerVersion': {'container': {'name': 'Site'}, 'tag': tags, **container_version}})
+
+
+@pytest.mark.parametrize('path', EXAMPLES, ids=os.path.basename)
+def test_tag_rules_match_the_export(path):
+    raw, index = load(path)
+    findings = run_rules(index)
+    tags = raw.get('tag', [])
+    # UA tags are only ever flagged for deletion, so the other tag rules skip them
+    checked = [tag for tag in tags if tag['type'] != 'ua']
+    sequenced = {sequenced['tagName'] for tag in tags for sequenced in tag.get('setupTag', []) + tag.get('teardownTag', [])}
+    trigger_ids = {trigger['triggerId'] for trigger in raw.get('trigger', [])} | {'2147479553', '2147479572', '2147479573'}
+
+    assert flagged(findings, 'ua_tag') == sorted(tag['tagId'] for tag in tags if tag['type'] == 'ua')
+    assert flagged(findings, 'paused_tag') == sorted(tag['tagId'] for tag in checked if tag.get('paused'))
+    assert flagged(findings, 'consent_not_set') == sorted(
+        tag['tagId'] for tag in checked if tag.get('consentSettings', {}).get('consentStatus') == 'NOT_SET'
+    )
+    assert flagged(findings, 'custom_template') == sorted(tag['tagId'] for tag in checked if tag['type'].startswith('cvt_'))
+    assert flagged(findings, 'floodlight_tag') == sorted(tag['tagId'] for tag in checked if tag['type'] in ('flc', 'fls'))
+    assert flagged(findings, 'ttd_pixel') == sorted(
+        tag['tagId'] for tag in checked if tag['type'] == 'html' and 'insight.adsrvr.org' in (raw_parameter(tag, 'html') or '')
+    )
+    assert flagged(findings, 'no_firing_trigger') == sorted(
+        tag['tagId'] for tag in checked if not tag.get('firingTriggerId') and tag['name'] not in sequenced
+    )
+    assert flagged(findings, 'missing_trigger') == sorted(
+        tag['tagId'] for tag in checked
+        for trigger_id in tag.get('firingTriggerId', []) + tag.get('blockingTriggerId', [])
+        if trigger_id not in trigger_ids
+    )
+
+
+@pytest.mark.parametrize('path', EXAMPLES, ids=os.path.basename)
+def test_undefined_variables_are_referenced_and_undefined(path):
+    raw, index = load(path)
+    defined = {variable['name'] for variable in raw.get('variable', []) + raw.get('builtInVariable', [])}
+    for finding in run_rules(index):
+        if finding['rule'] == 'undefined_variable':
+            name = finding['details']['variable_name']
+            assert name not in defined
+            assert f"{{{{{name}}}}}" in json.dumps(index.get_entity(finding['entity_kind'], finding['entity_id']))
+
+
+def test_floodlight_advertiser_ids_are_resolved_before_comparing():
+    raw, index = load(next(path for path in EXAMPLES if path.endswith('gtm-aa.json')))
+    mismatches = [finding for finding in run_rules(index) if finding['rule'] == 'floodlight_advertiser_mismatch']
+    assert len(mismatches) == 1
+    # One tag group uses the ID directly, the other through the {{DCM Account ID (New)}} constant
+    assert set(mismatches[0]['details']['advertiser_ids']) == {'5039016', '12858712'}
+
+
+def test_one_advertiser_through_a_constant_isnt_a_mismatch():
+    tags = [
+        {'tagId': '1', 'name': 'FL 1', 'type': 'flc', 'firingTriggerId': ['2147479553'], 'parameter': [{'type': 'TEMPLATE', 'key': 'advertiserId', 'value': '123'}]},
+        {'tagId': '2', 'name': 'FL 2', 'type': 'fls', 'firingTriggerId': ['2147479553'], 'parameter': [{'type': 'TEMPLATE', 'key': 'advertiserId', 'value': '{{Advertiser}}'}]},
+    ]
+    variables = [{'variableId': '1', 'name': 'Advertiser', 'type': 'c', 'parameter': [{'type': 'TEMPLATE', 'key': 'value', 'value': '123'}]}]
+    findings = run_rules(minimal_index(tags, variable=variables))
+    assert not flagged(findings, 'floodlight_advertiser_mismatch')
+
+
+def test_missing_triggers_and_undefined_variables():
+    tags = [{
+        'tagId': '1', 'name': 'Event', 'type': 'gaawe', 'firingTriggerId': ['99'], 'blockingTriggerId': ['2147479553'],
+        'parameter': [{'type': 'TEMPLATE', 'key': 'eventName', 'value': '{{Missing}} {{_event}}'}],
+    }]
+    findings = run_rules(minimal_index(tags))
+    assert [finding['details']['trigger_id'] for finding in findings if finding['rule'] == 'missing_trigger'] == ['99']
+    assert [finding['details']['variable_name'] for finding in findings if finding['rule'] == 'undefined_variable'] == ['Missing']
+
+
+@pytest.mark.parametrize('path', EXAMPLES, ids=os.path.basename)
+def test_tracking_ids_name_existing_tags(path):
+    _, index = load(path)
+    for ids in collect_tracking_ids(index).values():
+        for tag_names in ids.values():
+            assert set(tag_names) <= set(index.tags_by_name)
+
+
+def test_limited_findings_are_trimmed_per_rule():
+    _, index = load(next(path for path in EXAMPLES if path.endswith('gtm-aa.json')))
+    findings = run_rules(index)
+    consent = len(flagged(findings, 'consent_not_set'))
+    markdown = render_findings_markdown(findings, LIMITED_FINDINGS_PER_RULE)
+    assert f"Tags with NOT_SET consent ({consent})" in markdown
+    assert f"- ...and {consent - LIMITED_FINDINGS_PER_RULE} more" in markdown
+    assert render_findings_markdown(findings).count("Consent status is NOT_SET") == consent
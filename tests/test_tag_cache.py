@@ -0,0 +1,55 @@
+from tag_cache import clean_tag_names, split_tag_sections
+
+TAGS = [
+    {'tagId': '1', 'name': 'GA4 - Config'},
+    {'tagId': '2', 'name': 'Meta - Pixel - PageView'},
+    {'tagId': '3', 'name': 'Ads - Conversion - Lead'},
+]
+
+
+def test_sections_are_keyed_by_tag_id():
+    analysis = (
+        "**Tag Name: 'GA4 - Config'**\n\n- Add a measurement ID.\n\n"
+        "**Tag Name: 'Ads - Conversion - Lead'**\n\n- Fire on the thank you page only.\n\n"
+        "Tags without problems: `Meta - Pixel - PageView`"
+    )
+    sections = split_tag_sections(analysis, TAGS)
+    assert sections == {
+        '1': "**Tag Name: 'GA4 - Config'**\n\n- Add a measurement ID.",
+        '2': '',
+        '3': "**Tag Name: 'Ads - Conversion - Lead'**\n\n- Fire on the thank you page only.",
+    }
+
+
+def test_tags_left_out_of_the_reply_are_missing():
+    # A reply cut short before the clean tags line only covers the tags it reached
+    analysis = "**Tag Name: 'GA4 - Config'**\n\n- Add a measurement ID."
+    assert split_tag_sections(analysis, TAGS) == {'1': "**Tag Name: 'GA4 - Config'**\n\n- Add a measurement ID."}
+
+
+def test_only_tags_named_clean_are_clean():
+    analysis = "**Tags without problems:** `GA4 - Config`, `Meta - Pixel - PageView`"
+    assert split_tag_sections(analysis, TAGS) == {'1': '', '2': ''}
+
+
+def test_clean_tags_line_isnt_part_of_the_last_section():
+    analysis = "**Tag Name: 'GA4 - Config'**\n\n- Add a measurement ID.\n\nTags without problems: none"
+    assert split_tag_sections(analysis, TAGS) == {'1': "**Tag Name: 'GA4 - Config'**\n\n- Add a measurement ID."}
+
+
+def test_unsplittable_replies_return_none():
+    assert split_tag_sections('', TAGS) is None
+    assert split_tag_sections("The container looks fine overall.", TAGS) is None
+    assert split_tag_sections("**Tag Name: 'Unknown tag'**\n\n- Remove it.", TAGS) is None
+    assert split_tag_sections("Tags without problems: none", TAGS) is None
+
+
+def test_headings_for_other_tags_are_ignored():
+    analysis = "**Tag Name: 'Unknown tag'**\n\n- Remove it.\n\n**Tag Name: 'GA4 - Config'**\n\n- Add a measurement ID."
+    assert split_tag_sections(analysis, TAGS) == {'1': "**Tag Name: 'GA4 - Config'**\n\n- Add a measurement ID."}
+
+
+def test_clean_tag_names_without_code_tags():
+    assert clean_tag_names("GA4 - Config, 'Meta - Pixel - PageView'.") == ['GA4 - Config', 'Meta - Pixel - PageView']
+    assert clean_tag_names("`GA4 - Config`, `Tag, with comma`") == ['GA4 - Config', 'Tag, with comma']
+
@@ -0,0 +1,237 @@
+import bisect
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "")  # JSONL file each finished trace is appended to; empty disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Port serving Prometheus text metrics on /metrics; 0 disables it
+METRICS_PREFIX = "gtm"
+# Upper bounds in seconds of the stage duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Trace:
+    """Spans and counters recorded during one unit of work, such as a script run or a batch audit of a container.
+
+    Spans are dicts with name, start and duration (seconds from the trace's start), depth,
+    thread, parent span ID and attributes. Background jobs record into traces of their own, which
+    the run that collects a job's result links to (see link_trace).
+    """
+
+    def __init__(self, name, **attributes):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.counters = {}
+        self.links = []
+        self._lock = threading.Lock()
+
+    def add_span(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def add_count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_link(self, link):
+        with self._lock:
+            self.links.append(link)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'name': self.name,
+                'attributes': self.attributes,
+                'started_at': self.started_at,
+                'duration': self.duration,
+                'spans': sorted(self.spans, key=lambda span: span['start']),
+                'counters': dict(self.counters),
+                'links': list(self.links),
+            }
+
+
+class Metrics:
+    """Process-wide stage duration histograms and counters, exported in the Prometheus text format."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._durations = {}  # stage -> [bucket counts..., +Inf count, sum]
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._durations.setdefault(stage, [0] * (len(self.buckets) + 1) + [0.0])
+            histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram[-1] += seconds
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def prometheus_text(self):
+        name = f"{METRICS_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent in each traced stage.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self._durations.items()):
+                label = f'stage="{escape_label(stage)}"'
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), histogram):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label}}} {histogram[-1]:.6f}")
+                lines.append(f"{name}_count{{{label}}} {cumulative}")
+            for counter, value in sorted(self._counters.items()):
+                counter_name = f"{METRICS_PREFIX}_{counter}_total"
+                lines.append(f"# TYPE {counter_name} counter")
+                lines.append(f"{counter_name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Module-level, so every session and background job adds to the same totals
+metrics = Metrics()
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def start_trace(name, **attributes):
+    """Record the spans and counters within the block into a new Trace, yielded to the caller.
+
+    The finished trace is appended to TRACE_LOG_PATH when that's set.
+    """
+    trace = Trace(name, **attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        trace.duration = time.perf_counter() - trace.start
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        metrics.observe(name, trace.duration)
+        if TRACE_LOG_PATH:
+            write_trace(trace, TRACE_LOG_PATH)
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Time the block as a stage of the current trace, if any, and in the process-wide metrics.
+
+    Yields the attributes dict, so the block can add what it learns (sizes, cache hits) to the span.
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    record = {
+        'id': uuid.uuid4().hex[:16],
+        'name': name,
+        'parent': parent['id'] if parent else None,
+        'depth': parent['depth'] + 1 if parent else 0,
+        'thread': threading.current_thread().name,
+        'attributes': attributes,
+    }
+    token = _current_span.set(record)
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes['error'] = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        metrics.observe(name, duration)
+        if trace is not None:
+            record['start'] = start - trace.start
+            record['duration'] = duration
+            trace.add_span(record)
+        logger.debug(f"{name} took {duration * 1000:.1f} ms {attributes}")
+
+
+def count(name, value=1):
+    """Add to a counter, e.g. upload_bytes or llm_prompt_tokens, in the current trace and the process-wide metrics."""
+    metrics.count(name, value)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_count(name, value)
+
+
+def link_trace(linked, **attributes):
+    """Record in the current trace, if any, that it used the finished trace `linked`, e.g. a background job's."""
+    trace = _current_trace.get()
+    if trace is None or linked is None:
+        return
+    trace.add_link({
+        'id': linked.id,
+        'name': linked.name,
+        'duration': linked.duration,
+        'attributes': {**linked.attributes, **attributes},
+    })
+
+
+def write_trace(trace, path):
+    try:
+        with open(path, 'a') as file:
+            file.write(json.dumps(trace.to_dict(), default=str) + '\n')
+    except OSError as e:
+        logger.error(f"Error writing trace {trace.id} to {path}: {str(e)}")
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve the metrics on http://127.0.0.1:<port>/metrics from a daemon thread, once per process."""
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is not None or not port:
+            return _metrics_server
+        # Imported here, so processes that don't serve metrics don't load http.server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes would otherwise flood the log
+
+        try:
+            _metrics_server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+        except OSError as e:
+            logger.error(f"Error starting the metrics server on port {port}: {str(e)}")
+            return None
+        threading.Thread(target=_metrics_server.serve_forever, name='metrics', daemon=True).start()
+        logger.info(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+        return _metrics_server